@@ -0,0 +1,65 @@
+# assets.py
+
+import pygame
+from constants import *
+
+# Surfaces shared by every entity, keyed on (path, size)
+_images = {}
+_originals = {}   # path -> surface as loaded from disk
+_converted = set()  # keys already converted to the display format
+
+def display_ready():
+    return pygame.display.get_init() and pygame.display.get_surface() is not None
+
+def get_image(path, size):
+    """
+    Returns the image at path scaled to size, loading and scaling it only
+    the first time. Once a display exists the cached surface is converted
+    with convert_alpha() so blits don't pay for format conversion.
+    Raises pygame.error / FileNotFoundError like pygame.image.load.
+    """
+    key = (path, tuple(size))
+    image = _images.get(key)
+    if image is None:
+        original = _originals.get(path)
+        if original is None:
+            original = pygame.image.load(path)
+            _originals[path] = original
+        image = pygame.transform.scale(original, key[1])
+        _images[key] = image
+
+    if key not in _converted and display_ready():
+        image = image.convert_alpha()
+        _images[key] = image
+        _converted.add(key)
+    return image
+
+def preload():
+    """Eagerly loads every building, ally and enemy image at the size entities use."""
+    for data in BUILDING_DATA.values():
+        size = GRID_SIZE * data.get("size_multiplier", 1)
+        try_load(data["image"], (size, size))
+    for data in list(ALLY_DATA.values()) + list(ENEMY_DATA.values()):
+        try_load(data["image"], (GRID_SIZE, GRID_SIZE))
+    return asset_stats()
+
+def try_load(path, size):
+    try:
+        return get_image(path, size)
+    except (pygame.error, FileNotFoundError) as e:
+        print(f"Error loading {path}: {e}")
+        return None
+
+def asset_stats():
+    """Counts and approximate pixel memory of the cached surfaces."""
+    surfaces = list(_images.values()) + list(_originals.values())
+    return {
+        "files": len(_originals),
+        "images": len(_images),
+        "bytes": sum(surface.get_pitch() * surface.get_height() for surface in surfaces),
+    }
+
+def clear():
+    _images.clear()
+    _originals.clear()
+    _converted.clear()
@@ -1,13 +1,23 @@
 import math
+import sys
 import heapq
+import warnings
+from array import array
+from collections import deque, OrderedDict
+
+# Same neighbour order and diagonal cost the node-based search used
+DIRECTIONS = ((1, 0), (1, 1), (0, 1), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1))
+DIAGONAL_COST = 1.414
+STEPS = tuple((dx, dy, DIAGONAL_COST if dx and dy else 1) for dx, dy in DIRECTIONS)
 
 class Node:
-    def __init__(self, x, y, is_obstacle):
+    """A single cell on a returned path."""
+    __slots__ = ("x", "y", "type")
+
+    def __init__(self, x, y, is_obstacle=False):
         self.x = x
         self.y = y
         self.type = 'wall' if is_obstacle else 'road'
-        self.g_score = float('inf')
-        self.f_score = float('inf')
 
     def __eq__(self, other):
         return (self.x, self.y) == (other.x, other.y)
@@ -15,133 +25,598 @@ class Node:
     def __hash__(self):
         return hash((self.x, self.y))
 
-    def __lt__(self, other):
-        return self.f_score < other.f_score
-
-    def get_neighbors(self, nodes):
-        rows = len(nodes)
-        cols = len(nodes[0])
-        directions = [[1, 0], [1, 1], [0, 1], [1, -1], [0, -1], [-1, -1], [-1, 0], [-1, 1]]
-        neighbors = []
-        for dx, dy in directions:
-            nx = self.x + dx
-            ny = self.y + dy
-            if 0 <= nx < cols and 0 <= ny < rows:
-                neighbors.append(nodes[ny][nx])
-        return neighbors
-
-
-def create_nodes_from_grid(grid):
-    rows = len(grid)
-    cols = len(grid[0])
-    nodes = []
-    for y in range(rows):
-        row = []
-        for x in range(cols):
-            is_obstacle = grid[y][x][1]
-            node = Node(x, y, is_obstacle)
-            row.append(node)
-        nodes.append(row)
-    return nodes
+    def __repr__(self):
+        return f"Node({self.x}, {self.y})"
 
-def distance(node1, node2):
-    dx = abs(node1.x - node2.x)
-    dy = abs(node1.y - node2.y)
-    return 1.414 * min(dx, dy) + abs(dx - dy)
-
-def h_score(start, end):
-    return abs(end.x - start.x) + abs(end.y - start.y)
-
-def reconstruct_path(came_from, current):
-    path = [current]
-    current_key = (current.x, current.y)
-    while current_key in came_from:
-        current = came_from[current_key]
-        current_key = (current.x, current.y)
-        path.insert(0, current)
-    return path
-
-def find_nearest_walkable(nodes, target_x, target_y):
+
+class NavGrid:
     """
-    If the target cell is a wall (e.g. a building), find the nearest
-    adjacent walkable cell to path towards instead.
+    Long-lived navigation grid.
+
+    Passability lives in a flat bytearray (1 = blocked). The scratch arrays
+    used by searches (g-scores, parents, closed flags) are allocated once and
+    invalidated by bumping a generation counter, so a query never allocates
+    per-cell state.
     """
-    rows = len(nodes)
-    cols = len(nodes[0])
-    target_node = nodes[target_y][target_x]
-
-    if target_node.type != 'wall':
-        return target_node  # Target is already walkable
-
-    # BFS outward from target to find nearest walkable neighbour
-    visited = set()
-    queue = [(target_x, target_y)]
-    visited.add((target_x, target_y))
-    directions = [[1, 0], [1, 1], [0, 1], [1, -1], [0, -1], [-1, -1], [-1, 0], [-1, 1]]
-
-    while queue:
-        cx, cy = queue.pop(0)
-        for dx, dy in directions:
-            nx, ny = cx + dx, cy + dy
-            if (nx, ny) not in visited and 0 <= nx < cols and 0 <= ny < rows:
-                visited.add((nx, ny))
-                candidate = nodes[ny][nx]
-                if candidate.type != 'wall':
-                    return candidate  # Found nearest walkable cell
-                queue.append((nx, ny))
-
-    return None  # No walkable cell found at all
-
-def a_star(grid, start_coords, end_coords):
-    nodes = create_nodes_from_grid(grid)
-    start_node = nodes[start_coords[1]][start_coords[0]]
-
-    # if end cell is a wall, reroute to nearest walkable neighbour
-    end_node = find_nearest_walkable(nodes, end_coords[0], end_coords[1])
-    if end_node is None:
-        return []
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        size = width * height
+        self.blocked = bytearray(size)
+        self.g_score = array('d', bytes(8 * size))
+        self.parent = array('l', [-1]) * size
+        self.seen = array('L', [0]) * size    # generation that wrote g_score/parent
+        self.closed = array('L', [0]) * size  # generation that closed the cell
+        self.generation = 0
+        self.version = 0  # bumped whenever passability actually changes
+        self.dirty = set()  # cells changed since the last commit()
+        self.listeners = []
+        self.path_cache = None  # optional PathCache consulted by find_path
+        self.hierarchy = None  # optional HierarchicalPathfinder used by find_path instead of search
+        self.expanded = 0  # cells expanded by the last search() / jump_search()
+        self.searches = 0  # running totals over every search, sampled by the frame profiler
+        self.expanded_total = 0
+        self.padded = None  # bordered copy of blocked used by jump_search
+        self.padded_version = -1
+        self.frozen = None  # immutable copy of blocked shipped to path worker processes
+        self.frozen_version = -1
 
-    if start_node == end_node:
-        return []
+    @classmethod
+    def from_grid(cls, grid):
+        nav = cls(len(grid[0]), len(grid))
+        nav.load(grid)
+        return nav
 
-    open_set = []
-    in_open_set = set()  # O(1) membership check
-    counter = 0
-    came_from = {}
+    def load(self, grid):
+        """Copies passability from a list-of-rows grid of (terrain, blocked) cells."""
+        blocked = bytearray(1 if cell[1] else 0 for row in grid for cell in row)
+        if blocked != self.blocked:
+            w = self.width
+            self.dirty.update((i % w, i // w) for i, (old, new) in enumerate(zip(self.blocked, blocked)) if old != new)
+            self.blocked[:] = blocked
+            self.version += 1
 
-    start_node.g_score = 0
-    start_node.f_score = h_score(start_node, end_node)
-    heapq.heappush(open_set, (start_node.f_score, counter, start_node))
-    in_open_set.add((start_node.x, start_node.y))
-    closed_set = set()
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
 
-    while open_set:
-        _, _, current = heapq.heappop(open_set)
-        in_open_set.discard((current.x, current.y))
+    def is_blocked(self, x, y):
+        return self.blocked[y * self.width + x] != 0
 
-        if current == end_node:
-            return reconstruct_path(came_from, current)
+    def set_blocked(self, x, y, blocked):
+        i = y * self.width + x
+        value = 1 if blocked else 0
+        if self.blocked[i] != value:
+            self.blocked[i] = value
+            self.version += 1
+            self.dirty.add((x, y))
 
-        closed_set.add(current)
+    def subscribe(self, callback):
+        """Registers callback(version, dirty_cells), called by commit() after changes."""
+        self.listeners.append(callback)
 
-        for neighbor in current.get_neighbors(nodes):
-            if neighbor in closed_set or neighbor.type == 'wall':
-                continue
+    def commit(self):
+        """Notifies subscribers of the cells changed since the last commit."""
+        if not self.dirty:
+            return False
+        dirty, self.dirty = self.dirty, set()
+        for callback in self.listeners:
+            callback(self.version, dirty)
+        return True
 
-            tentative_g_score = current.g_score + distance(current, neighbor)
+    def next_generation(self):
+        """Starts a new search, invalidating all scratch state in O(1)."""
+        self.generation += 1
+        if self.generation >= 0xFFFFFFFF:  # wrap around: clear the stamps once
+            size = self.width * self.height
+            self.seen = array('L', [0]) * size
+            self.closed = array('L', [0]) * size
+            self.generation = 1
+        return self.generation
 
-            if tentative_g_score < neighbor.g_score:
-                came_from[(neighbor.x, neighbor.y)] = current
-                neighbor.g_score = tentative_g_score
-                neighbor.f_score = neighbor.g_score + h_score(neighbor, end_node)
+    def find_nearest_walkable(self, target_x, target_y):
+        """
+        If the target cell is a wall (e.g. a building), find the nearest
+        walkable cell to path towards instead. Returns (x, y) or None.
+        """
+        w, h = self.width, self.height
+        blocked = self.blocked
+        start = target_y * w + target_x
+        if not blocked[start]:
+            return target_x, target_y  # Target is already walkable
 
-                if (neighbor.x, neighbor.y) not in in_open_set:
-                    counter += 1
-                    heapq.heappush(open_set, (neighbor.f_score, counter, neighbor))
-                    in_open_set.add((neighbor.x, neighbor.y))
-                # ✅ Fix Bug 2: if already in open set, re-push with updated score
-                else:
+        # BFS outward from target, using the closed stamps as the visited set
+        gen = self.next_generation()
+        closed = self.closed
+        closed[start] = gen
+        queue = deque(((target_x, target_y),))
+        while queue:
+            cx, cy = queue.popleft()
+            for dx, dy in DIRECTIONS:
+                nx, ny = cx + dx, cy + dy
+                if 0 <= nx < w and 0 <= ny < h:
+                    n = ny * w + nx
+                    if closed[n] != gen:
+                        closed[n] = gen
+                        if not blocked[n]:
+                            return nx, ny  # Found nearest walkable cell
+                        queue.append((nx, ny))
+
+        return None  # No walkable cell found at all
+
+    def step_towards(self, start_coords, end_coords):
+        """
+        The walkable neighbour of start that is nearest to end (or to the
+        walkable cell nearest end), for moving while a search is queued.
+        Returns (x, y), or None if no neighbour is nearer than start.
+        """
+        end = self.find_nearest_walkable(end_coords[0], end_coords[1])
+        if end is None:
+            return None
+        start_x, start_y = start_coords
+        best = None
+        best_distance = octile(start_x, start_y, end[0], end[1])
+        for dx, dy in DIRECTIONS:
+            nx, ny = start_x + dx, start_y + dy
+            if self.in_bounds(nx, ny) and not self.is_blocked(nx, ny):
+                distance = octile(nx, ny, end[0], end[1])
+                if distance < best_distance:
+                    best, best_distance = (nx, ny), distance
+        return best
+
+    def find_path(self, start_coords, end_coords, algorithm=None):
+        """
+        Path from start to end (rerouted to the nearest walkable cell if the
+        end is blocked). Returns the list of (x, y) cells including the start,
+        or an empty list if there is no path.
+
+        algorithm is "astar", "jps" or "hpa"; None uses HPA* when a hierarchy
+        is attached and plain A* otherwise. "hpa" without a hierarchy also
+        falls back to plain A*.
+        """
+        if algorithm is None or (algorithm == "hpa" and self.hierarchy is None):
+            algorithm = "hpa" if self.hierarchy is not None else "astar"
+        if algorithm == "hpa":
+            search = self.hierarchy.find_path
+        elif algorithm == "jps":
+            search = self.jump_search
+        else:
+            search = self.search
+        cache = self.path_cache
+        if cache is None:
+            return search(start_coords, end_coords)
+
+        key = (tuple(start_coords), tuple(end_coords), self.version, algorithm)
+        path = cache.get(key)
+        if path is None:
+            path = tuple(search(start_coords, end_coords))
+            cache.put(key, path)
+        return list(path)
+
+    def finish_search(self, expanded):
+        self.expanded = expanded
+        self.searches += 1
+        self.expanded_total += expanded
+
+    def search(self, start_coords, end_coords, bounds=None):
+        """
+        Plain A* over the whole grid, or only inside bounds = (x0, y0, x1, y1)
+        (exclusive x1/y1) when given.
+        """
+        end = self.find_nearest_walkable(end_coords[0], end_coords[1])
+        if end is None:
+            return []
+        start_x, start_y = start_coords
+        end_x, end_y = end
+        if (start_x, start_y) == (end_x, end_y):
+            return []
+
+        w, h = self.width, self.height
+        x0, y0, x1, y1 = bounds or (0, 0, w, h)
+        blocked, g_score, parent = self.blocked, self.g_score, self.parent
+        seen, closed = self.seen, self.closed
+        gen = self.next_generation()
+
+        start = start_y * w + start_x
+        goal = end_y * w + end_x
+        seen[start] = gen
+        g_score[start] = 0.0
+        parent[start] = -1
+        open_set = [(octile(start_x, start_y, end_x, end_y), 0, start)]
+        counter = 0
+        expanded = 0
+
+        while open_set:
+            _, _, current = heapq.heappop(open_set)
+            if closed[current] == gen:
+                continue  # Stale entry left behind by a later improvement
+            if current == goal:
+                self.finish_search(expanded)
+                return self.reconstruct_path(current)
+            closed[current] = gen
+            expanded += 1
+
+            cy, cx = divmod(current, w)
+            current_g = g_score[current]
+            for dx, dy, cost in STEPS:
+                nx = cx + dx
+                ny = cy + dy
+                if x0 <= nx < x1 and y0 <= ny < y1:
+                    neighbor = ny * w + nx
+                    if blocked[neighbor] or closed[neighbor] == gen:
+                        continue
+                    tentative_g_score = current_g + cost
+                    if seen[neighbor] != gen or tentative_g_score < g_score[neighbor]:
+                        seen[neighbor] = gen
+                        g_score[neighbor] = tentative_g_score
+                        parent[neighbor] = current
+                        counter += 1
+                        f_score = tentative_g_score + octile(nx, ny, end_x, end_y)
+                        heapq.heappush(open_set, (f_score, counter, neighbor))
+
+        self.finish_search(expanded)
+        return []  # No path found
+
+    def jump_search(self, start_coords, end_coords):
+        """
+        Jump Point Search: same passability, moves and costs as search(), so
+        paths have equal cost, but straight and diagonal runs through open
+        ground are skipped in one jump instead of expanding every cell.
+        """
+        end = self.find_nearest_walkable(end_coords[0], end_coords[1])
+        if end is None:
+            return []
+        start_x, start_y = start_coords
+        end_x, end_y = end
+        if (start_x, start_y) == (end_x, end_y):
+            return []
+
+        w = self.width
+        pad = self.padded_blocked()
+        stride = w + 2
+        g_score, parent = self.g_score, self.parent
+        seen, closed = self.seen, self.closed
+        gen = self.next_generation()
+
+        start = start_y * w + start_x
+        goal = end_y * w + end_x
+        padded_goal = (end_y + 1) * stride + end_x + 1
+        seen[start] = gen
+        g_score[start] = 0.0
+        parent[start] = -1
+        open_set = [(octile(start_x, start_y, end_x, end_y), 0, start)]
+        counter = 0
+        expanded = 0
+
+        while open_set:
+            _, _, current = heapq.heappop(open_set)
+            if closed[current] == gen:
+                continue
+            if current == goal:
+                self.finish_search(expanded)
+                return self.reconstruct_jumps(current)
+            closed[current] = gen
+            expanded += 1
+
+            cy, cx = divmod(current, w)
+            padded = (cy + 1) * stride + cx + 1
+            current_g = g_score[current]
+            for dx, dy in pruned_directions(pad, stride, padded, cx, cy, parent[current], w):
+                jump_point = jump(pad, stride, padded, dx, dy, padded_goal)
+                if jump_point is None:
+                    continue
+                py, px = divmod(jump_point, stride)
+                nx, ny = px - 1, py - 1
+                neighbor = ny * w + nx
+                if closed[neighbor] == gen:
+                    continue
+                tentative_g_score = current_g + octile(cx, cy, nx, ny)  # Jumps are straight or diagonal runs
+                if seen[neighbor] != gen or tentative_g_score < g_score[neighbor]:
+                    seen[neighbor] = gen
+                    g_score[neighbor] = tentative_g_score
+                    parent[neighbor] = current
                     counter += 1
-                    heapq.heappush(open_set, (neighbor.f_score, counter, neighbor))
+                    f_score = tentative_g_score + octile(nx, ny, end_x, end_y)
+                    heapq.heappush(open_set, (f_score, counter, neighbor))
+
+        self.finish_search(expanded)
+        return []
+
+    def padded_blocked(self):
+        """
+        Passability with a one-cell blocked border, rebuilt when the version
+        changes, so jumps can step through it without bounds checks.
+        """
+        if self.padded_version != self.version or self.padded is None:
+            w, h = self.width, self.height
+            stride = w + 2
+            pad = bytearray(b"\x01") * (stride * (h + 2))
+            for y in range(h):
+                row = (y + 1) * stride + 1
+                pad[row:row + w] = self.blocked[y * w:(y + 1) * w]
+            self.padded = pad
+            self.padded_version = self.version
+        return self.padded
+
+    def snapshot(self):
+        """Passability as bytes for other processes, copied once per version."""
+        if self.frozen_version != self.version or self.frozen is None:
+            self.frozen = bytes(self.blocked)
+            self.frozen_version = self.version
+        return self.frozen
+
+    def reconstruct_jumps(self, current):
+        """Like reconstruct_path, filling in the cells between consecutive jump points."""
+        jump_points = self.reconstruct_path(current)
+        path = [jump_points[0]]
+        for x2, y2 in jump_points[1:]:
+            x, y = path[-1]
+            dx = (x2 > x) - (x2 < x)
+            dy = (y2 > y) - (y2 < y)
+            while (x, y) != (x2, y2):
+                x += dx
+                y += dy
+                path.append((x, y))
+        return path
+
+    def reconstruct_path(self, current):
+        w = self.width
+        parent = self.parent
+        path = []
+        while current != -1:
+            y, x = divmod(current, w)
+            path.append((x, y))
+            current = parent[current]
+        path.reverse()
+        return path
+
+
+class PathCache:
+    """
+    Bounded LRU cache of paths keyed on (start cell, end cell, grid version).
+    A passability change bumps the NavGrid version, so stale paths can never
+    be hit again and simply age out.
+    """
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.memory = 0  # approximate bytes held by the cached paths
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        path = self.entries.get(key)
+        if path is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return path
+
+    def put(self, key, path):
+        if key in self.entries:
+            self.memory -= path_size(self.entries[key])
+        self.entries[key] = path
+        self.entries.move_to_end(key)
+        self.memory += path_size(path)
+        while len(self.entries) > self.max_entries:
+            _, evicted = self.entries.popitem(last=False)
+            self.memory -= path_size(evicted)
+
+    def clear(self):
+        self.entries.clear()
+        self.memory = 0
+
+    def discard_stale(self, version, dirty_cells=None):
+        """NavGrid subscriber: frees paths computed for an older grid version."""
+        for key in [key for key in self.entries if key[2] != version]:
+            self.memory -= path_size(self.entries.pop(key))
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def path_size(path):
+    return sys.getsizeof(path) + sum(sys.getsizeof(cell) for cell in path)
+
+def octile(x1, y1, x2, y2):
+    dx = abs(x1 - x2)
+    dy = abs(y1 - y2)
+    return dx + dy + (DIAGONAL_COST - 2) * min(dx, dy)
+
+def distance(node1, node2):
+    return octile(node1.x, node1.y, node2.x, node2.y)
+
+def pruned_directions(pad, stride, index, x, y, parent_index, width):
+    """
+    Natural and forced neighbour directions for the cell at padded index,
+    reached from parent_index (an unpadded index, -1 for the start).
+    """
+    if parent_index == -1:
+        return DIRECTIONS
+    py, px = divmod(parent_index, width)
+    dx = (x > px) - (x < px)
+    dy = (y > py) - (y < py)
+    if dx and dy:
+        directions = [(dx, 0), (0, dy), (dx, dy)]
+        if pad[index - dx] and not pad[index - dx + dy * stride]:
+            directions.append((-dx, dy))
+        if pad[index - dy * stride] and not pad[index + dx - dy * stride]:
+            directions.append((dx, -dy))
+    elif dx:
+        directions = [(dx, 0)]
+        if pad[index + stride] and not pad[index + stride + dx]:
+            directions.append((dx, 1))
+        if pad[index - stride] and not pad[index - stride + dx]:
+            directions.append((dx, -1))
+    else:
+        directions = [(0, dy)]
+        if pad[index + 1] and not pad[index + 1 + dy * stride]:
+            directions.append((1, dy))
+        if pad[index - 1] and not pad[index - 1 + dy * stride]:
+            directions.append((-1, dy))
+    return directions
+
+def jump(pad, stride, index, dx, dy, goal):
+    """Follows (dx, dy) from a padded index to the next jump point, or None at a wall."""
+    if dx and dy:
+        step = dx + dy * stride
+        while True:
+            index += step
+            if pad[index]:
+                return None
+            if index == goal:
+                return index
+            if (pad[index - dx] and not pad[index - dx + dy * stride]) or \
+               (pad[index - dy * stride] and not pad[index + dx - dy * stride]):
+                return index
+            if jump_straight(pad, index, dx, stride, goal) is not None or \
+               jump_straight(pad, index, dy * stride, 1, goal) is not None:
+                return index
+    if dx:
+        return jump_straight(pad, index, dx, stride, goal)
+    return jump_straight(pad, index, dy * stride, 1, goal)
+
+def jump_straight(pad, index, step, side, goal):
+    """Horizontal (side = stride) or vertical (side = 1) run until a forced neighbour, the goal or a wall."""
+    while True:
+        index += step
+        if pad[index]:
+            return None
+        if index == goal:
+            return index
+        if (pad[index + side] and not pad[index + side + step]) or \
+           (pad[index - side] and not pad[index - side + step]):
+            return index
+
+
+_shared_nav = None
+
+def as_nav_grid(grid):
+    """
+    Returns grid itself if it is already a NavGrid, otherwise loads the
+    list-of-rows grid into a module-level NavGrid that is reused across calls.
+
+    List grids are deprecated: every call re-reads all W*H cells to pick up
+    changes, so callers should keep a NavGrid and update it with set_blocked().
+    """
+    global _shared_nav
+    if isinstance(grid, NavGrid):
+        return grid
+    warnings.warn("list-of-rows grids are deprecated; pass a NavGrid", DeprecationWarning, stacklevel=3)
+    if _shared_nav is None or (_shared_nav.width, _shared_nav.height) != (len(grid[0]), len(grid)):
+        _shared_nav = NavGrid(len(grid[0]), len(grid))
+    _shared_nav.load(grid)
+    return _shared_nav
+
+def find_nearest_walkable(grid, target_x, target_y):
+    cell = as_nav_grid(grid).find_nearest_walkable(target_x, target_y)
+    return Node(*cell) if cell else None
+
+def a_star(grid, start_coords, end_coords, algorithm=None):
+    """Thin wrapper around NavGrid.find_path returning a list of Nodes."""
+    nav = as_nav_grid(grid)
+    return [Node(x, y) for x, y in nav.find_path(start_coords, end_coords, algorithm)]
+
+
+class FlowField:
+    """
+    Shared direction field towards the nearest of a set of targets.
+
+    One multi-source Dijkstra runs outward from every cell covered by the
+    targets; afterwards any unit can read its next step, and which target the
+    field is leading it to, with a table lookup instead of its own search.
+    """
+    def __init__(self, nav, cell_size):
+        self.nav = nav
+        self.cell_size = cell_size
+        size = nav.width * nav.height
+        self.unreached = array('d', [math.inf]) * size
+        self.no_cell = array('l', [-1]) * size
+        self.distance = array('d', self.unreached)
+        self.next_cell = array('l', self.no_cell)  # neighbour one step closer to a target
+        self.owner = array('l', self.no_cell)      # index into self.targets
+        self.targets = []
+        self.key = None
+        self.version = None
+
+    def target_cells(self, target):
+        rect = target.rect
+        size = self.cell_size
+        return [(x, y)
+                for y in range(rect.top // size, (rect.bottom - 1) // size + 1)
+                for x in range(rect.left // size, (rect.right - 1) // size + 1)
+                if self.nav.in_bounds(x, y)]
+
+    def update(self, targets):
+        """Rebuilds the field if the target cells or the passability changed."""
+        live = [target for target in targets if target.hp > 0]
+        sources = [self.target_cells(target) for target in live]
+        key = tuple(tuple(cells) for cells in sources)
+        if key == self.key and self.nav.version == self.version and live == self.targets:
+            return False
+        self.key = key
+        self.version = self.nav.version
+        self.build(live, sources)
+        return True
+
+    def build(self, targets, sources):
+        nav = self.nav
+        w, h = nav.width, nav.height
+        blocked = nav.blocked
+        distance = self.distance
+        next_cell = self.next_cell
+        owner = self.owner
+        distance[:] = self.unreached
+        next_cell[:] = self.no_cell
+        owner[:] = self.no_cell
+        self.targets = targets
+
+        open_set = []
+        for target_index, cells in enumerate(sources):
+            for x, y in cells:
+                i = y * w + x
+                if distance[i] != 0.0:
+                    distance[i] = 0.0
+                    owner[i] = target_index
+                    open_set.append((0.0, i))
+        heapq.heapify(open_set)
+
+        while open_set:
+            current_distance, current = heapq.heappop(open_set)
+            if current_distance > distance[current]:
+                continue
+            cy, cx = divmod(current, w)
+            for dx, dy, cost in STEPS:
+                nx = cx + dx
+                ny = cy + dy
+                if 0 <= nx < w and 0 <= ny < h:
+                    neighbor = ny * w + nx
+                    if blocked[neighbor]:
+                        continue  # Only target cells may be walls
+                    new_distance = current_distance + cost
+                    if new_distance < distance[neighbor]:
+                        distance[neighbor] = new_distance
+                        next_cell[neighbor] = current
+                        owner[neighbor] = owner[current]
+                        heapq.heappush(open_set, (new_distance, neighbor))
+
+    def target_at(self, x, y):
+        """The target the field leads to from (x, y), or None if unreachable."""
+        index = self.owner[y * self.nav.width + x]
+        return self.targets[index] if index != -1 else None
 
-    return []  # No path found
\ No newline at end of file
+    def next_step(self, x, y):
+        """
+        The next walkable cell towards the target, or None when standing on
+        or beside the target (or when no target is reachable).
+        """
+        n = self.next_cell[y * self.nav.width + x]
+        if n == -1 or self.nav.blocked[n]:
+            return None
+        y, x = divmod(n, self.nav.width)
+        return x, y
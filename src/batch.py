@@ -0,0 +1,198 @@
+# batch.py
+#
+# Optional data-oriented backend for the combat simulation (needs numpy).
+# Position, waypoint, speed, hp, attack, range and cooldown of every unit,
+# enemy and building live in parallel arrays indexed by slot, and
+# CombatArrays.step() moves, range-checks and cools down all of them at once.
+# The AlliedUnit / EnemyUnit / Building objects stay as the views used for
+# drawing and input; their per-entity decisions (target selection, path
+# planning, attacks) only run for the few slots whose state changed this tick.
+# The decision mask covers every case in which Unit.plan_path would change a
+# unit on the object backend. What still differs is the order within a tick:
+# the arrays decide for every slot, then move every slot, then resolve the
+# attacks, where the object backend runs decide, move and attack per unit in
+# list order. Units fighting buildings play a seeded game identically on
+# both backends (headless.py --parity checks this); units chasing or fighting
+# other moving units can end a tick a step apart.
+
+try:
+    import numpy as np
+except ImportError:  # The object backend is used instead
+    np = None
+
+from constants import *
+
+REPLAN_DISTANCE = 2 * GRID_SIZE  # Same threshold as Unit.plan_path
+
+class CombatArrays:
+    """Struct-of-arrays storage for every combatant, indexed by slot."""
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.count = 0  # Slots in use or freed; [:count] covers every live entity
+        self.free = []
+        self.objects = [None] * capacity
+
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.waypoint_x = np.zeros(capacity)
+        self.waypoint_y = np.zeros(capacity)
+        self.plan_x = np.full(capacity, np.nan)  # Target position when the path was planned
+        self.plan_y = np.full(capacity, np.nan)
+        self.speed = np.zeros(capacity)
+        self.range = np.zeros(capacity)
+        self.cooldown = np.zeros(capacity)
+        self.hp = np.zeros(capacity, dtype=np.int64)
+        self.target = np.full(capacity, -1, dtype=np.int64)
+        self.has_waypoint = np.zeros(capacity, dtype=bool)
+        self.has_path = np.zeros(capacity, dtype=bool)  # Path and destination both set; Unit.plan_path replans otherwise
+        self.waiting = np.zeros(capacity, dtype=bool)  # Search queued on the PathScheduler
+        self.flow = np.zeros(capacity, dtype=bool)  # Enemy on a flow field, which can replace a queued search
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.mobile = np.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return self.count - len(self.free)
+
+    def grow(self):
+        extra = self.capacity
+        for name, value in vars(self).items():
+            if isinstance(value, np.ndarray):
+                fill = {"plan_x": np.nan, "plan_y": np.nan, "target": -1}.get(name, 0)
+                setattr(self, name, np.concatenate([value, np.full(extra, fill, dtype=value.dtype)]))
+        self.objects.extend([None] * extra)
+        self.capacity += extra
+
+    # --- Entities ---
+    def add(self, obj, mobile=True):
+        """Gives obj a slot; buildings are added with mobile=False as static targets."""
+        if self.free:
+            slot = self.free.pop()
+        else:
+            if self.count == self.capacity:
+                self.grow()
+            slot = self.count
+            self.count += 1
+
+        obj.combat_slot = slot
+        self.objects[slot] = obj
+        self.x[slot] = obj.x
+        self.y[slot] = obj.y
+        self.hp[slot] = obj.hp
+        self.alive[slot] = True
+        self.mobile[slot] = mobile
+        self.speed[slot] = obj.speed if mobile else 0
+        self.range[slot] = obj.get_attack_range() if mobile else 0
+        self.cooldown[slot] = obj.attack_cooldown if mobile else 0
+        self.target[slot] = -1
+        self.has_waypoint[slot] = False
+        if mobile:
+            self.push(obj)
+        return slot
+
+    def remove(self, obj):
+        slot = obj.combat_slot
+        obj.combat_slot = None
+        self.objects[slot] = None
+        self.alive[slot] = False
+        self.mobile[slot] = False
+        self.has_waypoint[slot] = False
+        self.target[:self.count][self.target[:self.count] == slot] = -1  # Nobody keeps aiming at a reused slot
+        self.free.append(slot)
+
+    def push(self, obj):
+        """Copies a view's target, next waypoint and position into its slot after Python code changed them."""
+        slot = obj.combat_slot
+        self.x[slot] = obj.x
+        self.y[slot] = obj.y
+        target = obj.target
+        self.target[slot] = target.combat_slot if target is not None and target.combat_slot is not None else -1
+        self.plan_x[slot], self.plan_y[slot] = obj.previous_target_position or (np.nan, np.nan)
+        self.has_path[slot] = bool(obj.path) and obj.destination is not None
+        self.waiting[slot] = obj.path_request is not None
+        self.flow[slot] = getattr(obj, "flow_field", None) is not None
+        if obj.path:
+            self.waypoint_x[slot] = obj.path[0].x * GRID_SIZE
+            self.waypoint_y[slot] = obj.path[0].y * GRID_SIZE
+            self.has_waypoint[slot] = True
+        elif obj.destination:
+            self.waypoint_x[slot], self.waypoint_y[slot] = obj.destination
+            self.has_waypoint[slot] = True
+        else:
+            self.has_waypoint[slot] = False
+
+    def sync_hp(self, obj):
+        if obj.combat_slot is not None:
+            self.hp[obj.combat_slot] = obj.hp
+
+    # --- Update ---
+    def target_state(self, n):
+        """(valid, in_range, target slot) for the first n slots."""
+        target = self.target[:n]
+        safe = np.where(target >= 0, target, 0)
+        valid = (target >= 0) & self.alive[safe] & (self.hp[safe] > 0)
+        distance = np.hypot(self.x[safe] - self.x[:n], self.y[safe] - self.y[:n])
+        return valid, valid & (distance <= self.range[:n]), safe
+
+    def step(self, dt, grid, game_messages):
+        """Advance every mobile combatant by dt milliseconds."""
+        n = self.count
+        mobile = self.mobile[:n]
+        has_path = self.has_path[:n]
+        waiting = self.waiting[:n]
+        valid, in_range, target = self.target_state(n)
+
+        # --- Decisions, only for slots whose situation changed ---
+        # Same triggers as Unit.plan_path: in range with a path or search to drop; out of range with no path
+        # (a destination alone doesn't count) or with the target moved since planning, unless a search is
+        # queued; or queued and on a flow field, which EnemyUnit.plan_path takes over once it leads to the target
+        target_moved = np.hypot(self.x[target] - self.plan_x[:n], self.y[target] - self.plan_y[:n]) > REPLAN_DISTANCE
+        attention = mobile & (~valid
+                              | (in_range & (self.has_waypoint[:n] | waiting))
+                              | (valid & ~in_range & ~has_path & (~waiting | self.flow[:n]))
+                              | (valid & ~in_range & ~waiting & has_path & target_moved))
+        for slot in np.flatnonzero(attention).tolist():
+            obj = self.objects[slot]
+            obj.handle_target_selection()
+            obj.plan_path(grid)
+            self.push(obj)
+
+        # --- Movement ---
+        movers = np.flatnonzero(mobile & self.has_waypoint[:n])
+        if len(movers):
+            dx = self.waypoint_x[movers] - self.x[movers]
+            dy = self.waypoint_y[movers] - self.y[movers]
+            distance = np.hypot(dx, dy)
+            travel = self.speed[movers] * (dt / 1000)
+            reached = distance <= travel
+            scale = np.where(reached, 1.0, travel / np.where(distance > 0, distance, 1.0))
+            self.x[movers] += dx * scale
+            self.y[movers] += dy * scale
+            arrived = movers[reached]
+            self.x[arrived] = self.waypoint_x[arrived]
+            self.y[arrived] = self.waypoint_y[arrived]
+
+            objects = self.objects
+            for slot, x, y in zip(movers.tolist(), self.x[movers].tolist(), self.y[movers].tolist()):
+                objects[slot].move_to(x, y)
+            for slot in arrived.tolist():
+                obj = objects[slot]
+                if obj.path:
+                    obj.path.pop(0)
+                obj.destination = (obj.path[0].x * GRID_SIZE, obj.path[0].y * GRID_SIZE) if obj.path else None
+                self.push(obj)
+
+        # --- Combat ---
+        valid, in_range, target = self.target_state(n)
+        cooldown = self.cooldown[:n]
+        for slot in np.flatnonzero(mobile & in_range & (cooldown <= 0)).tolist():
+            obj = self.objects[slot]
+            victim = obj.target
+            if victim is None or victim.hp <= 0:  # Killed by an earlier attacker this tick
+                continue
+            obj.attack_target(game_messages)
+            self.sync_hp(victim)
+            if obj.target is None:
+                self.target[slot] = -1
+            cooldown[slot] = obj.get_attack_cooldown()
+
+        np.subtract(cooldown, dt, out=cooldown, where=mobile & (cooldown > 0))
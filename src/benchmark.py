@@ -0,0 +1,241 @@
+# benchmark.py
+#
+# Reproducible timings for the code paths that decide our frame time, run
+# headless on seeded terrain:
+#
+#   python src/benchmark.py --out bench.json
+#   python src/benchmark.py --compare bench.json   # exits 1 on regressions
+#   python src/benchmark.py --workload session.jsonl  # also time replaying a recorded session
+#   python src/benchmark.py --snapshot battle.rts     # also time loading and stepping a saved game
+
+import os
+
+# Must be set before pygame initialises its video subsystem
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import contextlib
+import itertools
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+from constants import *
+from entities import *
+from astar import a_star
+from headless import place_castle
+from procedural import TerrainGenerator
+from replay import replay_headless
+import savegame
+from simulation import Simulation
+import batch
+import targeting
+
+def measure(fn, repeat=5, number=1, setup=None):
+    """Times fn, returning per-call milliseconds over `repeat` rounds of `number` calls."""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) * 1000 / number)
+    return {
+        "median_ms": statistics.median(times),
+        "min_ms": min(times),
+        "max_ms": max(times),
+        "repeat": repeat,
+        "number": number,
+    }
+
+def build_scenario(seed, building_count, enemy_count, backend="objects"):
+    """A seeded Simulation with a castle, building_count other buildings and enemy_count enemies."""
+    random.seed(seed)
+    sim = Simulation(seed, SCREEN_WIDTH, SCREEN_HEIGHT, backend=backend, deterministic=True)  # Screen-sized, comparable with older baselines
+    sim.gold = float("inf")
+    for resource in sim.resources:
+        sim.resources[resource] = float("inf")
+
+    place_castle(sim)
+    building_types = [building_type for building_type in BUILDING_DATA if building_type != "Castle"]
+    attempts = 0
+    while len(sim.buildings) < building_count + 1 and attempts < building_count * 50:
+        attempts += 1
+        sim.building_cooldown = 0
+        x = random.randrange(sim.grid_width) * GRID_SIZE
+        y = random.randrange(sim.grid_height) * GRID_SIZE
+        sim.place_building(random.choice(building_types), x, y)
+
+    for enemy in spawn_enemies(sim.buildings, sim.units, enemy_count, 1, sim.grid_width, sim.grid_height, sim.rng):
+        sim.add_enemy(enemy)
+    return sim
+
+def expansions(nav, pairs, algorithm):
+    """Mean cells expanded per query."""
+    total = 0
+    for start, end in pairs:
+        nav.find_path(start, end, algorithm)
+        total += nav.expanded
+    return total / len(pairs)
+
+def random_cells(sim, count, rng):
+    return [(rng.randrange(sim.grid_width), rng.randrange(sim.grid_height)) for _ in range(count)]
+
+def run_benchmarks(seed, enemy_counts, building_counts, repeat, workloads=(), snapshots=()):
+    results = {}
+    rng = random.Random(seed)
+
+    terrain_generator = TerrainGenerator(SCREEN_WIDTH, SCREEN_HEIGHT, GRID_SIZE, seed)
+    results["generate_terrain"] = measure(terrain_generator.generate_terrain, repeat)
+
+    for building_count in building_counts:
+        sim = build_scenario(seed, building_count, 0)
+        tag = f"buildings={building_count}"
+        cache, sim.nav_grid.path_cache = sim.nav_grid.path_cache, None  # time real searches
+
+        pair_list = list(zip(random_cells(sim, 50, rng), random_cells(sim, 50, rng)))
+        for name, algorithm in (("a_star", "astar"), ("jps", "jps")):
+            pairs = itertools.cycle(pair_list)
+            results[f"{name}[{tag}]"] = measure(lambda: a_star(sim.nav_grid, *next(pairs), algorithm), repeat, number=50)
+            results[f"{name}[{tag}]"]["expanded"] = expansions(sim.nav_grid, pair_list, algorithm)
+
+        cells = [sim.building_cells(building)[0] for building in sim.buildings] or random_cells(sim, 50, rng)
+        walls = itertools.cycle(cells)
+        results[f"find_nearest_walkable[{tag}]"] = measure(
+            lambda: sim.nav_grid.find_nearest_walkable(*next(walls)), repeat, number=len(cells))
+
+        results[f"update_grid.full[{tag}]"] = measure(sim.update_grid, repeat)
+        if sim.buildings:
+            footprint = sim.building_cells(sim.buildings[-1])
+            results[f"update_grid.footprint[{tag}]"] = measure(lambda: sim.update_grid(footprint), repeat, number=100)
+        sim.nav_grid.path_cache = cache
+
+    # Long-distance paths on a large map: plain A* against the HPA* hierarchy
+    large = Simulation(seed, width=256 * GRID_SIZE, height=256 * GRID_SIZE)
+    nav = large.nav_grid
+    walkable = [cell for cell in random_cells(large, 400, rng) if not nav.is_blocked(*cell)]
+    pairs = itertools.cycle(zip(walkable[0::2], walkable[1::2]))
+    results["a_star[map=256x256]"] = measure(lambda: nav.search(*next(pairs)), repeat, number=10)
+    results["jps[map=256x256]"] = measure(lambda: nav.jump_search(*next(pairs)), repeat, number=10)
+    results["hpa[map=256x256]"] = measure(lambda: nav.hierarchy.find_path(*next(pairs)), repeat, number=10)
+    footprint = [(128 + dx, 128 + dy) for dx in range(2) for dy in range(2)]
+    toggle = itertools.cycle((True, False))
+    def place_and_commit():
+        blocked = next(toggle)
+        for x, y in footprint:
+            nav.set_blocked(x, y, blocked)
+        nav.commit()
+    results["hpa.rebuild[map=256x256]"] = measure(place_and_commit, repeat, number=10)
+
+    for wave in (1, 10, 50):
+        results[f"spawn_enemies[wave={wave}]"] = measure(
+            lambda: spawn_enemies([], [], wave, ENEMY_SPAWN_RATE, SCREEN_WIDTH // GRID_SIZE, SCREEN_HEIGHT // GRID_SIZE), repeat)
+
+    for enemy_count in enemy_counts:
+        for building_count in building_counts:
+            sim = build_scenario(seed, building_count, enemy_count)
+            tag = f"enemies={enemy_count},buildings={building_count}"
+            if sim.enemies:
+                enemies = itertools.cycle(sim.enemies)
+                results[f"find_nearest_target[{tag}]"] = measure(
+                    lambda: next(enemies).find_nearest_target(), repeat, number=len(sim.enemies))
+                if targeting.np is not None:  # Every enemy at once, cost per enemy
+                    def batch_nearest():
+                        sim.targeting.candidates = {}
+                        sim.targeting.nearest(sim.enemies, (sim.building_index, sim.ally_index))
+                    results[f"find_nearest_target.batch[{tag}]"] = measure(batch_nearest, repeat)
+                    for stat in ("median_ms", "min_ms", "max_ms"):
+                        results[f"find_nearest_target.batch[{tag}]"][stat] /= len(sim.enemies)
+            results[f"frame_update[{tag}]"] = measure(lambda: sim.step(SIM_DT), repeat)
+            if batch.np is not None:
+                sim = build_scenario(seed, building_count, enemy_count, backend="numpy")
+                results[f"frame_update.numpy[{tag}]"] = measure(lambda: sim.step(SIM_DT), repeat)
+
+    for path in workloads:  # Recorded sessions replayed deterministically, start to finish
+        results[f"replay[{os.path.basename(path)}]"] = measure(lambda: replay_headless(path).close(), repeat)
+
+    for path in snapshots:  # Saved mid-game states
+        tag = f"snapshot={os.path.basename(path)}"
+        results[f"load[{tag}]"] = measure(lambda: savegame.load(path, deterministic=True).close(), repeat)
+        sim = savegame.load(path, deterministic=True)
+        results[f"frame_update[{tag}]"] = measure(lambda: sim.step(SIM_DT), repeat)
+
+    return results
+
+def compare(results, baseline, threshold, min_ms=0.05):
+    """
+    Returns the names whose median got slower than baseline by more than
+    threshold, ignoring differences under min_ms that are just timer noise.
+    """
+    regressions = []
+    print(f"{'benchmark':60} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["median_ms"]
+        after = result["median_ms"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > threshold and after - before > min_ms:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:60} {before:10.3f} {after:10.3f} {change:+8.0%}{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulation hot paths.")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--enemies", default="10,100,1000", help="comma-separated enemy counts")
+    parser.add_argument("--buildings", default="0,50,200", help="comma-separated building counts")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workload", action="append", default=[], help="recorded session to replay and time (repeatable)")
+    parser.add_argument("--snapshot", action="append", default=[], help="save file to load and step (repeatable)")
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before flagging, e.g. 0.2 = 20%%")
+    parser.add_argument("--min-ms", type=float, default=0.05, help="ignore slowdowns smaller than this many ms")
+    args = parser.parse_args(argv)
+
+    enemy_counts = [int(n) for n in args.enemies.split(",") if n]
+    building_counts = [int(n) for n in args.buildings.split(",") if n]
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):  # silence the game's diagnostics
+        results = run_benchmarks(args.seed, enemy_counts, building_counts, args.repeat, args.workload, args.snapshot)
+
+    report = {
+        "meta": {
+            "seed": args.seed,
+            "enemies": enemy_counts,
+            "buildings": building_counts,
+            "repeat": args.repeat,
+            "workloads": args.workload,
+            "snapshots": args.snapshot,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold, args.min_ms)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+            sys.exit(1)
+    else:
+        for name, result in results.items():
+            expanded = f"  {result['expanded']:8.0f} expanded" if "expanded" in result else ""
+            print(f"{name:60} {result['median_ms']:10.3f} ms{expanded}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# camera.py
+
+import pygame
+from constants import *
+
+class Camera:
+    """
+    The part of the world shown on screen.
+
+    rect is the visible area in world pixels; its topleft is the origin that
+    drawing code subtracts from world positions. The camera never leaves the
+    world, so a world no bigger than the screen simply stays at (0, 0).
+    """
+    def __init__(self, view_width, view_height, world_width, world_height):
+        self.rect = pygame.Rect(0, 0, view_width, view_height)
+        self.world_rect = pygame.Rect(0, 0, world_width, world_height)
+        self.x = 0.0  # Sub-pixel position, so slow pans still move
+        self.y = 0.0
+
+    @property
+    def origin(self):
+        return self.rect.topleft
+
+    def move_to(self, x, y):
+        """Places the view's top-left corner at world (x, y), clamped to the world."""
+        self.x = max(0.0, min(x, self.world_rect.width - self.rect.width))
+        self.y = max(0.0, min(y, self.world_rect.height - self.rect.height))
+        self.rect.topleft = (int(self.x), int(self.y))
+
+    def center_on(self, x, y):
+        self.move_to(x - self.rect.width / 2, y - self.rect.height / 2)
+
+    def pan(self, dx, dy):
+        self.move_to(self.x + dx, self.y + dy)
+
+    def update(self, dt, mouse_pos, pressed_keys, mouse_focused=True):
+        """Pans with the arrow keys or by holding the mouse at a screen edge. dt in ms."""
+        dx = (pressed_keys[pygame.K_RIGHT] - pressed_keys[pygame.K_LEFT])
+        dy = (pressed_keys[pygame.K_DOWN] - pressed_keys[pygame.K_UP])
+        if mouse_focused:
+            mx, my = mouse_pos
+            if mx < CAMERA_EDGE_MARGIN:
+                dx = -1
+            elif mx >= self.rect.width - CAMERA_EDGE_MARGIN:
+                dx = 1
+            if my < CAMERA_EDGE_MARGIN:
+                dy = -1
+            elif my >= self.rect.height - CAMERA_EDGE_MARGIN:
+                dy = 1
+        if dx or dy:
+            step = CAMERA_SPEED * dt / 1000
+            self.pan(dx * step, dy * step)
+        return bool(dx or dy)
+
+    # --- Conversions ---
+    def to_world(self, pos):
+        return pos[0] + self.rect.x, pos[1] + self.rect.y
+
+    def to_screen(self, rect):
+        return rect.move(-self.rect.x, -self.rect.y)
+
+    def view(self, margin=0):
+        """World rect to look up visible objects in, grown by margin for labels drawn outside an object's rect."""
+        return self.rect.inflate(2 * margin, 2 * margin)
@@ -5,15 +5,50 @@
 SCREEN_WIDTH = 768
 SCREEN_HEIGHT = 576
 GRID_SIZE = 16
+WORLD_WIDTH = SCREEN_WIDTH * 2  # The map scrolls; the screen shows a camera-sized part of it
+WORLD_HEIGHT = SCREEN_HEIGHT * 2
+CAMERA_SPEED = 600  # Pixels per second panned with the arrow keys or at the screen edge
+CAMERA_EDGE_MARGIN = 8  # Mouse this close to a screen edge scrolls the camera
 FPS = 30
+SIM_TICK_RATE = 30  # Simulation ticks per second of game time, independent of FPS
+SIM_DT = 1000 / SIM_TICK_RATE  # Milliseconds of game time per tick
+MAX_TICKS_PER_FRAME = 32  # Beyond this a slow frame drops game time instead of spiralling
+GAME_SPEEDS = (1, 2, 4, 8)  # Fast-forward multipliers cycled with 'F'
 BUILDING_COOLDOWN_TIME = 1000
 MESSAGE_DURATION = 3000
+MESSAGE_CAPACITY = 12  # Lines the message feed holds; the oldest goes first when it is full
 WAVE_INTERVAL = 30000
 ENEMY_SPAWN_RATE = 1
 UNIT_ATTACK_RANGE = 50
 ENEMY_ATTACK_RANGE = 50
 UNIT_ATTACK_COOLDOWN = 2000  
 ENEMY_ATTACK_COOLDOWN = 2000
+PATH_CACHE_SIZE = 512
+HPA_MIN_CELLS = 128 * 128  # Nav grids at least this big path with HPA* instead of plain A*
+HPA_CLUSTER_SIZE = 16  # Cells per side of an HPA* cluster
+HPA_LONG_ENTRANCE = 6  # Openings this wide get an entrance at each end instead of one in the middle
+PATH_BUDGET_MS = 2.0  # Wall time per tick the PathScheduler spends on queued searches
+PATH_SLICE_NODES = 256  # Expansions between budget checks; a search resumes from here next tick
+PATH_PRIORITY_PLAYER = 0  # Player move orders are searched before...
+PATH_PRIORITY_RETARGET = 1  # ...units and enemies replanning towards their targets
+PATH_BUDGET_NODES = 4096  # Per-tick expansion budget used instead of PATH_BUDGET_MS by deterministic simulations
+PATH_WORKERS = 0  # Worker processes searching paths off the main thread; 0 searches in time slices instead
+RETARGET_INTERVAL = 15  # Ticks between a unit's scheduled checks for a better target, staggered by entity id
+RETARGET_SWITCH_RATIO = 0.75  # A scheduled check switches only to a target this much closer than the current one
+TARGET_MATRIX_CELLS = 1 << 18  # Largest query x candidate distance matrix computed in one numpy call
+TARGET_BATCH_MIN = 8  # Fewer queries than this are answered one by one; numpy setup would cost more
+TRACE_BUFFER_SIZE = 4096  # Trace records kept in memory for tracing.tracer.dump()
+TRACE_DUMP_FILE = "trace_dump.log"  # Written by the 'L' key
+SAVE_FILE = "quicksave.rts"  # Written by F5, loaded by F9
+PROFILE_WINDOW = 120  # Frames the profiler overlay takes its p50/p95/max over
+PROFILE_REFRESH_FRAMES = 15  # Frames between redraws of the overlay's stats table
+TEXT_CACHE_SIZE = 1024  # Rendered text surfaces kept by text.render_text
+SPATIAL_BUCKET_SIZE = GRID_SIZE * 4
+TERRAIN_CHUNK_SIZE = 64  # Cells per side of an independently generated terrain chunk
+TERRAIN_PARALLEL_CELLS = 256 * 256  # Maps at least this big generate chunks in worker processes
+TERRAIN_WORKERS = None  # Worker processes for large maps; None uses every CPU
+ENTITY_BACKEND = "objects"  # "numpy" steps every combatant in batches (needs numpy)
+DIRTY_RECT_RENDERING = True  # Push only changed regions to the display ('R' toggles)
 
 # Colors
 WHITE = (255, 255, 255)
@@ -5,6 +5,9 @@ import pygame
 from constants import *
 from utils import *
 from astar import a_star, Node
+from assets import get_image
+from text import get_font, render_text
+from tracing import tracer, DEBUG, INFO, PATHING, TARGETING, MOVEMENT, COMBAT
 
 pygame.init()
 
@@ -16,22 +19,52 @@ class GameObject:
         # Use a default image path if not provided
         default_image = 'default_unit.png'  # Make sure this exists
         try:
-            self.image = pygame.transform.scale(
-                pygame.image.load(image_path or default_image), 
-                size
-            )
-        except pygame.error:
+            self.image = get_image(image_path or default_image, size)  # Shared, loaded once per (path, size)
+        except (pygame.error, FileNotFoundError):
             # Fallback to a simple surface if image loading fails
             self.image = pygame.Surface(size)
             self.image.fill(BLACK)  # Fallback image
         
         self.rect = self.image.get_rect(topleft=(x, y))
-        self.font = pygame.font.Font(None, 12)
+        self.prev_x = x  # Position at the start of the current tick, for render interpolation
+        self.prev_y = y
+        self.font = get_font(12)
+        self.hp_label = None  # HP text surface, re-rendered only when hp changes
+        self.hp_label_value = None
+        self.spatial_index = None  # Set by SpatialHash.insert
+        self.combat_slot = None  # Set by CombatArrays.add when the numpy backend is on
+        self.entity_id = None  # Set by Simulation.assign_id; recorded commands refer to objects by it
+
+    def move_to(self, x, y):
+        """Moves the object and keeps its spatial index bucket up to date."""
+        self.x = x
+        self.y = y
+        self.rect.topleft = (x, y)
+        if self.spatial_index is not None:
+            self.spatial_index.move(self)
 
-    def draw(self, screen):
-        screen.blit(self.image, self.rect)
-        hp = self.font.render(f"HP: {self.hp}", True, BLACK)
-        screen.blit(hp, (self.rect.centerx - hp.get_width() // 2, self.rect.top + self.rect.height + 5))
+    def draw_rect(self, alpha=1.0, origin=(0, 0)):
+        """
+        self.rect placed alpha of the way from the previous tick's position to
+        the current one, in screen coordinates for a camera at world origin.
+        """
+        ox, oy = origin
+        if alpha >= 1.0 or (self.prev_x == self.x and self.prev_y == self.y):
+            return self.rect.move(-ox, -oy) if ox or oy else self.rect
+        x = self.prev_x + (self.x - self.prev_x) * alpha
+        y = self.prev_y + (self.y - self.prev_y) * alpha
+        return self.rect.move(int(x) - self.rect.x - ox, int(y) - self.rect.y - oy)
+
+    def draw(self, screen, alpha=1.0, origin=(0, 0)):
+        """Draws the object and its HP label, returning the screen area touched."""
+        rect = self.draw_rect(alpha, origin)
+        image_rect = screen.blit(self.image, rect)
+        if self.hp != self.hp_label_value:
+            self.hp_label = render_text(self.font, f"HP: {self.hp}", BLACK)
+            self.hp_label_value = self.hp
+        hp = self.hp_label
+        hp_rect = screen.blit(hp, (rect.centerx - hp.get_width() // 2, rect.top + rect.height + 5))
+        return image_rect.union(hp_rect)
 
 class Building(GameObject):
     def __init__(self, x, y, building_type):
@@ -58,8 +91,10 @@ class Unit(GameObject):
         self.hp = unit_data.get("hp", 100)
         self.attack = unit_data.get("atk", 10)  # Renamed to 'attack'
         self.path = [] # Initialize path as an empty list
+        self.path_scheduler = None  # PathScheduler that runs this unit's searches; None searches inline
+        self.path_request = None  # Queued PathRequest whose result will replace self.path
 
-        self.font = font or pygame.font.Font(None, 12)
+        self.font = font or get_font(12)
         
         # Ensure targets is a list
         if targets is None:
@@ -70,6 +105,8 @@ class Unit(GameObject):
             # If a single target is passed, convert to a list
             self.targets = [targets]
         
+        self.target_indexes = None  # SpatialHash per target class, highest priority first
+        self.targeting = None  # Targeting that picks this unit's targets in per-tick batches; None picks them here
         self.target = None
         self.attack_cooldown = 0
         self.previous_target_position = None # Store previous target position
@@ -77,11 +114,9 @@ class Unit(GameObject):
     def update(self, dt, grid, game_messages=None):
         """
         Update method to be implemented by subclasses
-        Handles target selection, movement, and attacking
+        Handles target selection, movement, and attacking; combat lines go
+        to the game_messages MessageBus, if given
         """
-        if game_messages is None:
-            game_messages = []  # Create an empty list if None
-
         self.handle_target_selection()
         self.move_towards_target(dt, grid)
         self.handle_attack(dt, game_messages)
@@ -89,15 +124,21 @@ class Unit(GameObject):
 
     def handle_target_selection(self):
         """
-        Select the nearest target if current target is invalid
+        Select the nearest target if current target is invalid, unless a
+        Targeting batch does it at the start of each tick
         """
-        if not self.target or self.target.hp <= 0:
+        if self.targeting is None and (not self.target or self.target.hp <= 0):
             self.target = self.find_nearest_target()
-            if self.target:
-                print(f"{self.name} targeted {getattr(self.target, 'name', self.target.type)}")
+            if self.target and tracer.info[TARGETING]:
+                tracer.emit(TARGETING, INFO, f"{self.name} targeted {getattr(self.target, 'name', self.target.type)}")
 
     def move_towards_target(self, dt, grid):
         """Moves the unit towards its target or destination, using A* pathfinding."""
+        self.plan_path(grid)
+        self.follow_path(dt)
+
+    def plan_path(self, grid):
+        """Clears the path once the target is in range, or (re)plans it with A* when needed."""
         path_needs_update = False  # Flag to track path updates
         movement_threshold = 2 * GRID_SIZE # Adjust this threshold as needed
 
@@ -107,12 +148,15 @@ class Unit(GameObject):
             distance_to_target = math.hypot(dx, dy)
             unit_range = self.get_attack_range()
 
-            # ✅ CHECK A — do we have a valid target?
-            print(f"[A] {self.name} → target={getattr(self.target,'type','?')} hp={self.target.hp} dist={distance_to_target:.0f} range={unit_range}")
+            if tracer.debug[TARGETING]:
+                tracer.emit(TARGETING, DEBUG, f"{self.name} → target={getattr(self.target,'type','?')} hp={self.target.hp} dist={distance_to_target:.0f} range={unit_range}")
 
             if distance_to_target <= unit_range:
                 self.path = []
                 self.destination = None
+                self.cancel_path_request()
+            elif self.path_request is not None:
+                pass  # Keep following the current path until the queued search delivers
             elif not self.path or self.destination is None:
                 path_needs_update = True
             elif self.previous_target_position:
@@ -124,8 +168,8 @@ class Unit(GameObject):
                     path_needs_update = True
 
             if path_needs_update:
-                grid_width  = len(grid[0])
-                grid_height = len(grid)
+                grid_width  = grid.width
+                grid_height = grid.height
 
                 start_grid_x = int(self.x // GRID_SIZE)
                 start_grid_y = int(self.y // GRID_SIZE)
@@ -139,21 +183,44 @@ class Unit(GameObject):
                 end_grid_y   = max(0, min(end_grid_y,   grid_height - 1))
 
                 self.previous_target_position = (self.target.x, self.target.y)
+                if self.path_scheduler is not None:
+                    self.request_path((start_grid_x, start_grid_y), (end_grid_x, end_grid_y), PATH_PRIORITY_RETARGET)
+                    if not self.path:  # One walkable step towards the target until the search finishes
+                        step = grid.step_towards((start_grid_x, start_grid_y), (end_grid_x, end_grid_y))
+                        self.destination = (step[0] * GRID_SIZE, step[1] * GRID_SIZE) if step else None
+                    return
+
                 self.path = a_star(grid, (start_grid_x, start_grid_y), (end_grid_x, end_grid_y)) or []
                 if self.path:
                     self.destination = (self.path[0].x * GRID_SIZE, self.path[0].y * GRID_SIZE)
-                if (0 <= start_grid_x < grid_width and 0 <= start_grid_y < grid_height and
-                        0 <= end_grid_x < grid_width and 0 <= end_grid_y < grid_height):
-                    self.path = a_star(grid, (start_grid_x, start_grid_y), (end_grid_x, end_grid_y)) or []
-                    if self.path:
-                        self.destination = (self.path[0].x * GRID_SIZE, self.path[0].y * GRID_SIZE)
-
-                    # ✅ CHECK B — did A* find a path?
-                    print(f"[B] a_star({start_grid_x},{start_grid_y})→({end_grid_x},{end_grid_y}): {len(self.path)} nodes | grid cell passable={grid[start_grid_y][start_grid_x][1]==0}/{grid[end_grid_y][end_grid_x][1]==0}")
-                else:
-                    self.path = []
-                    print(f"[B] OUT OF BOUNDS start=({start_grid_x},{start_grid_y}) end=({end_grid_x},{end_grid_y})")
 
+                if tracer.debug[PATHING]:
+                    tracer.emit(PATHING, DEBUG, f"{self.name} a_star({start_grid_x},{start_grid_y})→({end_grid_x},{end_grid_y}): {len(self.path)} nodes | grid cell passable={not grid.is_blocked(start_grid_x, start_grid_y)}/{not grid.is_blocked(end_grid_x, end_grid_y)}")
+
+    def request_path(self, start, end, priority, callback=None):
+        """Queues a search on path_scheduler; receive_path (or callback) installs the result."""
+        self.path_request = self.path_scheduler.submit(self, start, end, priority, callback or self.receive_path)
+        return self.path_request
+
+    def receive_path(self, request, cells):
+        """PathScheduler callback: swaps in the finished path unless a newer request replaced it."""
+        if request is not self.path_request:
+            return False
+        self.path_request = None
+        self.path = [Node(x, y) for x, y in cells]
+        if self.path:
+            self.destination = (self.path[0].x * GRID_SIZE, self.path[0].y * GRID_SIZE)
+        if tracer.debug[PATHING]:
+            tracer.emit(PATHING, DEBUG, f"{self.name} queued path {request.start}→{request.end}: {len(self.path)} nodes")
+        return True
+
+    def cancel_path_request(self):
+        if self.path_request is not None:
+            self.path_scheduler.cancel(self)
+            self.path_request = None
+
+    def follow_path(self, dt):
+        """Advances the unit along its path, or straight to its destination."""
         if self.path:
             next_node = self.path[0]
             target_x = next_node.x * GRID_SIZE
@@ -163,19 +230,16 @@ class Unit(GameObject):
             distance_to_next_node = math.hypot(dx, dy)
             travel_distance = self.speed * (dt / 1000)
 
-            # ✅ CHECK C — is movement math working?
-            print(f"[C] speed={self.speed} travel={travel_distance:.2f} dist_to_node={distance_to_next_node:.2f}")
+            if tracer.debug[MOVEMENT]:
+                tracer.emit(MOVEMENT, DEBUG, f"{self.name} speed={self.speed} travel={travel_distance:.2f} dist_to_node={distance_to_next_node:.2f}")
 
             if distance_to_next_node <= travel_distance:
-                self.x = next_node.x * GRID_SIZE
-                self.y = next_node.y * GRID_SIZE
-                self.rect.topleft = (self.x, self.y)
+                self.move_to(next_node.x * GRID_SIZE, next_node.y * GRID_SIZE)
                 self.path.pop(0)
                 self.destination = (self.path[0].x * GRID_SIZE, self.path[0].y * GRID_SIZE) if self.path else None
             else:
-                self.x += (dx / distance_to_next_node) * travel_distance
-                self.y += (dy / distance_to_next_node) * travel_distance
-                self.rect.topleft = (self.x, self.y)
+                self.move_to(self.x + (dx / distance_to_next_node) * travel_distance,
+                             self.y + (dy / distance_to_next_node) * travel_distance)
 
         elif self.destination:  # Move towards clicked destination if no path
              dx = self.destination[0] - self.x
@@ -194,25 +258,19 @@ class Unit(GameObject):
              travel_distance = self.speed * (dt / 1000)
 
              if distance_to_destination <= travel_distance:
-                 self.x = self.destination[0]
-                 self.y = self.destination[1]
-                 self.rect.topleft = (self.x, self.y)
+                 self.move_to(self.destination[0], self.destination[1])
                  self.destination = None  # Clear destination once reached
              else:
-                 self.x += (dx / distance_to_destination) * travel_distance
-                 self.y += (dy / distance_to_destination) * travel_distance
-                 self.rect.topleft = (self.x, self.y)
+                 self.move_to(self.x + (dx / distance_to_destination) * travel_distance,
+                              self.y + (dy / distance_to_destination) * travel_distance)
 
     def handle_attack(self, dt, game_messages=None):
         """
         Handle attack cooldown and attacking
         """
-        if game_messages is None:
-            game_messages = []
-
         if self.target and self.attack_cooldown <= 0:
             if self.should_attack():
-                self.attack_target(game_messages if game_messages is not None else [])
+                self.attack_target(game_messages)
                 self.attack_cooldown = self.get_attack_cooldown()
 
         if self.attack_cooldown > 0:
@@ -229,20 +287,31 @@ class Unit(GameObject):
             else:
                 target_name = self.target.type  # Use type if no name attribute
             self.target.hp -= self.attack
-            message = f"{unit_name} attacked {target_name} for {self.attack} damage."
+            verb = "attacked"
+
+            if tracer.debug[COMBAT]:
+                tracer.emit(COMBAT, DEBUG, f"{unit_name} hit {target_name} for {self.attack}, hp left {self.target.hp}")
 
             if self.target and self.target.hp <= 0:  # Check if target still exists
-                message = f"{unit_name} destroyed {target_name}"
+                verb = "destroyed"
+                if tracer.info[COMBAT]:
+                    tracer.emit(COMBAT, INFO, f"{unit_name} destroyed {target_name}")
                 self.target = None  # Clear target after destroying it
-            
-            if game_messages is not None:
-                if game_messages is not None:
-                    add_game_message(message, game_messages)
+
+            if game_messages is not None:  # Coalesced per (verb, attacker, target); no string built per hit
+                game_messages.post_combat(verb, unit_name, target_name, self.attack)
 
     def find_nearest_target(self):
         """
         Find the nearest valid target, prioritizing based on enemy type.
         """
+        if self.target_indexes is not None:
+            for index in self.target_indexes:
+                nearest = index.nearest(self.x, self.y, predicate=lambda target: target.hp > 0)
+                if nearest:
+                    return nearest[0]
+            return None
+
         priority_targets = []
         other_targets = []
 
@@ -264,35 +333,41 @@ class Unit(GameObject):
         else:
             return None
 
-    def draw(self, screen, units, buildings, enemies, show_debug):  # Add show_debug parameter
+    def draw(self, screen, units, buildings, enemies, show_debug, alpha=1.0, origin=(0, 0)):  # Add show_debug parameter
         """
         Draw the unit with additional information, including the path.
+        units, buildings and enemies are the SpatialHash indexes of each group;
+        alpha interpolates the drawn position between the last two ticks and
+        origin is the camera's world position. Returns the screen area touched.
         """
-        super().draw(screen)
+        dirty = super().draw(screen, alpha, origin)
+        rect = self.draw_rect(alpha, origin)
 
         if show_debug:
-            # Draw collision information
-            collided_with_unit = check_collision_with_unit(self.rect, units, exclude_unit=self)
-            collided_with_building = check_collision_with_building(self.rect, buildings)
-            collided_with_enemy = check_collision_with_unit(self.rect, enemies, exclude_unit=self)
+            # Draw collision information, only looking at nearby objects
+            collided_with_unit = check_collision_with_unit(self.rect, units.query_rect(self.rect), exclude_unit=self)
+            collided_with_building = check_collision_with_building(self.rect, buildings.query_rect(self.rect))
+            collided_with_enemy = check_collision_with_unit(self.rect, enemies.query_rect(self.rect), exclude_unit=self)
             if collided_with_unit or collided_with_building or collided_with_enemy:
-                collide_text = self.font.render("COLLIDING", True, RED)
-                screen.blit(collide_text, (self.rect.centerx - collide_text.get_width() // 2,
-                                            self.rect.top + collide_text.get_height() + 5))
+                collide_text = render_text(self.font, "COLLIDING", RED)
+                dirty.union_ip(screen.blit(collide_text, (rect.centerx - collide_text.get_width() // 2,
+                                                          rect.top + collide_text.get_height() + 5)))
 
             # Draw target information if a target exists
             if self.target and self.target.hp > 0:
-                target_text = self.font.render(str(self.target.type), True, RED)
-                screen.blit(target_text, (self.rect.centerx - target_text.get_width() // 2,
-                                        self.rect.top - target_text.get_height() - 5))
+                target_text = render_text(self.font, str(self.target.type), RED)
+                dirty.union_ip(screen.blit(target_text, (rect.centerx - target_text.get_width() // 2,
+                                                         rect.top - target_text.get_height() - 5)))
                 
             # Draw path information    
             if self.path:  # Only draw if there's a path
                 for node in self.path:
-                    grid_x = node.x * GRID_SIZE
-                    grid_y = node.y * GRID_SIZE
+                    grid_x = node.x * GRID_SIZE - origin[0]
+                    grid_y = node.y * GRID_SIZE - origin[1]
                     rect = pygame.Rect(grid_x, grid_y, GRID_SIZE, GRID_SIZE)
-                    pygame.draw.rect(screen, BLUE, rect, 2)
+                    dirty.union_ip(pygame.draw.rect(screen, BLUE, rect, 2))
+
+        return dirty
 
 class AlliedUnit(Unit):
     def __init__(self, unit_type, x, y, targets, font=None):
@@ -327,7 +402,53 @@ class EnemyUnit(Unit):
     def __init__(self, unit_type, x, y, buildings, units, font=None):
         targets = buildings + units
         super().__init__(unit_type, x, y, targets, font)
-        self.target_priority = "building"
+        self.target_priority = ENEMY_DATA[unit_type].get("target_priority", "building")
+        self.flow_field = None  # Shared FlowField for this unit's target priority class
+
+    def grid_position(self, grid):
+        grid_x = max(0, min(int(self.x // GRID_SIZE), grid.width - 1))
+        grid_y = max(0, min(int(self.y // GRID_SIZE), grid.height - 1))
+        return grid_x, grid_y
+
+    def handle_target_selection(self):
+        """
+        Take the target the shared flow field leads to, falling back to the
+        nearest target when the field has none
+        """
+        if self.targeting is not None:
+            return
+        if self.flow_field is not None and (not self.target or self.target.hp <= 0):
+            target = self.flow_field.target_at(*self.grid_position(self.flow_field.nav))
+            if target is not None and target.hp > 0:
+                self.target = target
+                if tracer.info[TARGETING]:
+                    tracer.emit(TARGETING, INFO, f"{self.name} targeted {getattr(self.target, 'name', self.target.type)} (flow field)")
+                return
+        super().handle_target_selection()
+
+    def plan_path(self, grid):
+        """
+        Step along the shared flow field while it leads to the current target,
+        otherwise fall back to A* pathfinding.
+        """
+        if self.flow_field is not None and self.target and self.target.hp > 0:
+            grid_x, grid_y = self.grid_position(grid)
+            if self.flow_field.target_at(grid_x, grid_y) is self.target:
+                distance_to_target = math.hypot(self.target.x - self.x, self.target.y - self.y)
+                if distance_to_target <= self.get_attack_range():
+                    self.path = []
+                    self.destination = None
+                    self.cancel_path_request()
+                    return
+                if not self.path:
+                    step = self.flow_field.next_step(grid_x, grid_y)
+                    if step:
+                        self.cancel_path_request()
+                        self.path = [Node(*step)]
+                        self.destination = (step[0] * GRID_SIZE, step[1] * GRID_SIZE)
+                if self.path:
+                    return
+        super().plan_path(grid)
 
     def should_attack(self):
         """
@@ -0,0 +1,159 @@
+# headless.py
+#
+# Runs the simulation without a window or any drawing, as fast as the CPU
+# allows, for balance testing and performance regression runs on machines
+# with no display:
+#
+#   python src/headless.py --waves 10 --seed 42 --quiet
+#   python src/headless.py --replay session.jsonl
+#   python src/headless.py --waves 3 --profile ticks.csv
+#   python src/headless.py --waves 4 --seed 42 --parity
+
+import os
+
+# Must be set before pygame initialises its video subsystem
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import contextlib
+import random
+import sys
+import time
+
+from constants import *
+from simulation import Simulation
+from replay import Recorder, replay_headless
+import savegame
+import batch
+from tracing import tracer
+from profiler import profiler
+
+def place_castle(sim):
+    """Default setup: a castle on the walkable cell nearest the map centre."""
+    cell = sim.nav_grid.find_nearest_walkable(sim.grid_width // 2, sim.grid_height // 2)
+    if cell:
+        sim.place_building("Castle", cell[0] * GRID_SIZE, cell[1] * GRID_SIZE)
+
+def run_headless(waves, seed=None, dt=SIM_DT, setup=place_castle, max_steps=None, backend=ENTITY_BACKEND,
+                 path_workers=PATH_WORKERS, record=False, load=None):
+    """
+    Steps a new Simulation by a fixed dt (in ms) until `waves` waves have
+    spawned or max_steps is reached. Returns (simulation, steps). Runs are
+    deterministic unless path_workers is set; with record=True, sim.recorder
+    holds the session afterwards. load starts from a saved game instead of
+    a new one (and skips setup); `waves` more waves are played from there.
+    """
+    random.seed(seed)
+    options = dict(backend=backend, path_workers=path_workers, deterministic=not path_workers)
+    if load:
+        sim = savegame.load(load, **options)
+    else:
+        sim = Simulation(random.randint(0, 1000), **options)
+    if record:
+        sim.recorder = Recorder(sim)
+    if setup and not load:
+        setup(sim)
+    profiler.track_simulation(sim)
+
+    steps = 0
+    last_wave = sim.current_wave - 1 + waves  # A loaded game plays `waves` more waves
+    while sim.current_wave <= last_wave and (max_steps is None or steps < max_steps):
+        sim.step(dt)
+        profiler.end_frame()  # With --profile, every tick is a frame
+        steps += 1
+    return sim, steps
+
+def outcome(sim):
+    """Everything two runs of the same game should agree on: buildings, units, enemies and gold."""
+    def entities(objects):
+        return [(obj.type, round(obj.x, 3), round(obj.y, 3), obj.hp) for obj in objects]
+    return {"wave": sim.current_wave, "tick": sim.tick, "gold": int(sim.gold), "buildings": entities(sim.buildings),
+            "units": entities(sim.units), "enemies": entities(sim.enemies)}
+
+def check_parity(waves, seed, **options):
+    """
+    Plays the same seeded game on the objects and numpy backends. Returns the
+    outcome fields that differ, {} if both ended in the same state.
+    """
+    results = []
+    for backend in ("objects", "numpy"):
+        sim, _ = run_headless(waves, seed, backend=backend, **options)
+        results.append(outcome(sim))
+        sim.close()
+    objects, arrays = results
+    return {key: (objects[key], arrays[key]) for key in objects if objects[key] != arrays[key]}
+
+@contextlib.contextmanager
+def quiet_stdout(quiet):
+    """Discards stdout inside the block when quiet is set."""
+    if not quiet:
+        yield
+        return
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        yield
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the simulation headless.")
+    parser.add_argument("--waves", type=int, default=5, help="number of waves to simulate")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for terrain and spawns")
+    parser.add_argument("--dt", type=float, default=SIM_DT, help="fixed timestep in milliseconds")
+    parser.add_argument("--max-steps", type=int, default=None, help="stop after this many steps")
+    parser.add_argument("--quiet", action="store_true", help="discard the game's stdout diagnostics")
+    parser.add_argument("--backend", choices=("objects", "numpy"), default=ENTITY_BACKEND, help="entity update backend")
+    parser.add_argument("--path-workers", type=int, default=PATH_WORKERS, help="pathfinding worker processes (0 = main thread)")
+    parser.add_argument("--load", help="start from this save file")
+    parser.add_argument("--save", help="save the final state to this file")
+    parser.add_argument("--record", help="save the session's seeds and commands to this file")
+    parser.add_argument("--replay", help="replay a recorded session instead of running waves")
+    parser.add_argument("--trace", help='trace levels, e.g. "pathing=debug,combat=info" or "all=debug"')
+    parser.add_argument("--trace-file", help="stream trace records to this file")
+    parser.add_argument("--profile", help="write per-tick phase timings to this .csv or .jsonl file")
+    parser.add_argument("--parity", action="store_true", help="play the game on both backends and compare the outcomes")
+    args = parser.parse_args(argv)
+
+    if args.parity:
+        if batch.np is None:
+            sys.exit("--parity needs numpy for the numpy backend")
+        seed = args.seed if args.seed is not None else random.randrange(1 << 31)  # Both runs need the same game
+        with quiet_stdout(args.quiet):
+            differences = check_parity(args.waves, seed, dt=args.dt, max_steps=args.max_steps)
+        for key, (objects, arrays) in differences.items():
+            print(f"{key} differs:\n  objects: {objects}\n  numpy:   {arrays}")
+        print(f"Seed {seed}: backends {'differ' if differences else 'match'}")
+        sys.exit(1 if differences else 0)
+
+    if args.trace:
+        tracer.configure(args.trace)
+    if args.trace_file:
+        tracer.stream_to(args.trace_file)
+    if args.profile:
+        profiler.export_to(args.profile)
+        profiler.set_enabled(True)
+
+    start = time.perf_counter()
+    with quiet_stdout(args.quiet):
+        if args.replay:
+            sim = replay_headless(args.replay, ticks=args.max_steps)
+            steps = sim.tick
+            args.dt = SIM_DT  # Recordings always run at the fixed tick length
+        else:
+            sim, steps = run_headless(args.waves, args.seed, args.dt, max_steps=args.max_steps, backend=args.backend,
+                                      path_workers=args.path_workers, record=bool(args.record), load=args.load)
+    elapsed = time.perf_counter() - start
+
+    sim_seconds = steps * args.dt / 1000
+    print(f"Waves: {sim.current_wave - 1}, steps: {steps}, simulated: {sim_seconds:.1f}s, "
+          f"wall: {elapsed:.2f}s ({sim_seconds / max(elapsed, 1e-9):.0f}x real time)")
+    print(f"Buildings: {len(sim.buildings)}, units: {len(sim.units)}, enemies: {len(sim.enemies)}, gold: {int(sim.gold)}")
+    if args.record:
+        sim.recorder.save(args.record)
+    if args.save:
+        savegame.save(sim, args.save)
+    sim.close()
+    tracer.close()
+    profiler.close()
+
+if __name__ == "__main__":
+    main()
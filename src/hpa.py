@@ -0,0 +1,429 @@
+# hpa.py
+
+import heapq
+
+from constants import *
+from astar import STEPS, DIAGONAL_COST, octile
+
+INF = float("inf")
+STEP_UNITS = tuple((dx, dy, round(cost * 1000)) for dx, dy, cost in STEPS)  # Whole thousandths, so a cost sums the same either way round
+
+class HierarchicalPathfinder:
+    """
+    HPA* over a NavGrid.
+
+    The grid is split into cluster_size x cluster_size clusters. Wherever two
+    neighbouring clusters share an opening of walkable cells, entrances are
+    placed on it (one in the middle of a short opening, one at each end of a
+    long one), and every entrance cell becomes an abstract node. Inter-cluster
+    edges join the two cells of an entrance; intra-cluster edges hold the
+    walking cost between the entrances of one cluster. A query searches this
+    small graph first and only then refines the cluster segments on the
+    abstract path with A* bounded to the cluster. Entrances pin the path to
+    fixed border cells, so the refined path is then pulled straight across
+    each border it crosses.
+
+    Units also move diagonally, so a border whose only crossing is a diagonal
+    step gets an entrance on that step, and so does a cluster corner that can
+    only be cut diagonally into the opposite cluster.
+
+    It subscribes to the NavGrid, so a passability change rescans only the
+    borders the changed cells lie on and rebuilds only the clusters they are
+    in. A neighbour whose entrances moved as a result only searches from its
+    new entrances.
+    """
+    def __init__(self, nav, cluster_size=HPA_CLUSTER_SIZE):
+        self.nav = nav
+        self.cluster_size = cluster_size
+        self.columns = -(-nav.width // cluster_size)
+        self.rows = -(-nav.height // cluster_size)
+        self.borders = {}   # (cluster, right, lower or diagonal neighbour) -> [(cell, cell)] entrances
+        self.inter = {}     # cell -> {cell across the border: cost}
+        self.intra = {}     # cluster -> {entrance: {entrance: cost}}
+        self.graph = {}     # entrance -> {neighbour: cost}, intra and inter edges merged for the search
+        self.segments = {}  # cluster -> {(entrance, entrance): refined path}
+        self.rebuilds = 0   # clusters rebuilt so far
+        self.expanded_total = 0  # abstract and cluster Dijkstra nodes expanded by queries; refinements count on the NavGrid
+        self.build()
+        nav.subscribe(self.on_change)
+
+    # --- Clusters ---
+    def cluster_of(self, cell):
+        y, x = divmod(cell, self.nav.width)
+        return x // self.cluster_size, y // self.cluster_size
+
+    def bounds(self, cluster):
+        """(x0, y0, x1, y1) of a cluster, exclusive x1/y1, as NavGrid.search takes them."""
+        size = self.cluster_size
+        x0, y0 = cluster[0] * size, cluster[1] * size
+        return x0, y0, min(x0 + size, self.nav.width), min(y0 + size, self.nav.height)
+
+    def cluster_borders(self, cluster):
+        cx, cy = cluster
+        borders = []
+        if cx > 0:
+            borders.append(((cx - 1, cy), cluster))
+        if cx + 1 < self.columns:
+            borders.append((cluster, (cx + 1, cy)))
+        if cy > 0:
+            borders.append(((cx, cy - 1), cluster))
+        if cy + 1 < self.rows:
+            borders.append((cluster, (cx, cy + 1)))
+        return borders + [border for border in self.corner_borders(cluster) if cluster in border]
+
+    def corner_borders(self, cluster):
+        """The two diagonal borders across each corner of the cluster shared by four clusters."""
+        cx, cy = cluster
+        borders = []
+        for x, y in ((cx - 1, cy - 1), (cx, cy - 1), (cx - 1, cy), (cx, cy)):  # Top-left cluster of each corner
+            if 0 <= x and x + 1 < self.columns and 0 <= y and y + 1 < self.rows:
+                borders.append(((x, y), (x + 1, y + 1)))
+                borders.append(((x + 1, y), (x, y + 1)))
+        return borders
+
+    def borders_at(self, x, y):
+        """Borders whose scan reads cell (x, y): the edges it lies on and, at a cluster corner, both diagonals across it."""
+        size = self.cluster_size
+        cx, cy = x // size, y // size
+        x0, y0, x1, y1 = self.bounds((cx, cy))
+        left = x == x0 and cx > 0
+        right = x == x1 - 1 and cx + 1 < self.columns
+        top = y == y0 and cy > 0
+        bottom = y == y1 - 1 and cy + 1 < self.rows
+        borders = []
+        if left:
+            borders.append(((cx - 1, cy), (cx, cy)))
+        if right:
+            borders.append(((cx, cy), (cx + 1, cy)))
+        if top:
+            borders.append(((cx, cy - 1), (cx, cy)))
+        if bottom:
+            borders.append(((cx, cy), (cx, cy + 1)))
+        for side, end, (x, y) in ((left, top, (cx - 1, cy - 1)), (right, top, (cx, cy - 1)),
+                                  (left, bottom, (cx - 1, cy)), (right, bottom, (cx, cy))):  # Top-left cluster of the corner
+            if side and end:
+                borders.append(((x, y), (x + 1, y + 1)))
+                borders.append(((x + 1, y), (x, y + 1)))
+        return borders
+
+    def entrances(self, cluster):
+        """Every entrance cell on the cluster's side of its borders."""
+        cells = set()
+        for a, b in self.cluster_borders(cluster):
+            side = 0 if a == cluster else 1
+            cells.update(pair[side] for pair in self.borders.get((a, b), ()))
+        return cells
+
+    # --- Building ---
+    def build(self):
+        for cy in range(self.rows):
+            for cx in range(self.columns):
+                if cx + 1 < self.columns:
+                    self.set_border((cx, cy), (cx + 1, cy))
+                if cy + 1 < self.rows:
+                    self.set_border((cx, cy), (cx, cy + 1))
+                if cx + 1 < self.columns and cy + 1 < self.rows:
+                    self.set_border((cx, cy), (cx + 1, cy + 1))
+                    self.set_border((cx + 1, cy), (cx, cy + 1))
+        for cy in range(self.rows):
+            for cx in range(self.columns):
+                self.build_cluster((cx, cy))
+
+    def scan_border(self, a, b):
+        """Entrance cell pairs on the edge or corner shared by cluster a and its neighbour b."""
+        w = self.nav.width
+        blocked = self.nav.blocked
+        x0, y0, x1, y1 = self.bounds(a)
+        if b[0] != a[0] and b[1] != a[1]:
+            return self.scan_corner(a, b)
+        if b[0] != a[0]:
+            pairs = [(y * w + x1 - 1, y * w + x1) for y in range(y0, y1)]
+        else:
+            pairs = [((y1 - 1) * w + x, y1 * w + x) for x in range(x0, x1)]
+
+        # Diagonal steps across the edge where neither cell has a straight crossing
+        entrances = []
+        for (p, q), (next_p, next_q) in zip(pairs, pairs[1:]):
+            if blocked[q] and blocked[next_p]:
+                if not blocked[p] and not blocked[next_q]:
+                    entrances.append((p, next_q))
+            if blocked[p] and blocked[next_q]:
+                if not blocked[next_p] and not blocked[q]:
+                    entrances.append((next_p, q))
+
+        run = []
+        for pair in pairs + [None]:
+            if pair is not None and not blocked[pair[0]] and not blocked[pair[1]]:
+                run.append(pair)
+                continue
+            if run:
+                if len(run) < HPA_LONG_ENTRANCE:
+                    entrances.append(run[len(run) // 2])
+                else:
+                    entrances.extend((run[0], run[-1]))
+                run = []
+        return entrances
+
+    def scan_corner(self, a, b):
+        """The diagonal step from a to b across their shared corner, if it is the only way past it."""
+        w = self.nav.width
+        blocked = self.nav.blocked
+        x0, y0, x1, y1 = self.bounds(a)
+        x = x1 - 1 if b[0] > a[0] else x0  # a's corner cell
+        y = y1 - 1
+        step = 1 if b[0] > a[0] else -1
+        p = y * w + x
+        q = (y + 1) * w + x + step
+        if blocked[p] or blocked[q] or not (blocked[p + step] and blocked[q - step]):
+            return []  # Closed, or reachable through the two clusters beside the corner
+        return [(p, q)]
+
+    def set_border(self, a, b):
+        """Rescans the border between a and b. Returns True if its entrances changed."""
+        entrances = self.scan_border(a, b)
+        old = self.borders.get((a, b), [])
+        if entrances == old:
+            return False
+        for p, q in old:
+            self.inter[p].pop(q, None)
+            self.inter[q].pop(p, None)
+        w = self.nav.width
+        for p, q in entrances:
+            cost = DIAGONAL_COST if p % w != q % w and p // w != q // w else 1.0
+            self.inter.setdefault(p, {})[q] = cost
+            self.inter.setdefault(q, {})[p] = cost
+        self.borders[(a, b)] = entrances
+        return True
+
+    def build_cluster(self, cluster):
+        """Recomputes the walking cost between every pair of the cluster's entrances."""
+        for node in self.intra.get(cluster, ()):
+            self.graph.pop(node, None)
+        self.intra[cluster] = {}
+        self.link_entrances(cluster, sorted(self.entrances(cluster)))
+        self.segments[cluster] = {}
+        self.rebuilds += 1
+
+    def update_entrances(self, cluster):
+        """build_cluster for a cluster whose cells are unchanged but whose entrances moved."""
+        intra = self.intra[cluster]
+        nodes = self.entrances(cluster)
+        gone = intra.keys() - nodes
+        for node in gone:
+            del intra[node]
+            self.graph.pop(node, None)
+        for edges in intra.values():
+            for node in gone:
+                edges.pop(node, None)
+        segments = self.segments[cluster]
+        for key in [key for key in segments if key[0] in gone or key[1] in gone]:
+            del segments[key]
+        self.link_entrances(cluster, sorted(nodes - intra.keys()))
+
+    def link_entrances(self, cluster, new):
+        """Searches from each new entrance to the cluster's others; the costs of unchanged pairs are kept."""
+        bounds = self.bounds(cluster)
+        intra = self.intra[cluster]
+        for node in new:
+            intra[node] = {}
+        targets = set(intra)
+        adjacency = {}
+        for node in new:
+            targets.discard(node)  # Each pair is searched once, from its earlier entrance
+            for other, cost in self.cluster_distances(node, bounds, targets, adjacency).items():
+                intra[node][other] = cost
+                intra[other][node] = cost
+        for node, edges in intra.items():  # Sorted, so the graph doesn't depend on the order of edits
+            self.graph[node] = dict(sorted({**edges, **self.inter.get(node, {})}.items()))
+
+    def cluster_distances(self, source, bounds, targets, adjacency=None):
+        """Dijkstra from source inside bounds, returning {target: cost} for the reachable targets."""
+        return self.dijkstra(source, bounds, targets, adjacency)[0]
+
+    def dijkstra(self, source, bounds, targets, adjacency=None):
+        """
+        cluster_distances, plus the number of cells it expanded. adjacency
+        memoises each visited cell's walkable neighbours; searches from several
+        cells of one cluster share it.
+        """
+        w = self.nav.width
+        blocked = self.nav.blocked
+        x0, y0, x1, y1 = bounds
+        adjacency = {} if adjacency is None else adjacency
+        remaining = set(targets)
+        remaining.discard(source)
+        found = {}
+        g_score = {source: 0}
+        done = set()
+        heap = [(0, source)]
+        while heap and remaining:
+            cost, current = heapq.heappop(heap)
+            if current in done:
+                continue
+            done.add(current)
+            if current in remaining:
+                remaining.discard(current)
+                found[current] = cost / 1000
+
+            neighbors = adjacency.get(current)
+            if neighbors is None:
+                cy, cx = divmod(current, w)
+                neighbors = adjacency[current] = [((cy + dy) * w + cx + dx, step) for dx, dy, step in STEP_UNITS
+                                              if x0 <= cx + dx < x1 and y0 <= cy + dy < y1 and not blocked[(cy + dy) * w + cx + dx]]
+            for neighbor, step in neighbors:
+                if neighbor in done:
+                    continue
+                new_cost = cost + step
+                if new_cost < g_score.get(neighbor, INF):
+                    g_score[neighbor] = new_cost
+                    heapq.heappush(heap, (new_cost, neighbor))
+        return found, len(done)
+
+    def on_change(self, version, dirty_cells):
+        """NavGrid subscriber: rescans the borders under dirty_cells and rebuilds the clusters they touched."""
+        size = self.cluster_size
+        touched = {(x // size, y // size) for x, y in dirty_cells}
+        moved = set()
+        for a, b in {border for x, y in dirty_cells for border in self.borders_at(x, y)}:
+            if self.set_border(a, b):
+                moved.update((a, b))
+        for cluster in touched:
+            self.build_cluster(cluster)
+        for cluster in moved - touched:
+            self.update_entrances(cluster)
+
+    # --- Queries ---
+    def find_path(self, start_coords, end_coords):
+        """Same contract as NavGrid.search: (x, y) cells including the start, or []."""
+        nav = self.nav
+        w = nav.width
+        end = nav.find_nearest_walkable(end_coords[0], end_coords[1])
+        if end is None or tuple(start_coords) == end:
+            return []
+
+        start = start_coords[1] * w + start_coords[0]
+        goal = end[1] * w + end[0]
+        start_cluster = self.cluster_of(start)
+        goal_cluster = self.cluster_of(goal)
+        if abs(start_cluster[0] - goal_cluster[0]) <= 1 and abs(start_cluster[1] - goal_cluster[1]) <= 1:
+            # Same or neighbouring clusters: search around both first, a little beyond them
+            a = self.bounds(start_cluster)
+            b = self.bounds(goal_cluster)
+            margin = self.cluster_size // 2
+            path = nav.search(start_coords, end, (max(min(a[0], b[0]) - margin, 0), max(min(a[1], b[1]) - margin, 0),
+                                                  min(max(a[2], b[2]) + margin, nav.width), min(max(a[3], b[3]) + margin, nav.height)))
+            if path:
+                return path
+
+        abstract = self.abstract_path(start, goal, start_cluster, goal_cluster)
+        return self.smooth(self.refine(abstract)) if abstract else []
+
+    def abstract_path(self, start, goal, start_cluster, goal_cluster):
+        """A* over the entrance graph with start and goal linked in temporarily."""
+        w = self.nav.width
+        goal_x, goal_y = goal % w, goal // w
+        start_targets = set(self.intra[start_cluster])
+        if start_cluster == goal_cluster:
+            start_targets.add(goal)
+        start_edges, start_expanded = self.dijkstra(start, self.bounds(start_cluster), start_targets)
+        goal_edges, goal_expanded = self.dijkstra(goal, self.bounds(goal_cluster), self.intra[goal_cluster])
+        self.expanded_total += start_expanded + goal_expanded
+
+        graph = self.graph
+        start_edges.update(self.inter.get(start, {}))
+        g_score = {start: 0.0}
+        parent = {start: None}
+        closed = set()
+        open_set = [(octile(start % w, start // w, goal_x, goal_y), 0, start)]
+        counter = 0
+        diagonal = DIAGONAL_COST - 2
+        while open_set:
+            _, _, current = heapq.heappop(open_set)
+            if current in closed:
+                continue
+            if current == goal:
+                self.expanded_total += len(closed)
+                path = []
+                while current is not None:
+                    path.append(current)
+                    current = parent[current]
+                path.reverse()
+                return path
+            closed.add(current)
+
+            edges = start_edges if current == start else graph.get(current, {})
+            if current in goal_edges:
+                edges = {**edges, goal: goal_edges[current]}
+
+            current_g = g_score[current]
+            for neighbor, cost in edges.items():
+                if neighbor in closed:
+                    continue
+                tentative_g_score = current_g + cost
+                if tentative_g_score < g_score.get(neighbor, INF):
+                    g_score[neighbor] = tentative_g_score
+                    parent[neighbor] = current
+                    counter += 1
+                    dy, dx = divmod(neighbor, w)
+                    dx = abs(dx - goal_x)
+                    dy = abs(dy - goal_y)
+                    f_score = tentative_g_score + dx + dy + diagonal * min(dx, dy)  # Inlined octile()
+                    heapq.heappush(open_set, (f_score, counter, neighbor))
+        self.expanded_total += len(closed)
+        return None
+
+    def refine(self, abstract):
+        """Expands an abstract path into cells, searching only inside the clusters it crosses."""
+        w = self.nav.width
+        path = [(abstract[0] % w, abstract[0] // w)]
+        for a, b in zip(abstract, abstract[1:]):
+            cluster = self.cluster_of(a)
+            if cluster != self.cluster_of(b):
+                path.append((b % w, b // w))  # Inter-cluster edge: b is next to a
+            else:
+                path.extend(self.segment(cluster, a, b)[1:])
+        return path
+
+    def segment(self, cluster, a, b):
+        cache = self.segments[cluster]
+        key = (a, b)
+        segment = cache.get(key)
+        if segment is None:
+            w = self.nav.width
+            segment = self.nav.search((a % w, a // w), (b % w, b // w), self.bounds(cluster))
+            nodes = self.intra[cluster]
+            if a in nodes and b in nodes:  # Start and goal segments are one-offs
+                cache[key] = segment
+        return segment
+
+    def smooth(self, path):
+        """
+        String-pulls a path across the cluster borders it crosses. The stretch
+        from the middle of the segment before a crossing to the middle of the
+        one after is re-searched inside the clusters it passes through (short
+        stretches are joined up to a cluster's length), so the path no longer
+        has to pass through the entrance cells. Each search can fall back on
+        the stretch itself, so the result is never longer.
+        """
+        nav = self.nav
+        w = nav.width
+        clusters = [self.cluster_of(y * w + x) for x, y in path]
+        crossings = [i for i in range(len(path) - 1) if clusters[i] != clusters[i + 1]]
+        if not crossings:
+            return path
+        cuts = [(a + 1 + b) // 2 for a, b in zip(crossings, crossings[1:])] + [len(path) - 1]
+        smoothed = [path[0]]
+        start = 0
+        bounds = None
+        for crossing, end in zip(crossings, cuts):
+            for cluster in (clusters[crossing], clusters[crossing + 1]):
+                x0, y0, x1, y1 = self.bounds(cluster)
+                if bounds is not None:
+                    x0, y0, x1, y1 = min(x0, bounds[0]), min(y0, bounds[1]), max(x1, bounds[2]), max(y1, bounds[3])
+                bounds = x0, y0, x1, y1
+            if end - start < self.cluster_size and end != len(path) - 1:
+                continue
+            smoothed.extend(nav.search(path[start], path[end], bounds)[1:] if end - start > 1 else path[start + 1:end + 1])
+            start = end
+            bounds = None
+        return smoothed
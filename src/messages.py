@@ -0,0 +1,143 @@
+# messages.py
+#
+# The on-screen message feed. Messages live in a fixed ring of
+# MESSAGE_CAPACITY slots (the oldest is dropped when a full ring needs room),
+# a dict finds a live message by key in O(1) for deduplication, and a heap
+# of expiry times retires them without scanning the feed. Repeated combat
+# events share one line whose count and damage grow, so a siege reads
+# "Goblin x12 attacked House for 12 damage." instead of flooding the feed,
+# and each message keeps its rendered surface until its text changes.
+# Durations are in milliseconds of the clock the bus is given; the game
+# passes Simulation.game_time, so messages expire with simulated time and
+# behave the same when paused, fast-forwarded, headless or replayed:
+#
+#   bus = MessageBus(sim.game_time)
+#   bus.post("Built House")
+#   bus.post_combat("attacked", "Goblin", "House", damage=1)
+#   for message in bus.active(): screen.blit(message.render(font, RED), ...)
+
+import heapq
+
+from constants import *
+
+class Message:
+    __slots__ = ("key", "text", "event", "count", "damage", "expires_at", "slot", "surface", "surface_key")
+
+    def __init__(self, key, text, event=None):
+        self.key = key
+        self.text = text  # Plain messages; combat lines are formatted when drawn
+        self.event = event  # (verb, attacker, target) for combat lines
+        self.count = 1
+        self.damage = 0
+        self.expires_at = 0
+        self.slot = -1
+        self.surface = None  # Cached render of the current text
+        self.surface_key = None
+
+    def get_text(self):
+        if self.event is None:
+            return self.text
+        verb, attacker, target = self.event
+        if self.count > 1:
+            attacker = f"{attacker} x{self.count}"
+        if verb == "attacked":
+            return f"{attacker} attacked {target} for {self.damage} damage."
+        return f"{attacker} {verb} {target}"
+
+    def render(self, font, color):
+        """The message's surface, re-rendered only when its text, font or color changed."""
+        key = (font, tuple(color), self.count)
+        if self.surface_key != key:
+            self.surface = font.render(self.get_text(), True, color)
+            self.surface_key = key
+        return self.surface
+
+class MessageBus:
+    def __init__(self, clock, capacity=MESSAGE_CAPACITY):
+        self.slots = [None] * capacity  # Ring of live messages in posting order
+        self.head = 0  # Slot the next message goes into; the oldest live one if the ring is full
+        self.by_key = {}  # Key -> live Message
+        self.expiry = []  # (expires_at, sequence, Message); an extended message is pushed again when popped early
+        self.sequence = 0
+        self.clock = clock  # Returns the current time in ms, e.g. Simulation.game_time
+
+    def __len__(self):
+        return len(self.by_key)
+
+    def post(self, text, duration=MESSAGE_DURATION, key=None):
+        """Shows text unless a message with the same key (the text itself by default) is still up."""
+        now = self.clock()
+        self.expire(now)
+        key = text if key is None else key
+        message = self.by_key.get(key)
+        if message is None:
+            message = self.add(Message(key, text), now + duration)
+        return message
+
+    def post_combat(self, verb, attacker, target, damage=0, duration=MESSAGE_DURATION):
+        """Adds a hit to the line for (verb, attacker, target), starting one if none is up, and keeps it up."""
+        now = self.clock()
+        self.expire(now)
+        key = (verb, attacker, target)
+        message = self.by_key.get(key)
+        if message is None:
+            message = self.add(Message(key, None, key), now + duration)
+        else:
+            message.count += 1
+            message.expires_at = now + duration  # Its heap entry re-queues it when popped
+        message.damage += damage
+        return message
+
+    def add(self, message, expires_at):
+        if self.slots[self.head] is not None:
+            if len(self.by_key) < len(self.slots):
+                self.compact()  # Messages expired out of order left gaps; use them first
+            else:
+                evicted = self.slots[self.head]
+                del self.by_key[evicted.key]  # Its heap entry is skipped when popped
+        message.slot = self.head
+        self.slots[self.head] = message
+        self.head = (self.head + 1) % len(self.slots)
+        self.by_key[message.key] = message
+        message.expires_at = expires_at
+        self.schedule(message)
+        return message
+
+    def schedule(self, message):
+        self.sequence += 1
+        heapq.heappush(self.expiry, (message.expires_at, self.sequence, message))
+
+    def compact(self):
+        """Moves the live messages to the front of the ring, keeping their order."""
+        live = self.messages()
+        self.slots = live + [None] * (len(self.slots) - len(live))
+        for slot, message in enumerate(live):
+            message.slot = slot
+        self.head = len(live)
+
+    def expire(self, now):
+        expiry = self.expiry
+        while expiry and expiry[0][0] <= now:
+            _, _, message = heapq.heappop(expiry)
+            if self.by_key.get(message.key) is not message:
+                continue  # Evicted
+            if message.expires_at > now:
+                self.schedule(message)  # Extended since this entry was pushed
+                continue
+            del self.by_key[message.key]
+            self.slots[message.slot] = None
+
+    def active(self):
+        """Live messages, oldest first."""
+        self.expire(self.clock())
+        return self.messages()
+
+    def messages(self):
+        slots, head = self.slots, self.head
+        return [message for message in slots[head:] + slots[:head] if message is not None]
+
+    def clear(self):
+        self.slots = [None] * len(self.slots)
+        self.head = 0
+        self.by_key.clear()
+        self.expiry.clear()
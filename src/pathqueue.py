@@ -0,0 +1,309 @@
+# pathqueue.py
+#
+# Time-sliced pathfinding. Units submit path requests to a PathScheduler
+# instead of searching inline; every simulation tick the scheduler spends a
+# fixed budget on the queued searches, player orders first, and a search that
+# doesn't finish in time picks up where it stopped on the next tick. Until a
+# result arrives the requester keeps its previous path (or heads straight for
+# its target).
+#
+# With workers > 0 the searches run in a pool of worker processes instead:
+# each tick the queued requests are split into one batch per worker and
+# shipped together with a versioned bytes snapshot of the passability, and
+# the results are delivered on a later tick, once their futures are done.
+
+import heapq
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from constants import *
+from astar import STEPS, NavGrid, octile
+
+_worker_grid = None  # NavGrid kept by each worker process, reloaded when the snapshot version changes
+
+def search_batch(width, height, version, blocked, queries):
+    """Runs in a worker process: A* for each (start, end) on the given passability snapshot."""
+    global _worker_grid
+    nav = _worker_grid
+    if nav is None or nav.version != version or (nav.width, nav.height) != (width, height):
+        nav = _worker_grid = NavGrid(width, height)
+        nav.blocked[:] = blocked
+        nav.version = version
+    return [nav.search(start, end) for start, end in queries]
+
+class PathSearch:
+    """
+    A* whose open list, scores and parents live on the object instead of the
+    NavGrid scratch arrays, so several searches can be in progress at once
+    and each can stop after any number of expansions and resume later.
+    Expands cells in the same order as NavGrid.search, so paths are the same.
+    """
+    def __init__(self, nav, start_coords, end_coords):
+        self.nav = nav
+        self.version = nav.version
+        self.start_coords = tuple(start_coords)
+        self.end_coords = tuple(end_coords)
+        self.result = None  # List of (x, y) cells once finished
+        self.expanded = 0
+
+        end = nav.find_nearest_walkable(end_coords[0], end_coords[1])
+        if end is None or self.start_coords == end:
+            self.result = []
+            return
+        w = nav.width
+        self.end_x, self.end_y = end
+        start = start_coords[1] * w + start_coords[0]
+        self.goal = self.end_y * w + self.end_x
+        self.g_score = {start: 0.0}
+        self.parent = {start: -1}
+        self.closed = set()
+        self.open_set = [(octile(start_coords[0], start_coords[1], self.end_x, self.end_y), 0, start)]
+        self.counter = 0
+
+    @property
+    def done(self):
+        return self.result is not None
+
+    def run(self, max_expansions):
+        """Expands up to max_expansions cells. Returns True once the search has finished."""
+        if self.result is not None:
+            return True
+        nav = self.nav
+        w, h = nav.width, nav.height
+        blocked = nav.blocked
+        g_score, parent, closed, open_set = self.g_score, self.parent, self.closed, self.open_set
+        end_x, end_y, goal = self.end_x, self.end_y, self.goal
+
+        expansions = 0
+        while open_set and expansions < max_expansions:
+            _, _, current = heapq.heappop(open_set)
+            if current in closed:
+                continue
+            if current == goal:
+                self.expanded += expansions
+                self.result = self.reconstruct_path(current)
+                return True
+            closed.add(current)
+            expansions += 1
+
+            cy, cx = divmod(current, w)
+            current_g = g_score[current]
+            for dx, dy, cost in STEPS:
+                nx = cx + dx
+                ny = cy + dy
+                if 0 <= nx < w and 0 <= ny < h:
+                    neighbor = ny * w + nx
+                    if blocked[neighbor] or neighbor in closed:
+                        continue
+                    tentative_g_score = current_g + cost
+                    if tentative_g_score < g_score.get(neighbor, float("inf")):
+                        g_score[neighbor] = tentative_g_score
+                        parent[neighbor] = current
+                        self.counter += 1
+                        f_score = tentative_g_score + octile(nx, ny, end_x, end_y)
+                        heapq.heappush(open_set, (f_score, self.counter, neighbor))
+
+        self.expanded += expansions
+        if not open_set:
+            self.result = []  # No path found
+        return self.result is not None
+
+    def reconstruct_path(self, current):
+        w = self.nav.width
+        path = []
+        while current != -1:
+            y, x = divmod(current, w)
+            path.append((x, y))
+            current = self.parent[current]
+        path.reverse()
+        return path
+
+
+class PathRequest:
+    __slots__ = ("requester", "start", "end", "priority", "callback", "search", "cancelled", "sequence")
+
+    def __init__(self, requester, start, end, priority, callback, sequence):
+        self.requester = requester
+        self.start = tuple(start)
+        self.end = tuple(end)
+        self.priority = priority
+        self.callback = callback  # callback(request, cells)
+        self.search = None  # In-progress PathSearch, or the batch future while a worker has it
+        self.cancelled = False
+        self.sequence = sequence
+
+    def __lt__(self, other):
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class PathScheduler:
+    """
+    Queue of path requests worked off incrementally.
+
+    run() is called once per simulation tick and spends at most budget_ms of
+    wall time (or, if budget_nodes is set, that many expansions, which keeps
+    headless runs deterministic) on the queued searches, highest priority
+    (lowest number) first. A search that runs out of budget keeps its state
+    and resumes on the next tick; a newer request from the same requester
+    replaces the old one. Cached paths are delivered without searching.
+
+    With workers > 0, run() hands the queue to a process pool instead and
+    delivers whichever batches have come back; requesters keep their old
+    path in the meantime.
+    """
+    def __init__(self, nav, budget_ms=PATH_BUDGET_MS, budget_nodes=None, workers=PATH_WORKERS):
+        self.nav = nav
+        self.budget_ms = budget_ms
+        self.budget_nodes = budget_nodes
+        self.queue = []  # heap of PathRequest
+        self.pending = {}  # requester -> its live PathRequest
+        self.sequence = 0
+        self.completed = 0
+        self.workers = workers
+        self.pool = None  # ProcessPoolExecutor, started on first use
+        self.batches = []  # (grid version, requests, future) handed to the pool
+
+    def __len__(self):
+        return len(self.pending)
+
+    def submit(self, requester, start, end, priority=PATH_PRIORITY_RETARGET, callback=None):
+        self.cancel(requester)
+        self.sequence += 1
+        request = PathRequest(requester, start, end, priority, callback, self.sequence)
+        self.pending[requester] = request
+        heapq.heappush(self.queue, request)
+        return request
+
+    def cancel(self, requester):
+        request = self.pending.pop(requester, None)
+        if request is not None:
+            request.cancelled = True
+
+    def deliver(self, request, cells, finished):
+        del self.pending[request.requester]
+        self.completed += 1
+        finished.append(request)
+        if request.callback:
+            request.callback(request, cells)
+
+    def cached(self, request):
+        cache = self.nav.path_cache
+        if cache is None:
+            return None
+        cells = cache.get((request.start, request.end, self.nav.version, "astar"))
+        return list(cells) if cells is not None else None
+
+    def advance(self, request, max_expansions):
+        """Works on one request. Returns (cells or None if unfinished, expansions used)."""
+        nav = self.nav
+        hierarchy = nav.hierarchy
+        if hierarchy is not None:  # HPA* queries run whole, but are charged every node they expanded
+            before = nav.expanded_total + hierarchy.expanded_total
+            cells = nav.find_path(request.start, request.end)
+            return cells, nav.expanded_total + hierarchy.expanded_total - before
+
+        if request.search is None:
+            cells = self.cached(request)
+            if cells is not None:
+                return cells, 0
+
+        search = request.search
+        if search is None or search.version != nav.version:  # New, or the grid changed under it
+            search = request.search = PathSearch(nav, request.start, request.end)
+        before = search.expanded
+        finished = search.run(max_expansions)
+        nav.expanded_total += search.expanded - before
+        if not finished:
+            return None, max(search.expanded - before, 1)
+        nav.expanded = search.expanded
+        nav.searches += 1
+        if nav.path_cache is not None:
+            nav.path_cache.put((request.start, request.end, search.version, "astar"), tuple(search.result))
+        return search.result, max(search.expanded - before, 1)
+
+    def run(self, budget_ms=None):
+        """Works on the queue until the budget is spent. Returns the requests finished this call."""
+        if self.workers:
+            return self.run_workers()
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        deadline = time.perf_counter() + budget_ms / 1000
+        nodes_left = self.budget_nodes
+        finished = []
+
+        while self.queue:
+            request = self.queue[0]
+            if request.cancelled:
+                heapq.heappop(self.queue)
+                continue
+
+            slice_nodes = PATH_SLICE_NODES if nodes_left is None else min(PATH_SLICE_NODES, nodes_left)
+            cells, used = self.advance(request, slice_nodes)
+            if cells is not None:
+                heapq.heappop(self.queue)
+                self.deliver(request, cells, finished)
+
+            if nodes_left is not None:
+                nodes_left -= used
+                if nodes_left <= 0:
+                    break
+            elif time.perf_counter() >= deadline:
+                break
+        return finished
+
+    # --- Worker processes ---
+    def run_workers(self):
+        """Delivers the batches the pool has finished, then ships everything queued since."""
+        nav = self.nav
+        finished = []
+        waiting = []
+        for version, requests, future in self.batches:
+            if not future.done():
+                waiting.append((version, requests, future))
+                continue
+            for request, cells in zip(requests, future.result()):
+                if request.cancelled:
+                    continue
+                request.search = None
+                if version != nav.version:  # Grid changed while it was searching
+                    heapq.heappush(self.queue, request)
+                    continue
+                if nav.path_cache is not None:
+                    nav.path_cache.put((request.start, request.end, version, "astar"), tuple(cells))
+                self.deliver(request, cells, finished)
+        self.batches = waiting
+
+        requests = []
+        while self.queue:
+            request = heapq.heappop(self.queue)  # Highest priority first
+            if request.cancelled:
+                continue
+            cells = self.cached(request)
+            if cells is not None:
+                self.deliver(request, cells, finished)
+            else:
+                requests.append(request)
+        if requests:
+            self.dispatch(requests)
+        return finished
+
+    def dispatch(self, requests):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        nav = self.nav
+        blocked = nav.snapshot()
+        nav.searches += len(requests)  # Expansions happen in the workers and aren't counted
+        size = -(-len(requests) // self.workers)
+        for i in range(0, len(requests), size):
+            batch = requests[i:i + size]
+            queries = [(request.start, request.end) for request in batch]
+            future = self.pool.submit(search_batch, nav.width, nav.height, nav.version, blocked, queries)
+            for request in batch:
+                request.search = future
+            self.batches.append((nav.version, batch, future))
+
+    def close(self):
+        """Stops the worker processes, if any were started."""
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+            self.batches = []
@@ -1,10 +1,132 @@
 import pygame
 import noise
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from constants import *
+from assets import get_image
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; terrain rows fall back to bytearrays
+    np = None
+
+# --- Noise Settings ---
+NOISE_SCALE = 150.0  # Decreased scale for smaller features
+NOISE_OCTAVES = 4  # Increased octaves for more detail, but with a smaller scale
+NOISE_PERSISTENCE = 0.5  # Increased persistence for less scattered noise
+NOISE_LACUNARITY = 1.5  # Increased lacunarity for more cohesive noise
+WATER_THRESHOLD = -0.1  # Smoother threshold for water/grass transition
+
+_background = None  # Single worker thread for regenerate_async
+
+# --- Vectorised noise ---
+# The same gradient noise as noise.pnoise2 (Ken Perlin's improved noise with
+# the noise package's permutation and gradient tables), computed for a whole
+# chunk of cells at once. Everything runs in float32 in pnoise2's order of
+# operations, so the values, and therefore the tiles, match pnoise2 exactly.
+PERMUTATION = (
+    151, 160, 137, 91, 90, 15, 131, 13, 201, 95, 96, 53, 194, 233, 7, 225, 140, 36, 103, 30,
+    69, 142, 8, 99, 37, 240, 21, 10, 23, 190, 6, 148, 247, 120, 234, 75, 0, 26, 197, 62,
+    94, 252, 219, 203, 117, 35, 11, 32, 57, 177, 33, 88, 237, 149, 56, 87, 174, 20, 125, 136,
+    171, 168, 68, 175, 74, 165, 71, 134, 139, 48, 27, 166, 77, 146, 158, 231, 83, 111, 229, 122,
+    60, 211, 133, 230, 220, 105, 92, 41, 55, 46, 245, 40, 244, 102, 143, 54, 65, 25, 63, 161,
+    1, 216, 80, 73, 209, 76, 132, 187, 208, 89, 18, 169, 200, 196, 135, 130, 116, 188, 159, 86,
+    164, 100, 109, 198, 173, 186, 3, 64, 52, 217, 226, 250, 124, 123, 5, 202, 38, 147, 118, 126,
+    255, 82, 85, 212, 207, 206, 59, 227, 47, 16, 58, 17, 182, 189, 28, 42, 223, 183, 170, 213,
+    119, 248, 152, 2, 44, 154, 163, 70, 221, 153, 101, 155, 167, 43, 172, 9, 129, 22, 39, 253,
+    19, 98, 108, 110, 79, 113, 224, 232, 178, 185, 112, 104, 218, 246, 97, 228, 251, 34, 242, 193,
+    238, 210, 144, 12, 191, 179, 162, 241, 81, 51, 145, 235, 249, 14, 239, 107, 49, 192, 214, 31,
+    181, 199, 106, 157, 184, 84, 204, 176, 115, 121, 50, 45, 127, 4, 150, 254, 138, 236, 205, 93,
+    222, 114, 67, 29, 24, 72, 243, 141, 128, 195, 78, 66, 215, 61, 156, 180,
+)
+GRADIENTS = ((1, 1), (-1, 1), (1, -1), (-1, -1), (1, 0), (-1, 0), (1, 0), (-1, 0),
+             (0, 1), (0, -1), (0, 1), (0, -1), (1, 0), (-1, 0), (0, -1), (0, 1))  # x and y of the package's GRAD3
+
+if np is not None:
+    _permutation = np.array(PERMUTATION * 2, dtype=np.int64)
+    _gradient_x = np.array([g[0] for g in GRADIENTS], dtype=np.float32)
+    _gradient_y = np.array([g[1] for g in GRADIENTS], dtype=np.float32)
+
+def perlin_octave(x, y, repeatx, repeaty):
+    """One octave of noise at every point of the float32 arrays x and y (pnoise2's noise2())."""
+    perm = _permutation
+    i = np.floor(np.fmod(x, repeatx)).astype(np.int64)
+    j = np.floor(np.fmod(y, repeaty)).astype(np.int64)
+    ii = np.fmod((i + 1).astype(np.float32), repeatx).astype(np.int64) & 255
+    jj = np.fmod((j + 1).astype(np.float32), repeaty).astype(np.int64) & 255
+    i &= 255
+    j &= 255
+
+    x = x - np.floor(x)
+    y = y - np.floor(y)
+    fx = x * x * x * (x * (x * np.float32(6) - np.float32(15)) + np.float32(10))
+    fy = y * y * y * (y * (y * np.float32(6) - np.float32(15)) + np.float32(10))
+
+    a = perm[i]
+    b = perm[ii]
+    def gradient(hashed, gx, gy):
+        h = perm[hashed] & 15
+        return gx * _gradient_x[h] + gy * _gradient_y[h]
+    x1 = x - np.float32(1)
+    y1 = y - np.float32(1)
+    g00 = gradient(perm[a + j], x, y)
+    g10 = gradient(perm[b + j], x1, y)
+    g01 = gradient(perm[a + jj], x, y1)
+    g11 = gradient(perm[b + jj], x1, y1)
+    near = g00 + fx * (g10 - g00)
+    far = g01 + fx * (g11 - g01)
+    return near + fy * (far - near)
+
+def perlin_grid(x, y, repeatx, repeaty):
+    """noise.pnoise2 with the module's noise settings at every point of the float32 arrays x and y."""
+    total = np.zeros(np.broadcast(x, y).shape, dtype=np.float32)
+    frequency = np.float32(1)
+    amplitude = np.float32(1)
+    peak = np.float32(0)
+    for _ in range(NOISE_OCTAVES):
+        total += perlin_octave(x * frequency, y * frequency,
+                               np.float32(repeatx) * frequency, np.float32(repeaty) * frequency) * amplitude
+        peak += amplitude
+        frequency *= np.float32(NOISE_LACUNARITY)
+        amplitude *= np.float32(NOISE_PERSISTENCE)
+    return total / peak
+
+def generate_chunk(noise_seed, col, row, cols, rows, grid_size, repeat, grass_count):
+    """
+    Tile indices for a cols x rows block of cells starting at (col, row), as
+    bytes in row-major order. Water is grass_count. Module-level so chunks can
+    be sent to worker processes.
+    """
+    repeatx, repeaty = repeat
+    if np is not None:
+        xs = ((np.arange(col, col + cols) * grid_size + noise_seed) / NOISE_SCALE).astype(np.float32)
+        ys = ((np.arange(row, row + rows) * grid_size + noise_seed) / NOISE_SCALE).astype(np.float32)
+        values = perlin_grid(xs[np.newaxis, :], ys[:, np.newaxis], repeatx, repeaty).ravel().astype(np.float64)
+        tiles = ((values - WATER_THRESHOLD) / (1 - WATER_THRESHOLD) * grass_count).astype(np.int64)
+        tiles = np.clip(tiles, 0, grass_count - 1)
+        tiles[values < WATER_THRESHOLD] = grass_count  # Water tile index
+        return tiles.astype(np.uint8).tobytes()
+
+    values = [noise.pnoise2((x * grid_size + noise_seed) / NOISE_SCALE,
+                            (y * grid_size + noise_seed) / NOISE_SCALE,
+                            octaves=NOISE_OCTAVES,
+                            persistence=NOISE_PERSISTENCE,
+                            lacunarity=NOISE_LACUNARITY,
+                            repeatx=repeatx,
+                            repeaty=repeaty,
+                            base=0)
+              for y in range(row, row + rows) for x in range(col, col + cols)]
+    tiles = bytearray(len(values))
+    for i, noise_value in enumerate(values):
+        if noise_value < WATER_THRESHOLD:
+            tiles[i] = grass_count  # Water tile index
+        else:
+            tile_index = int((noise_value - WATER_THRESHOLD) / (1 - WATER_THRESHOLD) * grass_count)
+            tiles[i] = max(0, min(tile_index, grass_count - 1))
+    return bytes(tiles)
 
 class TerrainGenerator:
-    def __init__(self, screen_width, screen_height, grid_size, noise_seed):
+    def __init__(self, screen_width, screen_height, grid_size, noise_seed, terrain=None):
         self.screen_width = screen_width
         self.screen_height = screen_height
         self.grid_size = grid_size
@@ -12,19 +134,21 @@ class TerrainGenerator:
         self.grass_tiles = []
         self.water_tiles = []
         self.load_plains_tiles()
-        self.terrain = self.generate_terrain()
+        self.terrain = self.generate_terrain() if terrain is None else terrain  # Given when loading a save
+        self.chunks = {}  # (chunk x, chunk y) -> pre-rendered TERRAIN_CHUNK_SIZE-tile surface, baked when first seen
+        self.dirty_tiles = set()
+        self.version = 0  # Bumped whenever baked pixels change so cached copies can tell they are stale
+        self.pending = None  # (noise_seed, Future) while regenerate_async is running
 
     def load_plains_tiles(self):
         for i in range(1, 7):
             try:
-                tile = pygame.image.load(f'assets/tiles/plains/grass_{i}.png')
-                tile = pygame.transform.scale(tile, (self.grid_size, self.grid_size))
+                tile = get_image(f'assets/tiles/plains/grass_{i}.png', (self.grid_size, self.grid_size))
                 self.grass_tiles.append(tile)
             except Exception as e:
                 print(f"Error loading grass_{i}.png: {e}")
         try:
-            tile = pygame.image.load(f'assets/tiles/plains/water_1.png')
-            tile = pygame.transform.scale(tile, (self.grid_size, self.grid_size))
+            tile = get_image(f'assets/tiles/plains/water_1.png', (self.grid_size, self.grid_size))
             self.water_tiles.append(tile)
         except Exception as e:
             print(f"Error loading water_1.png: {e}")
@@ -39,42 +163,134 @@ class TerrainGenerator:
             default_water.fill(BLUE)
             self.water_tiles.append(default_water)
 
-    def generate_terrain(self):
-        terrain = []
-        scale = 150.0  # Decreased scale for smaller features
-        octaves = 4  # Increased octaves for more detail, but with a smaller scale
-        persistence = 0.5  # Increased persistence for less scattered noise
-        lacunarity = 1.5  # Increased lacunarity for more cohesive noise
-
-        for y in range(0, self.screen_height, self.grid_size):
-            row = []
-            for x in range(0, self.screen_width, self.grid_size):
-                noise_value = noise.pnoise2((x + self.noise_seed) / scale,
-                                            (y + self.noise_seed) / scale,
-                                            octaves=octaves,
-                                            persistence=persistence,
-                                            lacunarity=lacunarity,
-                                            repeatx=self.screen_width,
-                                            repeaty=self.screen_height,
-                                            base=0)
-
-                # Smoother threshold for water/grass transition
-                water_threshold = -0.1
-                if noise_value < water_threshold:
-                    tile_index = len(self.grass_tiles)  # Water tile index
-                else:
-                    tile_index = int((noise_value - water_threshold) / (1 - water_threshold) * len(self.grass_tiles))
-                    tile_index = max(0, min(tile_index, len(self.grass_tiles) - 1))
-
-                row.append(tile_index)
-            terrain.append(row)
+    def generate_terrain(self, noise_seed=None, workers=None):
+        """
+        Returns the tile index of every cell as rows of uint8 (a 2D numpy
+        array, or a list of bytearrays without numpy), so terrain[y][x]
+        works either way. The map is generated in TERRAIN_CHUNK_SIZE chunks;
+        large maps spread them over a process pool.
+        """
+        if noise_seed is None:
+            noise_seed = self.noise_seed
+        cols = self.screen_width // self.grid_size + (self.screen_width % self.grid_size > 0)
+        rows = self.screen_height // self.grid_size + (self.screen_height % self.grid_size > 0)
+        grass_count = len(self.grass_tiles)
+        repeat = (self.screen_width, self.screen_height)
+
+        chunks = [(col, row, min(TERRAIN_CHUNK_SIZE, cols - col), min(TERRAIN_CHUNK_SIZE, rows - row))
+                  for row in range(0, rows, TERRAIN_CHUNK_SIZE)
+                  for col in range(0, cols, TERRAIN_CHUNK_SIZE)]
+        args = [(noise_seed, col, row, w, h, self.grid_size, repeat, grass_count) for col, row, w, h in chunks]
+
+        if workers is None:
+            workers = (TERRAIN_WORKERS or os.cpu_count() or 1) if cols * rows >= TERRAIN_PARALLEL_CELLS else 0
+        if workers > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(generate_chunk, *zip(*args)))
+        else:
+            results = [generate_chunk(*chunk_args) for chunk_args in args]
+
+        if np is not None:
+            terrain = np.empty((rows, cols), dtype=np.uint8)
+            for (col, row, w, h), tiles in zip(chunks, results):
+                terrain[row:row + h, col:col + w] = np.frombuffer(tiles, dtype=np.uint8).reshape(h, w)
+            return terrain
+
+        terrain = [bytearray(cols) for _ in range(rows)]
+        for (col, row, w, h), tiles in zip(chunks, results):
+            for y in range(h):
+                terrain[row + y][col:col + w] = tiles[y * w:(y + 1) * w]
         return terrain
 
-    def draw_terrain(self, screen):        
-        for y, row in enumerate(self.terrain):
-            for x, tile_index in enumerate(row):
-                if tile_index == len(self.grass_tiles):  # Water tile
-                    tile = self.water_tiles[0]
-                else:
-                    tile = self.grass_tiles[tile_index]
-                screen.blit(tile, (x * self.grid_size, y * self.grid_size))
+    def regenerate(self, noise_seed=None):
+        """Generates new terrain (optionally from a new seed) and invalidates the baked surface."""
+        if noise_seed is not None:
+            self.noise_seed = noise_seed
+        self.install(self.generate_terrain())
+        return self.terrain
+
+    def install(self, terrain):
+        self.terrain = terrain
+        self.chunks.clear()
+        self.dirty_tiles.clear()
+        self.version += 1
+
+    def regenerate_async(self, noise_seed=None):
+        """
+        Starts generating terrain for noise_seed on a background thread so the
+        frame loop keeps running; poll() installs it once it is ready.
+        """
+        global _background
+        if _background is None:
+            _background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="terrain")
+        if noise_seed is None:
+            noise_seed = self.noise_seed
+        self.pending = (noise_seed, _background.submit(self.generate_terrain, noise_seed))
+        return self.pending[1]
+
+    def poll(self):
+        """Installs finished background terrain. Returns True if the terrain changed."""
+        if self.pending is None or not self.pending[1].done():
+            return False
+        noise_seed, future = self.pending
+        self.pending = None
+        self.noise_seed = noise_seed
+        self.install(future.result())
+        return True
+
+    def set_tile(self, x, y, tile_index):
+        """Changes a single tile; only that tile is re-baked on the next draw."""
+        self.terrain[y][x] = tile_index
+        self.dirty_tiles.add((x, y))
+
+    def tile_surface(self, tile_index):
+        if tile_index == len(self.grass_tiles):  # Water tile
+            return self.water_tiles[0]
+        return self.grass_tiles[tile_index]
+
+    def bake_chunk(self, chunk_x, chunk_y):
+        """Renders the tiles of one chunk into a new surface."""
+        size = TERRAIN_CHUNK_SIZE
+        x0, y0 = chunk_x * size, chunk_y * size
+        cols = min(size, len(self.terrain[0]) - x0)
+        rows = min(size, len(self.terrain) - y0)
+        surface = pygame.Surface((cols * self.grid_size, rows * self.grid_size))
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()  # Match the display format for fast blits
+
+        for y in range(rows):
+            row = self.terrain[y0 + y]
+            for x in range(cols):
+                surface.blit(self.tile_surface(row[x0 + x]), (x * self.grid_size, y * self.grid_size))
+        self.chunks[(chunk_x, chunk_y)] = surface
+        return surface
+
+    def flush(self):
+        """Re-blits changed tiles into the chunks already baked."""
+        if not self.dirty_tiles:
+            return
+        size = TERRAIN_CHUNK_SIZE
+        for x, y in self.dirty_tiles:
+            chunk = self.chunks.get((x // size, y // size))
+            if chunk is not None:
+                chunk.blit(self.tile_surface(self.terrain[y][x]), ((x % size) * self.grid_size, (y % size) * self.grid_size))
+        self.dirty_tiles.clear()
+        self.version += 1
+
+    def draw_terrain(self, screen, view=None):
+        """
+        Draws the part of the terrain inside view (a world rect, the screen
+        area at the world origin by default), baking only the chunks it shows.
+        """
+        if view is None:
+            view = screen.get_rect()
+        self.flush()
+        span = TERRAIN_CHUNK_SIZE * self.grid_size
+        columns = -(-len(self.terrain[0]) // TERRAIN_CHUNK_SIZE)
+        rows = -(-len(self.terrain) // TERRAIN_CHUNK_SIZE)
+        for chunk_y in range(max(0, view.top // span), min(rows, (view.bottom - 1) // span + 1)):
+            for chunk_x in range(max(0, view.left // span), min(columns, (view.right - 1) // span + 1)):
+                chunk = self.chunks.get((chunk_x, chunk_y))
+                if chunk is None:
+                    chunk = self.bake_chunk(chunk_x, chunk_y)
+                screen.blit(chunk, (chunk_x * span - view.x, chunk_y * span - view.y))
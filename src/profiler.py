@@ -0,0 +1,266 @@
+# profiler.py
+#
+# Scoped per-phase frame timers for the game loop. Each phase of a frame is
+# wrapped in a scope; while the profiler is off, scope() hands back one
+# shared no-op object, so the instrumented code pays a method call and
+# nothing else:
+#
+#   with profiler.scope("update_grid"):
+#       ...
+#   profiler.end_frame()
+#
+# While on, it keeps the last PROFILE_WINDOW frames of every phase for the
+# rolling p50/p95/max overlay ('P' in game), records where each scope
+# started for the flame bar, and can write one row per frame to a CSV or
+# JSON-lines file. RTS_PROFILE=profile.csv enables it from the environment.
+# Counters are either bumped directly with count(), or sampled once per
+# frame from a cumulative source registered with track().
+
+import os
+import json
+import time
+import atexit
+from collections import deque
+
+import pygame
+from constants import *
+
+# Top-level phases of a game frame, in loop order. Also the CSV columns;
+# JSON-lines rows include every phase, listed here or not.
+PHASES = ("events", "sim", "update_grid", "flow_fields", "targeting", "units", "enemies", "combat", "pathfinding",
+          "waves", "remove_dead", "draw_terrain", "draw_grid", "draw_entities", "text", "profiler", "present")
+
+PHASE_COLORS = ((230, 97, 1), (253, 184, 99), (178, 171, 210), (94, 60, 153), (27, 158, 119),
+                (217, 95, 2), (117, 112, 179), (231, 41, 138), (102, 166, 30), (230, 171, 2))
+
+class NullScope:
+    """What scope() returns while profiling is off."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SCOPE = NullScope()
+
+class Scope:
+    """Times one named phase; reused for every entry into that phase."""
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.color = PHASE_COLORS[len(profiler.scopes) % len(PHASE_COLORS)]
+        self.start = 0.0
+        self.depth = 0
+
+    def __enter__(self):
+        profiler = self.profiler
+        self.depth = profiler.depth
+        profiler.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        profiler = self.profiler
+        profiler.depth -= 1
+        elapsed = (end - self.start) * 1000
+        profiler.frame[self.name] = profiler.frame.get(self.name, 0.0) + elapsed
+        profiler.spans.append((self.name, self.depth, (self.start - profiler.frame_start) * 1000, elapsed))
+        return False
+
+class FrameProfiler:
+    def __init__(self, window=PROFILE_WINDOW):
+        self.enabled = False
+        self.window = window
+        self.scopes = {}  # Phase name -> Scope
+        self.history = {}  # Phase name -> per-frame ms over the last `window` frames
+        self.frame_times = deque(maxlen=window)
+        self.frame = {}  # Phase name -> ms spent this frame
+        self.spans = []  # (name, depth, start ms, duration ms) for this frame's flame bar
+        self.last_spans = []
+        self.counters = {}  # Counter name -> value this frame
+        self.last_counters = {}
+        self.sources = {}  # Counter name -> (callable returning a running total, last total)
+        self.depth = 0
+        self.frame_start = time.perf_counter()
+        self.frame_count = 0
+        self.export_file = None
+        self.export_csv = False
+        self.csv_counters = None  # Counter columns, fixed by the first row written
+        self.panel = None  # Rendered stats table, refreshed every PROFILE_REFRESH_FRAMES
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        scope = self.scopes.get(name)
+        if scope is None:
+            scope = self.scopes[name] = Scope(self, name)
+        return scope
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def track(self, name, total):
+        """Reports how much total() grew each frame as counter `name`."""
+        self.sources[name] = (total, total())
+
+    def track_simulation(self, sim):
+        """Counts the A* searches, cells expanded, paths delivered and target queries in sim each frame."""
+        nav, scheduler, targeting = sim.nav_grid, sim.path_scheduler, sim.targeting
+        self.track("astar_calls", lambda: nav.searches)
+        self.track("nodes_expanded", lambda: nav.expanded_total)
+        self.track("paths_done", lambda: scheduler.completed)
+        self.track("target_queries", lambda: targeting.resolved)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.depth = 0
+        self.frame.clear()
+        self.spans = []
+        self.counters.clear()
+        self.frame_start = time.perf_counter()
+        for name, (total, _) in self.sources.items():
+            self.sources[name] = (total, total())
+
+    def toggle(self):
+        self.set_enabled(not self.enabled)
+        return self.enabled
+
+    # --- Frames ---
+    def begin_frame(self):
+        """Marks the start of a frame's work, e.g. after the frame-rate sleep."""
+        if self.enabled:
+            self.frame.clear()  # Anything timed since end_frame(), such as startup, isn't part of a frame
+            self.spans = []
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        frame_ms = (time.perf_counter() - self.frame_start) * 1000
+        for name, (total, last) in self.sources.items():
+            value = total()
+            self.counters[name] = value - last if value >= last else value  # Source was replaced, e.g. on load
+            self.sources[name] = (total, value)
+
+        self.frame_times.append(frame_ms)
+        for name in self.history.keys() | self.frame.keys():
+            history = self.history.get(name)
+            if history is None:
+                history = self.history[name] = deque(maxlen=self.window)
+            history.append(self.frame.get(name, 0.0))
+
+        if self.export_file is not None:
+            self.write_row(frame_ms)
+        self.frame_count += 1
+        self.last_spans, self.spans = self.spans, []
+        self.last_counters, self.counters = self.counters, {}
+        self.frame = {}
+        self.frame_start = time.perf_counter()
+
+    def stats(self):
+        """(name, p50, p95, max) in ms over the window for every phase seen, slowest first."""
+        rows = []
+        for name, history in self.history.items():
+            times = sorted(history)
+            if times[-1] > 0:
+                rows.append((name, percentile(times, 50), percentile(times, 95), times[-1]))
+        rows.sort(key=lambda row: row[2], reverse=True)
+        if self.frame_times:
+            times = sorted(self.frame_times)
+            rows.insert(0, ("frame", percentile(times, 50), percentile(times, 95), times[-1]))
+        return rows
+
+    # --- Export ---
+    def export_to(self, path):
+        """Writes one row per frame to path: CSV if it ends in .csv, JSON lines otherwise."""
+        self.close()
+        self.export_file = open(path, "w")
+        self.export_csv = path.endswith(".csv")
+        self.csv_counters = None
+
+    def write_row(self, frame_ms):
+        if self.export_csv:
+            if self.csv_counters is None:
+                self.csv_counters = sorted(self.sources.keys() | self.counters.keys())
+                self.export_file.write(",".join(("frame", "frame_ms", *PHASES, *self.csv_counters)) + "\n")
+            values = [self.frame_count, f"{frame_ms:.3f}"]
+            values += [f"{self.frame.get(name, 0.0):.3f}" for name in PHASES]
+            values += [self.counters.get(name, 0) for name in self.csv_counters]
+            self.export_file.write(",".join(map(str, values)) + "\n")
+        else:
+            row = {"frame": self.frame_count, "frame_ms": round(frame_ms, 3),
+                   "phases": {name: round(ms, 3) for name, ms in self.frame.items()}, "counters": self.counters}
+            self.export_file.write(json.dumps(row, separators=(",", ":")) + "\n")
+
+    def close(self):
+        if self.export_file is not None:
+            self.export_file.close()
+            self.export_file = None
+
+    # --- Overlay ---
+    def draw(self, screen, font, x=10, y=None):
+        """Draws the flame bar for the last frame and the rolling stats table. Returns the rects touched."""
+        width = min(400, screen.get_width() - 2 * x)
+        bar_height = 8
+        if y is None:
+            y = screen.get_height() - 10 - 4 * bar_height
+        rects = [self.draw_flame(screen, pygame.Rect(x, y, width, 4 * bar_height), bar_height)]
+
+        if self.panel is None or self.frame_count % PROFILE_REFRESH_FRAMES == 0:
+            self.panel = self.render_panel(font)
+        rects.append(screen.blit(self.panel, self.panel.get_rect(bottomleft=(x, y - 4))))
+        return rects
+
+    def draw_flame(self, screen, rect, bar_height):
+        """
+        One row per nesting depth, each scope as wide as its share of the
+        frame budget (1000 / FPS ms); past the budget, the bar is marked red.
+        """
+        pygame.draw.rect(screen, BLACK, rect)
+        scale = rect.width / (1000 / FPS)
+        overrun = False
+        for name, depth, start, duration in self.last_spans:
+            if depth >= rect.height // bar_height:
+                continue
+            left = rect.x + int(start * scale)
+            right = min(rect.x + int((start + duration) * scale) + 1, rect.right)
+            overrun = overrun or right == rect.right
+            if left < rect.right:
+                pygame.draw.rect(screen, self.scopes[name].color, (left, rect.y + depth * bar_height, right - left, bar_height - 1))
+        pygame.draw.rect(screen, RED if overrun else WHITE, rect, 1)
+        return rect
+
+    def render_panel(self, font):
+        """The stats table, numbers right-aligned in fixed-width columns."""
+        column = font.size("000.00")[0] + 8
+        name_width = max(font.size(name)[0] for name, *_ in self.stats() or [("phase",)]) + 8
+        rows = [("phase", "p50", "p95", "max")]
+        rows += [(name, f"{p50:.2f}", f"{p95:.2f}", f"{peak:.2f}") for name, p50, p95, peak in self.stats()]
+        line = font.get_linesize()
+        counters = "  ".join(f"{name}: {value}" for name, value in self.last_counters.items())
+        width = max(name_width + 3 * column, font.size(counters)[0]) + 8
+        panel = pygame.Surface((width, (len(rows) + bool(counters)) * line + 8), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 160))
+        for i, row in enumerate(rows):  # Changing numbers; rendered directly, not through the text cache
+            y = 4 + i * line
+            panel.blit(font.render(row[0], True, WHITE), (4, y))
+            for j, value in enumerate(row[1:], 1):
+                surface = font.render(value, True, WHITE)
+                panel.blit(surface, (4 + name_width + j * column - surface.get_width(), y))
+        if counters:
+            panel.blit(font.render(counters, True, WHITE), (4, 4 + len(rows) * line))
+        return panel
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, -(-p * len(sorted_values) // 100) - 1)
+    return sorted_values[index]
+
+profiler = FrameProfiler()
+atexit.register(profiler.close)
+
+if os.environ.get("RTS_PROFILE"):
+    profiler.export_to(os.environ["RTS_PROFILE"])
+    profiler.set_enabled(True)
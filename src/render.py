@@ -0,0 +1,108 @@
+# render.py
+
+import pygame
+
+class DirtyRectRenderer:
+    """
+    Pushes only the changed parts of the screen to the display.
+
+    The static layer (baked terrain plus anything that never changes, such as
+    the key bindings) is kept as a background surface. Each frame, begin()
+    restores the background under everything that was drawn the previous
+    frame, the caller draws the dynamic elements and hands their rects to
+    add(), and end() passes the old and new rects to pygame.display.update()
+    instead of flipping the whole screen.
+    """
+    def __init__(self, screen, full_update_ratio=0.5):
+        self.screen = screen
+        self.background = None
+        self.background_key = None
+        self.previous = []  # Rects drawn last frame
+        self.current = []
+        self.full_update_ratio = full_update_ratio  # Flip instead once this much of the screen is dirty
+        self.needs_full_update = True
+
+    def set_background(self, background, key=None):
+        """Installs a new static layer; key lets callers skip rebuilding an unchanged one."""
+        self.background = background
+        self.background_key = key
+        self.invalidate()
+
+    def invalidate(self):
+        """Forces the next frame to repaint and flip the whole screen."""
+        self.needs_full_update = True
+
+    def begin(self):
+        if self.needs_full_update:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            for rect in self.previous:
+                self.screen.blit(self.background, rect, rect)
+        self.current = []
+
+    def add(self, rect):
+        """Records a rect (or list of rects) drawn this frame; None is ignored."""
+        if rect is None:
+            return
+        if isinstance(rect, list):
+            self.current.extend(r for r in rect if r)
+        elif rect:
+            self.current.append(rect)
+
+    def end(self):
+        screen_rect = self.screen.get_rect()
+        dirty = [rect.clip(screen_rect) for rect in self.previous + self.current]
+        dirty = [rect for rect in dirty if rect.width and rect.height]
+
+        dirty_area = sum(rect.width * rect.height for rect in dirty)
+        if self.needs_full_update or dirty_area > self.full_update_ratio * screen_rect.width * screen_rect.height:
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty)
+
+        self.previous = self.current
+        self.needs_full_update = False
+        return dirty
+
+
+class ScrollingLayer:
+    """
+    Screen-sized copy of a world-space layer (terrain, grid) under a camera.
+
+    update() moves it to a new camera origin: the pixels still in view are
+    shifted with Surface.scroll() and paint(surface, view) is called only for
+    the strips that scrolled in, each on a subsurface so it can't draw past
+    its strip; view is the world rect the strip shows. A jump of a whole
+    screen, or invalidate() (the layer's content changed), repaints it all.
+    """
+    def __init__(self, size, paint):
+        self.surface = pygame.Surface(size)
+        if pygame.display.get_surface() is not None:
+            self.surface = self.surface.convert()  # Match the display format for fast blits
+        self.paint = paint
+        self.origin = None  # Camera origin the surface shows; None until painted
+
+    def invalidate(self):
+        self.origin = None
+
+    def update(self, origin):
+        """Brings the layer to origin. Returns True if its pixels changed."""
+        if origin == self.origin:
+            return False
+        width, height = self.surface.get_size()
+        previous, self.origin = self.origin, origin
+        if previous is None or abs(origin[0] - previous[0]) >= width or abs(origin[1] - previous[1]) >= height:
+            self.repaint(pygame.Rect(0, 0, width, height))
+            return True
+
+        dx = previous[0] - origin[0]
+        dy = previous[1] - origin[1]
+        self.surface.scroll(dx, dy)
+        if dx:  # Columns on the side the view moved towards, full height
+            self.repaint(pygame.Rect(0 if dx > 0 else width + dx, 0, abs(dx), height))
+        if dy:  # Rows likewise, minus the columns just painted so nothing is painted twice
+            self.repaint(pygame.Rect(max(dx, 0), 0 if dy > 0 else height + dy, width - abs(dx), abs(dy)))
+        return True
+
+    def repaint(self, rect):
+        self.paint(self.surface.subsurface(rect), rect.move(self.origin))
@@ -1,3 +1,4 @@
+import os
 import pygame
 import sys
 import random # Import random
@@ -6,8 +7,15 @@ import noise
 
 from constants import *
 from entities import *
-from astar import a_star, Node
-from src.procedural import TerrainGenerator
+from simulation import Simulation, FixedTimestep
+from render import DirtyRectRenderer, ScrollingLayer
+from camera import Camera
+from replay import Recorder, Replayer
+import savegame
+import assets
+from text import get_font, render_text, text_cache
+from tracing import tracer, DEBUG, PATHING
+from profiler import profiler
 
 from pygame.locals import *
 
@@ -16,52 +24,44 @@ pygame.init()
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 pygame.display.set_caption("Kingdom Conquer")
 clock = pygame.time.Clock()
-font = pygame.font.Font(None, 20)
+font = get_font(20)
+profile_font = get_font(16)
+assets.preload()  # Load and convert every entity image once, before the first wave
 
 # --- Game Initialization ---
-gold = 150
-resources = {"wood": 200, "stone": 200, "food": 200, "people": 3}
-resource_increase_rates = {
-    "gold": 1.5, "wood": 0.5, "stone": 0.5, "food": 0.25, "people": 0.1
-}
-
-# --- Grid Setup ---
-grid_width = SCREEN_WIDTH // GRID_SIZE
-grid_height = SCREEN_HEIGHT // GRID_SIZE
-grid = [[(0, 0) for _ in range(grid_width)] for _ in range(grid_height)]
-
-def update_grid(buildings):
-     """Updates the grid based on building positions and water tiles."""
-     global grid  # Access the global grid variable
-
-     # Reset the grid, marking water as non-passable (impassable_terrain_value = 1)
-     for y in range(grid_height):
-         for x in range(grid_width):
-             is_water = terrain[y][x] == len(terrain_generator.grass_tiles)  # Check if it's a water tile
-             grid[y][x] = (terrain[y][x], 1 if is_water else 0)  # Mark water as non-passable
-
-     # Mark cells occupied by buildings as non-passable
-     for building in buildings:
-         for x in range(building.rect.left // GRID_SIZE, building.rect.right // GRID_SIZE):
-             for y in range(building.rect.top // GRID_SIZE, building.rect.bottom // GRID_SIZE):
-                 if 0 <= x < grid_width and 0 <= y < grid_height:
-                     grid[y][x] = (grid[y][x][0], 1)  # Keep terrain type, mark as non-passable
-
-buildings = []
-units = []
-enemies = []
-game_messages = [] # Initialize game_messages list
-
 current_building_type = "Castle"
-building_cooldown = 0
 selected_unit = None
 
 noise_seed = random.randint(0, 1000) # Generate noise seed
-terrain_generator = TerrainGenerator(SCREEN_WIDTH, SCREEN_HEIGHT, GRID_SIZE, noise_seed) # Pass seed to generator
-terrain = terrain_generator.generate_terrain() # River is generated within this call now
+record_path = os.environ.get("RTS_RECORD")  # Save this session's commands here on exit
+replayer = Replayer.from_file(os.environ["RTS_REPLAY"]) if os.environ.get("RTS_REPLAY") else None
+if replayer:
+    sim = replayer.create_simulation()  # Plays the recorded commands back; player commands are ignored
+else:
+    sim = Simulation(noise_seed, deterministic=bool(record_path)) # Owns the game state; this file only handles input and drawing
+    if record_path:
+        sim.recorder = Recorder(sim)
+timestep = FixedTimestep()  # Runs sim ticks at SIM_TICK_RATE whatever the frame rate
+alpha = 1.0  # Render interpolation between the last two ticks
+camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, sim.grid_width * GRID_SIZE, sim.grid_height * GRID_SIZE)
+camera.center_on(sim.grid_width * GRID_SIZE / 2, sim.grid_height * GRID_SIZE / 2)
+
+profiler.track_simulation(sim)  # Per-frame counters for the profiler overlay
+profiler.track("text_renders", lambda: text_cache.misses)
+
+renderer = DirtyRectRenderer(screen)
+dirty_rendering = DIRTY_RECT_RENDERING
+background = pygame.Surface(screen.get_size()).convert()  # Renderer's static layer, refilled when the camera moves
+
+def paint_world(surface, view):
+    """Terrain and, in debug mode, the grid for the world rect view."""
+    surface.fill(WHITE)  # Where the view extends past a small world
+    sim.terrain_generator.draw_terrain(surface, view)
+    if show_debug:
+        draw_grid(surface, origin=view.topleft)
 
-wave_timer = 0
-current_wave = 1
+world_layer = ScrollingLayer(screen.get_size(), paint_world)  # Terrain and debug grid under the camera
+world_layer_key = None
 
 building_map = {
     K_1: "Castle", K_2: "House", K_3: "Market", K_4: "Barracks",
@@ -76,18 +76,14 @@ def draw_button(screen, text, color, rect, border_color=BLACK, border_width=2, o
     pygame.draw.rect(button_surface, color, (0, 0, rect[2] - 2 * border_width, rect[3] - 2 * border_width))  # Button background
     button_surface.set_alpha(opacity) # Set opacity of the button surface
     screen.blit(button_surface, (rect[0] + border_width, rect[1] + border_width)) # Blit the button surface onto the screen, offset by border width
-    button_text = font.render(text, True, BLACK)
+    button_text = render_text(font, text, BLACK)
     text_rect = button_text.get_rect(center=(rect[0] + rect[2] // 2, rect[1] + rect[3] // 2))
     screen.blit(button_text, text_rect)
 
-# Create terrain background
-terrain_background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-terrain_generator.draw_terrain(terrain_background)
-
 # Load and scale logo
-logo = pygame.transform.scale(pygame.image.load("assets/buildings/castle.png"), (150, 150))
+logo = assets.get_image("assets/buildings/castle.png", (150, 150))
 
-title_font = pygame.font.Font(None, 50)  # Larger font for title
+title_font = get_font(50)  # Larger font for title
 title_text = title_font.render("KINGDOM CONQUER", True, BLACK)
 title_text_rect = title_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 4))
 logo_rect = logo.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50))
@@ -105,7 +101,7 @@ while menu_running:
                 menu_running = False
 
 
-    screen.blit(terrain_background, (0, 0))
+    sim.terrain_generator.draw_terrain(screen, camera.rect)  # Cached terrain chunks, shared with the game loop
     screen.blit(logo, logo_rect)  # Draw logo
     start_button = pygame.Rect(SCREEN_WIDTH // 2 - 60, SCREEN_HEIGHT // 2 + 60, 120, 30)
     exit_button = pygame.Rect(SCREEN_WIDTH // 2 - 60, SCREEN_HEIGHT // 2 + 100, 120, 30)
@@ -118,220 +114,193 @@ while menu_running:
 
     pygame.display.flip()
 
+def draw_dynamic(screen):
+    """
+    Draws everything that can change between frames, returning the rects
+    touched. Only objects the spatial indexes find near the camera are drawn.
+    """
+    rects = []
+    origin = camera.origin
+    view = camera.view(margin=2 * GRID_SIZE)  # Room for HP labels and interpolated positions
+
+    with profiler.scope("draw_entities"):
+        for building in sim.building_index.query_rect(view):
+            rects.append(building.draw(screen, origin=origin))
+
+        for unit in sim.ally_index.query_rect(view):
+            rects.append(unit.draw(screen, sim.ally_index, sim.building_index, sim.enemy_index, show_debug, alpha, origin))  # Pass show_debug here
+            if unit == selected_unit:
+                rects.append(pygame.draw.rect(screen, GREEN, unit.draw_rect(alpha, origin), 2))
+
+        for enemy in sim.enemy_index.query_rect(view):
+            rects.append(enemy.draw(screen, sim.ally_index, sim.building_index, sim.enemy_index, show_debug, alpha, origin))  # Pass show_debug here as well
+
+        screen_preview = camera.to_screen(preview_rect) if preview_rect else None
+        rects.append(draw_building_preview(screen, screen_preview, collision, sim.resources, sim.gold, current_building_type))
+
+    with profiler.scope("text"):
+        rects.append(draw_resources(screen, font, sim.resources, sim.gold))
+        rects.extend(draw_messages(screen, font, sim.game_messages))
+
+        # Draw debug information if enabled
+        if show_debug:
+            rects.extend(draw_debug_info(screen, font, debug_info))
+
+    if profiler.enabled:
+        with profiler.scope("profiler"):
+            rects.extend(profiler.draw(screen, profile_font))
+    return rects
+
 # --- Game Loop ---
-game_messages = []
 while game_running:
-    # Update the grid at the beginning of the game loop
-    update_grid(buildings)
-
-    dt = clock.tick(FPS)
-    mouse_pos = pygame.mouse.get_pos()
+    asset_info = assets.asset_stats()
+    frame_dt = clock.tick(FPS)
+    profiler.begin_frame()  # Frame time excludes the frame-rate sleep
     mouse_pos = pygame.mouse.get_pos()
+    camera.update(frame_dt, mouse_pos, pygame.key.get_pressed(), pygame.mouse.get_focused())
+    world_pos = camera.to_world(mouse_pos)  # Everything below picks and places in world pixels
     debug_info = [
         f"FPS: {int(clock.get_fps())}",
-        f"Buildings: {len(buildings)}",
-        f"Units: {len(units)}",
-        f"Enemies: {len(enemies)}",
-        f"Mouse Position: {mouse_pos}",
+        f"Buildings: {len(sim.buildings)}",
+        f"Units: {len(sim.units)}",
+        f"Enemies: {len(sim.enemies)}",
+        f"Mouse Position: {world_pos}",
+        f"Camera: {camera.origin}",
         f"Selected Unit: {selected_unit.type if selected_unit else 'None'}",
-        f"Current Wave: {current_wave}",
-        # f"Gold: {int(gold)}",
-        # f"Resources: {int(resources['gold'])}, {int(resources['wood'])}, {int(resources['stone'])}, {int(resources['food'])}, {int(resources['people'])}",
+        f"Current Wave: {sim.current_wave}",
+        f"Speed: {timestep.speed}x, tick {sim.tick}",
+        f"Path Cache: {sim.nav_grid.path_cache.hit_rate:.0%} hits, {len(sim.nav_grid.path_cache)} paths, {sim.nav_grid.path_cache.memory / 1024:.1f} KB",
+        "Assets: {files} files, {images} images, {kb:.0f} KB".format(kb=asset_info["bytes"] / 1024, **asset_info),
+        f"Path Queue: {len(sim.path_scheduler)} pending, {sim.path_scheduler.completed} done",
+        f"Targeting: {sim.targeting.resolved} queries, {sim.targeting.switched} switches",
+        f"Text Cache: {text_cache.hit_rate:.0%} hits, {len(text_cache)} surfaces",
         # Add more debug variables as needed
     ]
 
-    # --- Resource Management ---
-    building_counts = {}
-    for building in buildings:
-        building_counts[building.type] = building_counts.get(building.type, 0) + 1
-
-    resource_multipliers = {
-        "gold": 1 + (building_counts.get("Market", 0) * 0.1) + (building_counts.get("Castle", 0) * 0.2),
-        "wood": 1 + (building_counts.get("LumberMill", 0) * 0.15) + (building_counts.get("Castle", 0) * 0.1),
-        "stone": 1 + (building_counts.get("Quarry", 0) * 0.12) + (building_counts.get("Castle", 0) * 0.15),
-        "food": 1 + (building_counts.get("Farm", 0) * 0.2) + (building_counts.get("Castle", 0) * 0.1),
-        "people": 1 + (building_counts.get("House", 0) * 0.0005) + (building_counts.get("Castle", 0) * 0.001),
-    }
-
-    for resource, rate in resource_increase_rates.items():
-        multiplier = resource_multipliers.get(resource, 1)
-        increase = rate * multiplier * (dt / 1000)
-        if resource == "gold":
-            gold += increase
-        else:
-            resources[resource] += increase
-
-    # --- Building Cooldown ---
-    building_cooldown = max(0, building_cooldown - dt)
-
     # --- Preview Rect ---
     if not selected_unit:
-        preview_rect = update_preview_rect(mouse_pos, current_building_type)
-        collision = check_collision(preview_rect, buildings, units) if preview_rect else False
+        preview_rect = update_preview_rect(world_pos, current_building_type) if sim.in_world(*world_pos) else None
+        collision = check_collision(preview_rect, sim.building_index, sim.ally_index) if preview_rect else False
     else:
         preview_rect = None  # No preview while unit is selected
         collision = False
 
     # --- Event Handling ---
-    for event in pygame.event.get():
-        if event.type == QUIT:
-            game_running = False
-        elif event.type == KEYDOWN:
-            if event.key in building_map:
-                current_building_type = building_map[event.key]
-                selected_unit = None  # Deselect unit when switching building
-            elif event.key == pygame.K_ESCAPE:
-                current_building_type = None
-            elif event.key == K_t:
-                terrain = terrain_generator.generate_terrain()
-            elif event.key == K_d:  # 'D' key to toggle debug info display
-                show_debug = not show_debug
-                print(grid)
-        elif event.type == MOUSEBUTTONDOWN:
-            if event.button == 1:
-                # Unit Selection
-                clicked_unit = None
-                for unit in units:
-                    if unit.rect.collidepoint(mouse_pos):
-                        clicked_unit = unit
-                        break
-
-                if clicked_unit:
-                    selected_unit = clicked_unit
-                    add_game_message(f"Selected {clicked_unit.type}", game_messages)
+    with profiler.scope("events"):
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                game_running = False
+            elif event.type == KEYDOWN:
+                if event.key in building_map:
+                    current_building_type = building_map[event.key]
+                    selected_unit = None  # Deselect unit when switching building
+                elif event.key == pygame.K_ESCAPE:
                     current_building_type = None
-                    continue  # Skip building placement
-
-                # Building Placement / Unit Training
-                grid_x = (mouse_pos[0] // GRID_SIZE) * GRID_SIZE
-                grid_y = (mouse_pos[1] // GRID_SIZE) * GRID_SIZE
-
-                # Get terrain type at the clicked location
-                terrain_index = terrain[grid_y // GRID_SIZE][grid_x // GRID_SIZE]
-                is_water = terrain_index == len(terrain_generator.grass_tiles)
-
-                # Prevent building in water
-                if is_water:
-                    add_game_message("Cannot build in water!", game_messages)
-                    continue
-
-                clicked_building = next((building for building in buildings if building.rect.collidepoint(mouse_pos)), None)
-
-                if clicked_building and "unit" in BUILDING_DATA[clicked_building.type]:
-                    unit_type = BUILDING_DATA[clicked_building.type]["unit"]
-                    unit_cost = ALLY_DATA[unit_type]["cost"]
-                    speed = 50
-                    if all(resources.get(resource, gold) >= amount for resource, amount in unit_cost.items()):
-                        new_unit = AlliedUnit(unit_type, clicked_building.x, clicked_building.y + GRID_SIZE, enemies)
-                        units.append(new_unit)
-                        for resource, amount in unit_cost.items():
-                            if resource == "gold":
-                                gold -= amount
-                            else:
-                                resources[resource] -= amount
-                        add_game_message(f"Trained {unit_type}", game_messages)
-                    else:
-                        add_game_message(f"Not enough resources to train {unit_type}", game_messages)
-
-                elif current_building_type and not collision and building_cooldown <= 0:
-                    castle_exists = any(building.type == "Castle" for building in buildings)
-                    if current_building_type == "Castle" and castle_exists:
-                        add_game_message("Only one castle can be built.", game_messages)
+                elif event.key == K_t and not replayer:
+                    sim.regenerate_terrain(random.randint(0, 1000), background=True) # New seed, generated off the main thread
+                elif event.key == K_d:  # 'D' key to toggle debug info display
+                    show_debug = not show_debug
+                    if tracer.debug[PATHING]:
+                        tracer.emit(PATHING, DEBUG, f"grid {sim.grid}")
+                elif event.key == K_l:  # 'L' key to write the recent trace records to a file
+                    count = tracer.dump(TRACE_DUMP_FILE)
+                    add_game_message(f"Wrote {count} trace records to {TRACE_DUMP_FILE}", sim.game_messages)
+                elif event.key == K_f:  # 'F' key to cycle the game speed
+                    add_game_message(f"Speed {timestep.cycle_speed()}x", sim.game_messages)
+                elif event.key == K_F5:  # Quick save
+                    size = savegame.save(sim, SAVE_FILE)
+                    add_game_message(f"Saved {size // 1024} KB to {SAVE_FILE}", sim.game_messages)
+                elif event.key == K_F9 and not replayer and sim.recorder is None:  # Quick load; would break a recording
+                    if os.path.exists(SAVE_FILE):
+                        sim.close()
+                        sim = savegame.load(SAVE_FILE)
+                        profiler.track_simulation(sim)
+                        selected_unit = None
+                        camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, sim.grid_width * GRID_SIZE, sim.grid_height * GRID_SIZE)
+                        camera.center_on(sim.grid_width * GRID_SIZE / 2, sim.grid_height * GRID_SIZE / 2)
+                        world_layer_key = None  # New terrain, even if its version matches
+                        add_game_message(f"Loaded {SAVE_FILE}", sim.game_messages)
                     else:
-                        cost = BUILDING_DATA[current_building_type].get("resources", {})
-                        affordable = all(resources.get(resource, gold) >= amount for resource, amount in cost.items())
-                        if affordable:
-                            new_building = Building(grid_x, grid_y, current_building_type)
-                            buildings.append(new_building)
-                            for resource, amount in cost.items():
-                                if resource == "gold":
-                                    gold -= amount
-                                else:
-                                    resources[resource] -= amount
-                            building_cooldown = BUILDING_COOLDOWN_TIME
-                            add_game_message(f"Built {current_building_type}", game_messages)
-                        else:
-                            add_game_message(f"Not enough resources to build {current_building_type}", game_messages)
-
-            elif event.button == 3 and selected_unit:  # Move selected unit
-                grid_x = (mouse_pos[0] // GRID_SIZE) * GRID_SIZE
-                grid_y = (mouse_pos[1] // GRID_SIZE) * GRID_SIZE
-                selected_unit.destination = (grid_x, grid_y)  # Set destination first
-                selected_unit.moving = True
-
-                start_grid_x = int(selected_unit.x // GRID_SIZE)
-                start_grid_y = int(selected_unit.y // GRID_SIZE)
-                end_grid_x = grid_x // GRID_SIZE
-                end_grid_y = grid_y // GRID_SIZE
-
-                selected_unit.path = [] # Clear the old path
-                path = a_star(grid, (start_grid_x, start_grid_y), (end_grid_x, end_grid_y))
-
-                if path:
-                    selected_unit.path = path
-                    add_game_message(f"Moving {selected_unit.type}", game_messages)
-                else:
-                    selected_unit.path = [] # Ensure path is empty if no path found
-                    add_game_message(f"No path found for {selected_unit.type}", game_messages)
-
-                # Find nearest target for the selected unit
-                selected_unit.target = selected_unit.find_nearest_target() # This can stay here
-                print(path)
+                        add_game_message(f"No save file {SAVE_FILE}", sim.game_messages)
+                elif event.key == K_r:  # 'R' key to toggle dirty-rectangle rendering
+                    dirty_rendering = not dirty_rendering
+                    renderer.invalidate()
+                elif event.key == K_p:  # 'P' key to toggle the frame profiler overlay
+                    profiler.toggle()
+            elif event.type == MOUSEBUTTONDOWN and not replayer:
+                if event.button == 1:
+                    # Unit Selection
+                    clicked_unit = next(iter(sim.ally_index.query_point(world_pos)), None)
+
+                    if clicked_unit:
+                        selected_unit = clicked_unit
+                        add_game_message(f"Selected {clicked_unit.type}", sim.game_messages)
+                        current_building_type = None
+                        continue  # Skip building placement
+
+                    # Building Placement / Unit Training
+                    grid_x = (world_pos[0] // GRID_SIZE) * GRID_SIZE
+                    grid_y = (world_pos[1] // GRID_SIZE) * GRID_SIZE
+                    clicked_building = next(iter(sim.building_index.query_point(world_pos)), None)
+
+                    if clicked_building and "unit" in BUILDING_DATA[clicked_building.type]:
+                        sim.train_unit(clicked_building)
+                    elif current_building_type and sim.in_world(*world_pos):
+                        sim.place_building(current_building_type, grid_x, grid_y)
+
+                elif event.button == 3 and selected_unit and sim.in_world(*world_pos):  # Move selected unit
+                    grid_x = (world_pos[0] // GRID_SIZE) * GRID_SIZE
+                    grid_y = (world_pos[1] // GRID_SIZE) * GRID_SIZE
+                    sim.order_move(selected_unit, grid_x, grid_y)
 
     # --- Game Updates ---
-
-    for unit in units:
-        unit.targets = enemies  # Update targets for allied units
-        unit.update(dt, grid, game_messages)
-
-    for enemy in enemies:
-        enemy.targets = units + buildings  # Update targets for enemy units
-        game_messages = enemy.update(dt, grid, game_messages)
-
-
-    if wave_timer >= WAVE_INTERVAL * current_wave: # Multiply WAVE_INTERVAL by current_wave
-        new_enemies = spawn_enemies(buildings, units, current_wave, ENEMY_SPAWN_RATE)
-        enemies.extend(new_enemies)
-        wave_timer = 0
-        current_wave += 1
-    else:
-        wave_timer += dt
-
-    # Remove dead units and enemies
-    enemies[:] = [enemy for enemy in enemies if enemy.hp > 0]
-    units[:] = [unit for unit in units if unit.hp > 0]
+    with profiler.scope("sim"):
+        ticks = timestep.advance(frame_dt)
+        for _ in range(ticks):
+            if replayer:
+                replayer.apply_due(sim)
+            sim.step(SIM_DT)
+        profiler.count("sim_ticks", ticks)
+    alpha = timestep.alpha
 
     # --- Drawing ---
-    screen.fill(WHITE)
-    terrain_generator.draw_terrain(screen)
-
-    draw_resources(screen, font, resources, gold)
-
-    for building in buildings:
-        building.draw(screen)
-        # Update the building's HP here...
-        if building.hp <= 0:
-            buildings.remove(building)
-
-    for unit in units:
-        unit.draw(screen, units, buildings, enemies, show_debug)  # Pass show_debug here
-        if unit == selected_unit:
-            pygame.draw.rect(screen, GREEN, unit.rect, 2)
-
-    for enemy in enemies:
-        enemy.draw(screen, units, buildings, enemies, show_debug)  # Pass show_debug here as well
-
-    draw_building_preview(screen, preview_rect, collision, resources, gold, current_building_type)
-    draw_messages(screen, font, game_messages)
-    draw_key_bindings(screen, font, building_map, SCREEN_WIDTH, SCREEN_HEIGHT, GRID_SIZE, BUILDING_DATA)
-
-    # print(wave_timer, current_wave)
-    # Draw debug information if enabled
-    if show_debug:
-        draw_debug_info(screen, font, debug_info)
-        draw_grid(screen)
-
-    pygame.display.flip()
-
+    if dirty_rendering:
+        # The world layer is repainted when the terrain or the debug grid changes; scrolling shifts it
+        # and paints only the strips that came into view. The key bindings go on top, screen-fixed
+        world_key = (sim.terrain_generator.version, show_debug)
+        if world_layer_key != world_key:
+            world_layer.invalidate()
+            world_layer_key = world_key
+            renderer.background_key = None
+        if renderer.background_key != camera.origin:
+            with profiler.scope("draw_terrain"):
+                world_layer.update(camera.origin)
+                background.blit(world_layer.surface, (0, 0))
+            with profiler.scope("text"):
+                draw_key_bindings(background, font, building_map, SCREEN_WIDTH, SCREEN_HEIGHT, GRID_SIZE, BUILDING_DATA)
+            renderer.set_background(background, camera.origin)
+
+        with profiler.scope("present"):
+            renderer.begin()
+        renderer.add(draw_dynamic(screen))
+        with profiler.scope("present"):
+            renderer.end()
+    else:
+        screen.fill(WHITE)
+        with profiler.scope("draw_terrain"):
+            sim.terrain_generator.draw_terrain(screen, camera.rect)
+        if show_debug:  # Under the key bindings and entities, as in the cached background above
+            with profiler.scope("draw_grid"):
+                draw_grid(screen, origin=camera.origin)
+        with profiler.scope("text"):
+            draw_key_bindings(screen, font, building_map, SCREEN_WIDTH, SCREEN_HEIGHT, GRID_SIZE, BUILDING_DATA)
+        draw_dynamic(screen)
+        with profiler.scope("present"):
+            pygame.display.flip()
+    profiler.end_frame()
+
+if sim.recorder is not None:
+    sim.recorder.save(record_path)
+sim.close()
 pygame.quit()
 sys.exit()
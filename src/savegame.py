@@ -0,0 +1,252 @@
+# savegame.py
+#
+# Versioned binary snapshots of a Simulation. A save file is a fixed header
+# followed by sections at 64-byte aligned offsets:
+#
+#   terrain    width * height uint8 tile indexes, row-major
+#   blocked    width * height uint8 passability (1 = blocked), row-major
+#   entities   one ENTITY_RECORD per building, unit and enemy
+#   paths      int32 (x, y) cells; each entity record points at its slice
+#   rng        the simulation's random.Random state
+#   names      newline-separated type names the records index into
+#
+# Nothing is pickled: the terrain and passability sections are raw arrays
+# that open_arrays() memory-maps without copying, and entities are rebuilt
+# from their records, so loading a late-game state takes milliseconds.
+#
+#   save(sim, "battle.rts")
+#   sim = load("battle.rts")
+
+import math
+import mmap
+import struct
+from array import array
+from contextlib import contextmanager
+
+try:
+    import numpy as np
+except ImportError:  # Terrain is rebuilt as bytearray rows instead
+    np = None
+
+from constants import *
+from entities import Building, AlliedUnit, EnemyUnit
+from astar import Node
+from simulation import Simulation
+
+MAGIC = b"RTSS"
+SAVE_VERSION = 1
+ALIGN = 64
+RESOURCES = ("wood", "stone", "food", "people")
+BUILDING, ALLY, ENEMY = 0, 1, 2
+
+HEADER = struct.Struct(
+    "<4sHH"      # magic, version, reserved
+    "II"         # grid width, grid height
+    "qq"         # noise seed, rng seed
+    "QII"        # tick, current wave, next entity id
+    "ddd4d"      # wave timer, building cooldown, gold, RESOURCES
+    "IIII"       # buildings, units, enemies, path cells
+    "QQQQQQ"     # offsets: terrain, blocked, entities, paths, rng, names
+    "I"          # names size
+)
+ENTITY_RECORD = struct.Struct(
+    "<BB"        # kind, type name index
+    "i"          # entity id
+    "dd"         # x, y
+    "i"          # hp
+    "d"          # attack cooldown
+    "i"          # target entity id, -1 if none
+    "dd"         # destination, NaN if none
+    "dd"         # target position the path was planned for, NaN if none
+    "II"         # first path cell, path length
+)
+RNG_STATE = struct.Struct("<I625Id")  # version, Mersenne Twister words, gauss_next (NaN if none)
+
+def align(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+def optional_pair(pair):
+    return pair if pair is not None else (math.nan, math.nan)
+
+def pair_or_none(x, y):
+    return None if math.isnan(x) else (x, y)
+
+# --- Saving ---
+def save(sim, path):
+    """Writes sim to path. Returns the number of bytes written."""
+    width, height = sim.grid_width, sim.grid_height
+    names = []
+    name_index = {}
+    records = []
+    paths = array("i")
+
+    def index_of(name):
+        if name not in name_index:
+            name_index[name] = len(names)
+            names.append(name)
+        return name_index[name]
+
+    for kind, objects in ((BUILDING, sim.buildings), (ALLY, sim.units), (ENEMY, sim.enemies)):
+        for obj in objects:
+            path_start = len(paths) // 2
+            path_cells = getattr(obj, "path", None) or []
+            for node in path_cells:
+                paths.extend((node.x, node.y))
+            target = getattr(obj, "target", None)
+            records.append(ENTITY_RECORD.pack(
+                kind, index_of(obj.type), obj.entity_id, obj.x, obj.y, obj.hp,
+                attack_cooldown(sim, obj),
+                target.entity_id if target is not None and target.entity_id is not None else -1,
+                *optional_pair(getattr(obj, "destination", None)),
+                *optional_pair(getattr(obj, "previous_target_position", None)),
+                path_start, len(path_cells)))
+
+    rng_version, words, gauss_next = sim.rng.getstate()
+    rng_state = RNG_STATE.pack(rng_version, *words, math.nan if gauss_next is None else gauss_next)
+    name_bytes = "\n".join(names).encode()
+    terrain = terrain_bytes(sim.terrain)
+
+    terrain_offset = align(HEADER.size)
+    blocked_offset = align(terrain_offset + width * height)
+    entities_offset = align(blocked_offset + width * height)
+    paths_offset = align(entities_offset + len(records) * ENTITY_RECORD.size)
+    rng_offset = align(paths_offset + paths.itemsize * len(paths))
+    names_offset = align(rng_offset + RNG_STATE.size)
+
+    header = HEADER.pack(
+        MAGIC, SAVE_VERSION, 0, width, height, sim.noise_seed, sim.seed,
+        sim.tick, sim.current_wave, sim.next_entity_id,
+        sim.wave_timer, sim.building_cooldown, sim.gold, *(sim.resources[name] for name in RESOURCES),
+        len(sim.buildings), len(sim.units), len(sim.enemies), len(paths) // 2,
+        terrain_offset, blocked_offset, entities_offset, paths_offset, rng_offset, names_offset,
+        len(name_bytes))
+
+    with open(path, "wb") as f:
+        for offset, data in ((0, header), (terrain_offset, terrain), (blocked_offset, bytes(sim.nav_grid.blocked)),
+                             (entities_offset, b"".join(records)), (paths_offset, paths.tobytes()),
+                             (rng_offset, rng_state), (names_offset, name_bytes)):
+            f.write(bytes(offset - f.tell()))  # Alignment padding
+            f.write(data)
+        return f.tell()
+
+def attack_cooldown(sim, obj):
+    """The numpy backend counts cooldowns down in its arrays, not on the objects."""
+    if getattr(obj, "combat_slot", None) is not None and sim.combat is not None:
+        return float(sim.combat.cooldown[obj.combat_slot])
+    return getattr(obj, "attack_cooldown", 0)
+
+def terrain_bytes(terrain):
+    if np is not None and isinstance(terrain, np.ndarray):
+        return np.ascontiguousarray(terrain, dtype=np.uint8).tobytes()
+    return b"".join(bytes(row) for row in terrain)
+
+# --- Loading ---
+def read_header(buffer):
+    fields = HEADER.unpack_from(buffer)
+    if fields[0] != MAGIC:
+        raise ValueError("Not a save file")
+    if fields[1] != SAVE_VERSION:
+        raise ValueError(f"Unsupported save version: {fields[1]}")
+    names = ("magic", "version", "reserved", "width", "height", "noise_seed", "seed",
+             "tick", "current_wave", "next_entity_id", "wave_timer", "building_cooldown", "gold",
+             *RESOURCES, "buildings", "units", "enemies", "path_cells",
+             "terrain_offset", "blocked_offset", "entities_offset", "paths_offset", "rng_offset", "names_offset",
+             "names_size")
+    return dict(zip(names, fields))
+
+@contextmanager
+def open_arrays(path):
+    """
+    Memory-maps a save and yields (header, terrain, blocked), the two grids
+    as read-only memoryviews of width * height bytes. Nothing is copied, so
+    tools can inspect the map of a large save without loading the game.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        header = read_header(mapped)
+        size = header["width"] * header["height"]
+        view = memoryview(mapped)
+        terrain = view[header["terrain_offset"]:header["terrain_offset"] + size]
+        blocked = view[header["blocked_offset"]:header["blocked_offset"] + size]
+        try:
+            yield header, terrain, blocked
+        finally:
+            terrain.release()
+            blocked.release()
+            view.release()
+
+def load(path, **simulation_options):
+    """Rebuilds the saved Simulation. Keyword arguments are passed on to Simulation()."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        header = read_header(mapped)
+        width, height = header["width"], header["height"]
+        offset = header["terrain_offset"]
+        if np is not None:
+            terrain = np.frombuffer(mapped, dtype=np.uint8, count=width * height, offset=offset).reshape(height, width).copy()
+        else:
+            terrain = [bytearray(mapped[offset + y * width:offset + (y + 1) * width]) for y in range(height)]
+
+        names_offset = header["names_offset"]
+        names = mapped[names_offset:names_offset + header["names_size"]].decode().split("\n")
+        count = header["buildings"] + header["units"] + header["enemies"]
+        records = list(ENTITY_RECORD.iter_unpack(
+            mapped[header["entities_offset"]:header["entities_offset"] + count * ENTITY_RECORD.size]))
+        paths = array("i")
+        paths.frombytes(mapped[header["paths_offset"]:header["paths_offset"] + header["path_cells"] * 2 * paths.itemsize])
+        rng_fields = RNG_STATE.unpack_from(mapped, header["rng_offset"])
+
+    sim = Simulation(header["noise_seed"], width * GRID_SIZE, height * GRID_SIZE,
+                     seed=header["seed"], terrain=terrain, **simulation_options)
+    restore_state(sim, header, rng_fields)
+    restore_entities(sim, records, names, paths)
+    sim.next_entity_id = header["next_entity_id"]
+    return sim
+
+def restore_state(sim, header, rng_fields):
+    sim.tick = header["tick"]
+    sim.current_wave = header["current_wave"]
+    sim.wave_timer = header["wave_timer"]
+    sim.building_cooldown = header["building_cooldown"]
+    sim.gold = header["gold"]
+    for name in RESOURCES:
+        sim.resources[name] = header[name]
+    gauss_next = rng_fields[-1]
+    sim.rng.setstate((rng_fields[0], tuple(rng_fields[1:-1]), None if math.isnan(gauss_next) else gauss_next))
+
+def restore_entities(sim, records, names, paths):
+    by_id = {}
+    buildings = []
+    pending = []  # (unit, record) whose targets are resolved once every entity exists
+    for record in records:
+        kind, name, entity_id, x, y, hp = record[:6]
+        unit_type = names[name]
+        if kind == BUILDING:
+            obj = Building(x, y, unit_type)
+            buildings.append(obj)
+        elif kind == ALLY:
+            obj = AlliedUnit(unit_type, x, y, sim.enemies)
+            pending.append((obj, record))
+        else:
+            obj = EnemyUnit(unit_type, x, y, sim.buildings, sim.units)
+            pending.append((obj, record))
+        obj.hp = hp
+        by_id[entity_id] = obj
+
+    sim.add_buildings(buildings)
+    for unit, record in pending:
+        (kind, _, _, _, _, _, attack_cooldown, target_id,
+         destination_x, destination_y, plan_x, plan_y, path_start, path_length) = record
+        unit.attack_cooldown = attack_cooldown
+        unit.target = by_id.get(target_id)
+        unit.destination = pair_or_none(destination_x, destination_y)
+        unit.previous_target_position = pair_or_none(plan_x, plan_y)
+        unit.path = [Node(paths[2 * i], paths[2 * i + 1]) for i in range(path_start, path_start + path_length)]
+        if kind == ALLY:
+            sim.add_unit(unit)
+        else:
+            sim.add_enemy(unit)
+
+    for entity_id, obj in by_id.items():  # Keep the saved ids; recorded commands and targets refer to them
+        obj.entity_id = entity_id
+    if sim.combat is not None:
+        for unit, _ in pending:  # Targets added after a unit had no combat slot when it was pushed
+            sim.combat.push(unit)
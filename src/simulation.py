@@ -0,0 +1,448 @@
+# simulation.py
+
+import random
+import pygame
+
+from constants import *
+from entities import *
+from astar import NavGrid, FlowField, PathCache
+from spatial import SpatialHash
+from hpa import HierarchicalPathfinder
+from pathqueue import PathScheduler
+from targeting import Targeting
+from messages import MessageBus
+from procedural import TerrainGenerator
+from tracing import tracer, DEBUG, PATHING
+from profiler import profiler
+import batch
+
+class FixedTimestep:
+    """
+    Turns variable frame times into whole SIM_DT simulation ticks, so game
+    outcomes don't depend on the frame rate. Leftover time carries over to
+    the next frame; alpha is how far rendering sits between the last two
+    ticks. speed multiplies game time for fast-forward.
+    """
+    def __init__(self, tick_dt=SIM_DT, max_ticks=MAX_TICKS_PER_FRAME):
+        self.tick_dt = tick_dt
+        self.max_ticks = max_ticks
+        self.accumulator = 0.0
+        self.speed = GAME_SPEEDS[0]
+
+    def advance(self, frame_dt):
+        """Adds a frame's real time and returns how many ticks to run now."""
+        self.accumulator += frame_dt * self.speed
+        ticks = int(self.accumulator // self.tick_dt)
+        if ticks > self.max_ticks:  # Too far behind: drop the backlog rather than fall further behind
+            ticks = self.max_ticks
+            self.accumulator = self.accumulator % self.tick_dt
+        else:
+            self.accumulator -= ticks * self.tick_dt
+        return ticks
+
+    @property
+    def alpha(self):
+        return self.accumulator / self.tick_dt
+
+    def cycle_speed(self):
+        """Moves to the next GAME_SPEEDS multiplier, wrapping back to 1x."""
+        index = GAME_SPEEDS.index(self.speed) if self.speed in GAME_SPEEDS else -1
+        self.speed = GAME_SPEEDS[(index + 1) % len(GAME_SPEEDS)]
+        return self.speed
+
+class Simulation:
+    """
+    Game state and rules, independent of the display.
+
+    Owns the buildings, units, enemies, resources, terrain, navigation grid
+    and wave timer. step(dt) advances everything by dt milliseconds; nothing
+    here draws, so the same simulation runs in the game window or headless.
+
+    Randomness comes from self.rng, seeded with seed (noise_seed by
+    default). With deterministic=True everything else that depends on wall
+    time is pinned too: path searches get a node budget instead of a time
+    budget and run in-process, and terrain regenerates synchronously, so the
+    same seeds and commands always give the same game.
+
+    terrain, if given, is used instead of generating it from noise_seed.
+    """
+    def __init__(self, noise_seed, width=WORLD_WIDTH, height=WORLD_HEIGHT, backend=ENTITY_BACKEND,
+                 path_workers=PATH_WORKERS, deterministic=False, seed=None, terrain=None):
+        # --- Resources ---
+        self.gold = 150
+        self.resources = {"wood": 200, "stone": 200, "food": 200, "people": 3}
+        self.resource_increase_rates = {
+            "gold": 1.5, "wood": 0.5, "stone": 0.5, "food": 0.25, "people": 0.1
+        }
+        self.building_cooldown = 0
+
+        # --- Determinism ---
+        self.seed = noise_seed if seed is None else seed
+        self.rng = random.Random(self.seed)  # Every random decision the rules make
+        self.deterministic = deterministic
+        self.recorder = None  # replay.Recorder capturing player commands
+        self.next_entity_id = 0
+
+        # --- Entities ---
+        self.buildings = []
+        self.units = []
+        self.enemies = []
+        self.game_messages = MessageBus(self.game_time)  # On-screen feed; combat hits coalesce into one line per attacker and target
+
+        # Spatial indexes used for targeting, collision checks and mouse picking
+        self.building_index = SpatialHash(SPATIAL_BUCKET_SIZE)
+        self.ally_index = SpatialHash(SPATIAL_BUCKET_SIZE)
+        self.enemy_index = SpatialHash(SPATIAL_BUCKET_SIZE)
+
+        self.targeting = Targeting(self)  # Batched nearest-target queries, re-checks staggered across ticks
+
+        # Batched struct-of-arrays stepping; falls back to per-object updates without numpy
+        self.combat = batch.CombatArrays() if backend == "numpy" and batch.np is not None else None
+
+        # --- Grid Setup ---
+        self.grid_width = width // GRID_SIZE
+        self.grid_height = height // GRID_SIZE
+        self.grid = [[(0, 0) for _ in range(self.grid_width)] for _ in range(self.grid_height)]
+        self.nav_grid = NavGrid(self.grid_width, self.grid_height)  # Array-backed passability used by pathfinding
+        self.nav_grid.path_cache = PathCache(PATH_CACHE_SIZE)
+        self.nav_grid.subscribe(self.nav_grid.path_cache.discard_stale)
+        self.occupied = bytearray(self.grid_width * self.grid_height)  # Number of buildings covering each cell
+
+        # Shared enemy pathing, one field per ENEMY_DATA target_priority class
+        self.flow_fields = {"building": FlowField(self.nav_grid, GRID_SIZE), "unit": FlowField(self.nav_grid, GRID_SIZE)}
+
+        self.noise_seed = noise_seed
+        self.terrain_generator = TerrainGenerator(width, height, GRID_SIZE, noise_seed, terrain)
+        self.terrain = self.terrain_generator.terrain
+        self.update_grid()
+        if self.grid_width * self.grid_height >= HPA_MIN_CELLS:  # Large worlds search clusters first
+            self.nav_grid.hierarchy = HierarchicalPathfinder(self.nav_grid)
+        if deterministic:
+            self.path_scheduler = PathScheduler(self.nav_grid, budget_nodes=PATH_BUDGET_NODES, workers=0)
+        else:
+            self.path_scheduler = PathScheduler(self.nav_grid, workers=path_workers)  # Searches for every unit and enemy
+
+        # --- Waves ---
+        self.wave_timer = 0
+        self.current_wave = 1
+        self.tick = 0  # Number of step() calls so far
+
+    # --- Grid ---
+    def building_cells(self, building):
+        """Grid cells covered by a building's footprint."""
+        return [(x, y)
+                for x in range(building.rect.left // GRID_SIZE, building.rect.right // GRID_SIZE)
+                for y in range(building.rect.top // GRID_SIZE, building.rect.bottom // GRID_SIZE)
+                if 0 <= x < self.grid_width and 0 <= y < self.grid_height]
+
+    def game_time(self):
+        """Milliseconds of simulated time so far; pauses and speeds up with the simulation."""
+        return self.tick * SIM_DT
+
+    def in_world(self, x, y):
+        """Whether pixel (x, y) lies on the map."""
+        return 0 <= x < self.grid_width * GRID_SIZE and 0 <= y < self.grid_height * GRID_SIZE
+
+    def is_water(self, x, y):
+        return self.terrain[y][x] == len(self.terrain_generator.grass_tiles)
+
+    def update_grid(self, cells=None):
+        """Recomputes the given cells (all cells if None) from water tiles and buildings."""
+        with profiler.scope("update_grid"):
+            if cells is None:
+                cells = [(x, y) for y in range(self.grid_height) for x in range(self.grid_width)]
+
+            for x, y in cells:
+                blocked = self.is_water(x, y) or self.occupied[y * self.grid_width + x] > 0
+                self.grid[y][x] = (int(self.terrain[y][x]), 1 if blocked else 0)  # Mark water and buildings as non-passable
+                self.nav_grid.set_blocked(x, y, blocked)
+
+            self.nav_grid.commit()  # Bumped version reaches the subscribed pathfinding consumers
+
+    def regenerate_terrain(self, noise_seed=None, background=False):
+        """
+        Replaces the terrain. With background=True the new terrain is
+        generated off the main thread and swapped in by a later step().
+        """
+        if self.recorder is not None:
+            self.recorder.record("terrain", noise_seed)
+        if background and not self.deterministic:
+            self.terrain_generator.regenerate_async(noise_seed)
+            return
+        if noise_seed is not None:
+            self.noise_seed = noise_seed
+        self.terrain = self.terrain_generator.regenerate(noise_seed)
+        self.update_grid()
+
+    def apply_terrain_updates(self):
+        """Installs background-generated terrain once it is ready."""
+        if self.terrain_generator.poll():
+            self.noise_seed = self.terrain_generator.noise_seed
+            self.terrain = self.terrain_generator.terrain
+            self.update_grid()
+
+    def close(self):
+        """Releases the pathfinding worker processes."""
+        self.path_scheduler.close()
+
+    def update_flow_fields(self):
+        """Rebuilds the enemy flow fields whose targets or passability changed."""
+        self.flow_fields["building"].update(self.buildings)
+        self.flow_fields["unit"].update(self.units)
+
+    # --- Entities ---
+    def assign_id(self, obj):
+        """Gives obj the next entity id, which recorded commands refer to it by."""
+        obj.entity_id = self.next_entity_id
+        self.next_entity_id += 1
+
+    def add_building(self, building):
+        self.assign_id(building)
+        self.buildings.append(building)
+        self.building_index.insert(building)
+        if self.combat is not None:
+            self.combat.add(building, mobile=False)
+        cells = self.building_cells(building)
+        for x, y in cells:
+            self.occupied[y * self.grid_width + x] += 1
+        self.update_grid(cells)
+
+    def add_buildings(self, buildings):
+        """Adds many buildings at once with a single grid update, e.g. when loading a save."""
+        cells = set()
+        for building in buildings:
+            self.assign_id(building)
+            self.buildings.append(building)
+            self.building_index.insert(building)
+            if self.combat is not None:
+                self.combat.add(building, mobile=False)
+            footprint = self.building_cells(building)
+            for x, y in footprint:
+                self.occupied[y * self.grid_width + x] += 1
+            cells.update(footprint)
+        self.update_grid(sorted(cells))
+
+    def remove_building(self, building):
+        self.buildings.remove(building)
+        self.building_index.remove(building)
+        if self.combat is not None:
+            self.combat.remove(building)
+        cells = self.building_cells(building)
+        for x, y in cells:
+            self.occupied[y * self.grid_width + x] -= 1
+        self.update_grid(cells)
+
+    def add_unit(self, unit):
+        unit.target_indexes = [self.enemy_index]
+        unit.path_scheduler = self.path_scheduler
+        unit.targeting = self.targeting
+        self.assign_id(unit)
+        self.units.append(unit)
+        self.ally_index.insert(unit)
+        if self.combat is not None:
+            self.combat.add(unit)
+
+    def add_enemy(self, enemy):
+        enemy.flow_field = self.flow_fields.get(enemy.target_priority)
+        if enemy.target_priority == "unit":
+            enemy.target_indexes = [self.ally_index, self.building_index]
+        else:
+            enemy.target_indexes = [self.building_index, self.ally_index]
+        enemy.path_scheduler = self.path_scheduler
+        enemy.targeting = self.targeting
+        self.assign_id(enemy)
+        self.enemies.append(enemy)
+        self.enemy_index.insert(enemy)
+        if self.combat is not None:
+            self.combat.add(enemy)
+
+    def remove_dead(self):
+        """Remove dead units, enemies and destroyed buildings."""
+        for dead in [enemy for enemy in self.enemies if enemy.hp <= 0]:
+            self.enemy_index.remove(dead)
+            self.path_scheduler.cancel(dead)
+            if self.combat is not None:
+                self.combat.remove(dead)
+        for dead in [unit for unit in self.units if unit.hp <= 0]:
+            self.ally_index.remove(dead)
+            self.path_scheduler.cancel(dead)
+            if self.combat is not None:
+                self.combat.remove(dead)
+        self.enemies[:] = [enemy for enemy in self.enemies if enemy.hp > 0]
+        self.units[:] = [unit for unit in self.units if unit.hp > 0]
+        for building in [building for building in self.buildings if building.hp <= 0]:
+            self.remove_building(building)
+
+    # --- Resources ---
+    def can_afford(self, cost):
+        return all(self.resources.get(resource, self.gold) >= amount for resource, amount in cost.items())
+
+    def spend(self, cost):
+        for resource, amount in cost.items():
+            if resource == "gold":
+                self.gold -= amount
+            else:
+                self.resources[resource] -= amount
+
+    def update_resources(self, dt):
+        building_counts = {}
+        for building in self.buildings:
+            building_counts[building.type] = building_counts.get(building.type, 0) + 1
+
+        resource_multipliers = {
+            "gold": 1 + (building_counts.get("Market", 0) * 0.1) + (building_counts.get("Castle", 0) * 0.2),
+            "wood": 1 + (building_counts.get("LumberMill", 0) * 0.15) + (building_counts.get("Castle", 0) * 0.1),
+            "stone": 1 + (building_counts.get("Quarry", 0) * 0.12) + (building_counts.get("Castle", 0) * 0.15),
+            "food": 1 + (building_counts.get("Farm", 0) * 0.2) + (building_counts.get("Castle", 0) * 0.1),
+            "people": 1 + (building_counts.get("House", 0) * 0.0005) + (building_counts.get("Castle", 0) * 0.001),
+        }
+
+        for resource, rate in self.resource_increase_rates.items():
+            multiplier = resource_multipliers.get(resource, 1)
+            increase = rate * multiplier * (dt / 1000)
+            if resource == "gold":
+                self.gold += increase
+            else:
+                self.resources[resource] += increase
+
+    # --- Player Commands ---
+    def place_building(self, building_type, grid_x, grid_y):
+        """
+        Place a building with its top-left corner at pixel (grid_x, grid_y).
+        Returns the new building, or None if it could not be placed.
+        """
+        if self.recorder is not None:
+            self.recorder.record("place", building_type, grid_x, grid_y)
+        if self.is_water(grid_x // GRID_SIZE, grid_y // GRID_SIZE):  # Prevent building in water
+            add_game_message("Cannot build in water!", self.game_messages)
+            return None
+
+        size = GRID_SIZE * BUILDING_DATA[building_type].get("size_multiplier", 1)
+        footprint = pygame.Rect(grid_x, grid_y, size, size)
+        if self.building_cooldown > 0 or check_collision(footprint, self.building_index, self.ally_index):
+            return None
+
+        castle_exists = any(building.type == "Castle" for building in self.buildings)
+        if building_type == "Castle" and castle_exists:
+            add_game_message("Only one castle can be built.", self.game_messages)
+            return None
+
+        cost = BUILDING_DATA[building_type].get("resources", {})
+        if not self.can_afford(cost):
+            add_game_message(f"Not enough resources to build {building_type}", self.game_messages)
+            return None
+
+        new_building = Building(grid_x, grid_y, building_type)
+        self.add_building(new_building)
+        self.spend(cost)
+        self.building_cooldown = BUILDING_COOLDOWN_TIME
+        add_game_message(f"Built {building_type}", self.game_messages)
+        return new_building
+
+    def train_unit(self, building):
+        """Train the unit a building produces. Returns the new unit, or None."""
+        if self.recorder is not None:
+            self.recorder.record("train", building.entity_id)
+        unit_type = BUILDING_DATA[building.type].get("unit")
+        if unit_type is None:
+            return None
+
+        unit_cost = ALLY_DATA[unit_type]["cost"]
+        if not self.can_afford(unit_cost):
+            add_game_message(f"Not enough resources to train {unit_type}", self.game_messages)
+            return None
+
+        new_unit = AlliedUnit(unit_type, building.x, building.y + GRID_SIZE, self.enemies)
+        self.add_unit(new_unit)
+        self.spend(unit_cost)
+        add_game_message(f"Trained {unit_type}", self.game_messages)
+        return new_unit
+
+    def order_move(self, unit, grid_x, grid_y):
+        """
+        Send a unit to the cell at pixel (grid_x, grid_y). The search is
+        queued ahead of every retarget; the unit walks straight towards the
+        destination until the path arrives.
+        """
+        if self.recorder is not None:
+            self.recorder.record("move", unit.entity_id, grid_x, grid_y)
+        unit.destination = (grid_x, grid_y)  # Set destination first
+        unit.moving = True
+
+        start_grid_x = int(unit.x // GRID_SIZE)
+        start_grid_y = int(unit.y // GRID_SIZE)
+        end_grid_x = grid_x // GRID_SIZE
+        end_grid_y = grid_y // GRID_SIZE
+
+        unit.path = [] # Clear the old path
+
+        def arrived(request, cells):
+            if not unit.receive_path(request, cells):
+                return  # Superseded by a later order
+            if cells:
+                add_game_message(f"Moving {unit.type}", self.game_messages)
+            else:
+                add_game_message(f"No path found for {unit.type}", self.game_messages)
+            if tracer.debug[PATHING]:
+                tracer.emit(PATHING, DEBUG, f"{unit.name} ordered to ({end_grid_x},{end_grid_y}): {cells}")
+
+        request = unit.request_path((start_grid_x, start_grid_y), (end_grid_x, end_grid_y), PATH_PRIORITY_PLAYER, arrived)
+
+        # Find nearest target for the unit
+        unit.target = unit.find_nearest_target()
+        if self.combat is not None:
+            self.combat.push(unit)
+        return request
+
+    # --- Update ---
+    def spawn_wave(self):
+        for enemy in spawn_enemies(self.buildings, self.units, self.current_wave, ENEMY_SPAWN_RATE,
+                                   self.grid_width, self.grid_height, self.rng):
+            self.add_enemy(enemy)
+        self.wave_timer = 0
+        self.current_wave += 1
+
+    def step(self, dt):
+        """Advance the simulation by dt milliseconds."""
+        self.tick += 1
+        for unit in self.units:  # Interpolation start points for the renderer
+            unit.prev_x, unit.prev_y = unit.x, unit.y
+        for enemy in self.enemies:
+            enemy.prev_x, enemy.prev_y = enemy.x, enemy.y
+
+        self.apply_terrain_updates()
+        self.update_resources(dt)
+        self.building_cooldown = max(0, self.building_cooldown - dt)
+
+        with profiler.scope("flow_fields"):
+            self.update_flow_fields()
+        with profiler.scope("targeting"):
+            retargeted = self.targeting.step(self.tick)
+
+        if self.combat is not None:
+            for obj in retargeted:
+                self.combat.push(obj)
+            with profiler.scope("combat"):
+                self.combat.step(dt, self.nav_grid, self.game_messages)
+        else:
+            with profiler.scope("units"):
+                for unit in self.units:
+                    unit.update(dt, self.nav_grid, self.game_messages)
+
+            with profiler.scope("enemies"):
+                for enemy in self.enemies:
+                    enemy.update(dt, self.nav_grid, self.game_messages)
+
+        with profiler.scope("pathfinding"):
+            for request in self.path_scheduler.run():
+                if self.combat is not None and request.requester.combat_slot is not None:
+                    self.combat.push(request.requester)  # New waypoint for the arrays
+
+        if self.wave_timer >= WAVE_INTERVAL * self.current_wave: # Multiply WAVE_INTERVAL by current_wave
+            with profiler.scope("waves"):
+                self.spawn_wave()
+        else:
+            self.wave_timer += dt
+
+        with profiler.scope("remove_dead"):
+            self.remove_dead()
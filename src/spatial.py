@@ -0,0 +1,140 @@
+# spatial.py
+
+import math
+import heapq
+
+class SpatialHash:
+    """
+    Uniform spatial hash of game objects, bucketed by their rect.
+
+    Buckets are square with a side of cell_size pixels (a multiple of
+    GRID_SIZE). An object is listed in every bucket its rect overlaps and is
+    re-bucketed by move() whenever its rect changes. Buckets are dicts rather
+    than sets so iteration order is stable; nearest() breaks distance ties
+    by entity id, since bucket order depends on how objects moved and a
+    reloaded game rebuilds the buckets in a different order.
+    """
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.buckets = {}       # (bucket_x, bucket_y) -> {obj: None}
+        self.object_cells = {}  # obj -> tuple of bucket keys
+
+    def __len__(self):
+        return len(self.object_cells)
+
+    def __iter__(self):
+        return iter(list(self.object_cells))
+
+    def __contains__(self, obj):
+        return obj in self.object_cells
+
+    def cells_for_rect(self, rect):
+        size = self.cell_size
+        return tuple((x, y)
+                     for x in range(rect.left // size, (rect.right - 1) // size + 1)
+                     for y in range(rect.top // size, (rect.bottom - 1) // size + 1))
+
+    def insert(self, obj):
+        cells = self.cells_for_rect(obj.rect)
+        self.object_cells[obj] = cells
+        for cell in cells:
+            self.buckets.setdefault(cell, {})[obj] = None
+        obj.spatial_index = self
+
+    def remove(self, obj):
+        cells = self.object_cells.pop(obj, ())
+        for cell in cells:
+            bucket = self.buckets[cell]
+            del bucket[obj]
+            if not bucket:
+                del self.buckets[cell]
+        if getattr(obj, "spatial_index", None) is self:
+            obj.spatial_index = None
+
+    def move(self, obj):
+        """Re-buckets obj after its rect changed; cheap when it stayed in the same buckets."""
+        old_cells = self.object_cells.get(obj)
+        if old_cells is None:
+            return
+        cells = self.cells_for_rect(obj.rect)
+        if cells == old_cells:
+            return
+        self.remove(obj)
+        self.insert(obj)
+
+    def candidates_in_rect(self, rect):
+        seen = {}
+        buckets = self.buckets
+        for cell in self.cells_for_rect(rect):
+            bucket = buckets.get(cell)
+            if bucket:
+                seen.update(bucket)
+        return seen
+
+    def query_rect(self, rect):
+        """Objects whose rect collides with rect."""
+        return [obj for obj in self.candidates_in_rect(rect) if rect.colliderect(obj.rect)]
+
+    def query_point(self, pos):
+        """Objects whose rect contains pos, e.g. for mouse picking."""
+        size = self.cell_size
+        bucket = self.buckets.get((int(pos[0] // size), int(pos[1] // size)), {})
+        return [obj for obj in bucket if obj.rect.collidepoint(pos)]
+
+    def query_radius(self, x, y, radius):
+        """Objects whose position lies within radius of (x, y)."""
+        size = self.cell_size
+        found = {}
+        for bucket_x in range(int((x - radius) // size), int((x + radius) // size) + 1):
+            for bucket_y in range(int((y - radius) // size), int((y + radius) // size) + 1):
+                bucket = self.buckets.get((bucket_x, bucket_y))
+                if bucket:
+                    found.update(bucket)
+        return [obj for obj in found if math.hypot(obj.x - x, obj.y - y) <= radius]
+
+    def nearest(self, x, y, k=1, predicate=None):
+        """
+        The k objects nearest to (x, y), closest first, searching rings of
+        buckets outward until nothing unseen can be closer.
+        """
+        if not self.object_cells:
+            return []
+        size = self.cell_size
+        center_x, center_y = int(x // size), int(y // size)
+        distances = {}
+        ring = 0
+        while True:
+            if (2 * ring + 1) ** 2 >= len(self.buckets):
+                # The rings would visit more buckets than exist, so scan the rest directly
+                for obj in self.object_cells:
+                    if obj not in distances and (predicate is None or predicate(obj)):
+                        distances[obj] = math.hypot(obj.x - x, obj.y - y)
+                break
+
+            for cell in ring_cells(center_x, center_y, ring):
+                for obj in self.buckets.get(cell, ()):
+                    if obj not in distances and (predicate is None or predicate(obj)):
+                        distances[obj] = math.hypot(obj.x - x, obj.y - y)
+
+            # Anything not seen yet is at least `ring` whole buckets away
+            if len(distances) >= k and heapq.nsmallest(k, distances.values())[-1] <= ring * size:
+                break
+            ring += 1
+
+        return heapq.nsmallest(k, distances, key=lambda obj: (distances[obj], tie_break(obj)))
+
+
+def tie_break(obj):
+    entity_id = getattr(obj, "entity_id", None)
+    return -1 if entity_id is None else entity_id
+
+def ring_cells(center_x, center_y, ring):
+    if ring == 0:
+        yield center_x, center_y
+        return
+    for x in range(center_x - ring, center_x + ring + 1):
+        yield x, center_y - ring
+        yield x, center_y + ring
+    for y in range(center_y - ring + 1, center_y + ring):
+        yield center_x - ring, y
+        yield center_x + ring, y
@@ -0,0 +1,150 @@
+# targeting.py
+#
+# Batched, staggered target selection. Rather than every unit searching for
+# its nearest target on its own, Targeting.step() runs once per tick before
+# the units update and resolves all of that tick's queries together:
+#
+#   * urgent: units with no live target get one the same tick
+#   * scheduled: a unit with a target re-checks it every RETARGET_INTERVAL
+#     ticks, on the tick its entity id selects, so re-evaluations are spread
+#     evenly and each tick handles about 1/RETARGET_INTERVAL of the units
+#
+# With numpy, each target class is packed into coordinate arrays once per
+# tick and the queries are answered from query x candidate distance matrices
+# in chunks of TARGET_MATRIX_CELLS; without it, or for fewer than
+# TARGET_BATCH_MIN queries, each query falls back to Unit.find_nearest_target
+# and its spatial hash search. Enemies with a flow
+# field keep taking the target the field leads to, which is nearest by
+# travel rather than straight-line distance.
+
+try:
+    import numpy as np
+except ImportError:  # Queries are answered one at a time instead
+    np = None
+
+from constants import *
+from tracing import tracer, INFO, TARGETING
+
+class Targeting:
+    """Assigns targets for a Simulation's units and enemies, one batch per tick."""
+    def __init__(self, sim, interval=RETARGET_INTERVAL, switch_ratio=RETARGET_SWITCH_RATIO):
+        self.sim = sim
+        self.interval = interval
+        self.switch_ratio = switch_ratio  # A scheduled check only switches to a target this much closer
+        self.resolved = 0  # Queries answered, for the profiler and benchmarks
+        self.switched = 0  # Scheduled checks that picked a different target
+        self.candidates = {}  # SpatialHash -> (objects, x array, y array) for this tick
+
+    def classes(self):
+        """Each target index mapped to the list holding the same objects, in a stable order."""
+        sim = self.sim
+        return {sim.ally_index: sim.units, sim.building_index: sim.buildings, sim.enemy_index: sim.enemies}
+
+    def step(self, tick):
+        """Resolves this tick's queries. Returns the units whose target changed."""
+        urgent = []
+        scheduled = []
+        interval = self.interval
+        for units in (self.sim.units, self.sim.enemies):
+            for unit in units:
+                target = unit.target
+                if target is None or target.hp <= 0:
+                    urgent.append(unit)
+                elif (unit.entity_id + tick) % interval == 0 and not in_range(unit, target):
+                    scheduled.append(unit)  # Units already fighting keep their target
+        if not urgent and not scheduled:
+            return []
+
+        self.candidates = {}
+        changed = []
+        for unit, target in self.resolve(urgent) if urgent else ():
+            if target is not None:
+                set_target(unit, target)
+                changed.append(unit)
+        for unit, target in self.resolve(scheduled) if scheduled else ():
+            if target is not None and target is not unit.target and self.better(unit, target):
+                unit.cancel_path_request()  # Replans towards the new target
+                set_target(unit, target)
+                self.switched += 1
+                changed.append(unit)
+        return changed
+
+    def better(self, unit, target):
+        """Whether target beats the unit's live current target by priority or by enough distance."""
+        current = unit.target
+        for index in unit.target_indexes:
+            if target in index:
+                if current not in index:
+                    return True  # Higher priority class
+                break
+            if current in index:
+                return False
+        return (distance_squared(unit, target)
+                < self.switch_ratio * self.switch_ratio * distance_squared(unit, current))
+
+    # --- Queries ---
+    def resolve(self, units):
+        """(unit, nearest live target or None) for every unit, by target priority."""
+        results = []
+        batched = {}  # Tuple of target indexes -> units querying them
+        for unit in units:
+            indexes = unit.target_indexes
+            if indexes is None or not any(self.candidates_for(index)[0] for index in indexes):
+                continue  # Nothing alive to target
+            flow_field = getattr(unit, "flow_field", None)
+            if flow_field is not None:
+                target = flow_field.target_at(*unit.grid_position(flow_field.nav))
+                if target is not None and target.hp > 0:
+                    results.append((unit, target))
+                    continue
+            if np is None or len(units) < TARGET_BATCH_MIN:
+                results.append((unit, unit.find_nearest_target()))
+            else:
+                batched.setdefault(tuple(indexes), []).append(unit)
+
+        for indexes, group in batched.items():
+            results.extend(self.nearest(group, indexes))
+        self.resolved += len(results)
+        return results
+
+    def nearest(self, units, indexes):
+        """Nearest live target in the first target class that has any, for every unit at once."""
+        for index in indexes:
+            objects, target_x, target_y = self.candidates_for(index)
+            if not objects:
+                continue
+            x = np.array([unit.x for unit in units])
+            y = np.array([unit.y for unit in units])
+            rows = max(1, TARGET_MATRIX_CELLS // len(objects))
+            results = []
+            for start in range(0, len(units), rows):
+                dx = x[start:start + rows, None] - target_x
+                dy = y[start:start + rows, None] - target_y
+                best = np.argmin(dx * dx + dy * dy, axis=1)  # First of equally near targets, in list order
+                results.extend(zip(units[start:start + rows], (objects[i] for i in best.tolist())))
+            return results
+        return [(unit, None) for unit in units]
+
+    def candidates_for(self, index):
+        candidates = self.candidates.get(index)
+        if candidates is None:
+            objects = [obj for obj in self.classes()[index] if obj.hp > 0]
+            if np is None:
+                candidates = (objects, None, None)
+            else:
+                candidates = (objects, np.array([obj.x for obj in objects]), np.array([obj.y for obj in objects]))
+            self.candidates[index] = candidates
+        return candidates
+
+def set_target(unit, target):
+    unit.target = target
+    if tracer.info[TARGETING]:
+        tracer.emit(TARGETING, INFO, f"{unit.name} targeted {getattr(target, 'name', target.type)}")
+
+def distance_squared(a, b):
+    dx = a.x - b.x
+    dy = a.y - b.y
+    return dx * dx + dy * dy
+
+def in_range(unit, target):
+    return distance_squared(unit, target) <= unit.get_attack_range() ** 2
@@ -0,0 +1,57 @@
+# text.py
+
+import pygame
+from collections import OrderedDict
+from constants import *
+
+_fonts = {}  # (name, size) -> pygame.font.Font, shared by every caller
+
+class TextCache:
+    """
+    Bounded LRU cache of rendered text surfaces keyed on (font, text, color).
+    Glyph rasterization only happens the first time a string is drawn.
+    """
+    def __init__(self, max_entries=TEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.entries[key] = surface
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return surface
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+text_cache = TextCache()
+
+def get_font(size, name=None):
+    """Returns the shared Font for (name, size), creating it once."""
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = pygame.font.Font(name, size)
+        _fonts[key] = font
+    return font
+
+def render_text(font, text, color, antialias=True):
+    return text_cache.render(font, text, color, antialias)
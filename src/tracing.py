@@ -0,0 +1,133 @@
+# tracing.py
+#
+# Leveled, per-category diagnostics that cost nothing when switched off.
+# Call sites guard on a plain dict lookup before building the message, so a
+# disabled category never formats a string:
+#
+#   if tracer.debug[MOVEMENT]:
+#       tracer.emit(MOVEMENT, DEBUG, f"speed={unit.speed}")
+#
+# Enabled records go into an in-memory ring buffer (dump() writes it out on
+# demand) and, after stream_to(path), to a file from a background thread.
+# RTS_TRACE="pathing=debug,combat=info" and RTS_TRACE_FILE=trace.log enable
+# tracing from the environment.
+
+import os
+import sys
+import time
+import atexit
+import threading
+import queue
+from collections import deque
+
+from constants import *
+
+# --- Levels ---
+DEBUG = 10
+INFO = 20
+WARNING = 30
+OFF = 100
+
+LEVEL_NAMES = {DEBUG: "debug", INFO: "info", WARNING: "warning", OFF: "off"}
+
+# --- Categories ---
+PATHING = "pathing"
+TARGETING = "targeting"
+MOVEMENT = "movement"
+COMBAT = "combat"
+
+CATEGORIES = (PATHING, TARGETING, MOVEMENT, COMBAT)
+
+class Tracer:
+    def __init__(self, capacity=TRACE_BUFFER_SIZE):
+        self.levels = {category: OFF for category in CATEGORIES}
+        self.buffer = deque(maxlen=capacity)  # Most recent records, oldest dropped first
+        self.stream_queue = None
+        self.stream_thread = None
+        self.refresh()
+
+    def refresh(self):
+        """Recomputes the per-level lookup tables the call sites check."""
+        self.debug = {category: level <= DEBUG for category, level in self.levels.items()}
+        self.info = {category: level <= INFO for category, level in self.levels.items()}
+        self.warning = {category: level <= WARNING for category, level in self.levels.items()}
+
+    def set_level(self, level, categories=CATEGORIES):
+        """Emit records at `level` or above for the given categories (all by default)."""
+        if isinstance(categories, str):
+            categories = (categories,)
+        for category in categories:
+            if category not in self.levels:
+                raise ValueError(f"Unknown trace category: {category}")
+            self.levels[category] = level
+        self.refresh()
+
+    def configure(self, spec):
+        """Applies a spec like "pathing=debug,combat=info" or "all=debug"."""
+        by_name = {name: level for level, name in LEVEL_NAMES.items()}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            category, _, name = item.partition("=")
+            level = by_name.get((name or "debug").lower())
+            if level is None:
+                raise ValueError(f"Unknown trace level: {name}")
+            self.set_level(level, CATEGORIES if category == "all" else category)
+
+    def emit(self, category, level, message):
+        record = (time.perf_counter(), category, level, message)
+        self.buffer.append(record)
+        if self.stream_queue is not None:
+            self.stream_queue.put(record)
+
+    def format(self, record):
+        timestamp, category, level, message = record
+        return f"{timestamp:12.6f} {LEVEL_NAMES.get(level, level):7} {category:9} {message}"
+
+    def records(self, category=None):
+        return [record for record in self.buffer if category is None or record[1] == category]
+
+    def dump(self, path=None, category=None):
+        """Writes the buffered records to path (stderr if None) and returns how many."""
+        lines = [self.format(record) + "\n" for record in self.records(category)]
+        if path is None:
+            sys.stderr.writelines(lines)
+        else:
+            with open(path, "w") as f:
+                f.writelines(lines)
+        return len(lines)
+
+    def clear(self):
+        self.buffer.clear()
+
+    # --- Streaming ---
+    def stream_to(self, path):
+        """Starts appending every new record to path from a background thread."""
+        self.close()
+        self.stream_queue = queue.SimpleQueue()
+        self.stream_thread = threading.Thread(target=self.write_stream, args=(path, self.stream_queue), daemon=True)
+        self.stream_thread.start()
+
+    def write_stream(self, path, records):
+        with open(path, "a") as f:
+            while True:
+                record = records.get()
+                if record is None:
+                    break
+                f.write(self.format(record) + "\n")
+                if records.empty():
+                    f.flush()
+
+    def close(self):
+        """Stops streaming, waiting for the queued records to be written."""
+        if self.stream_queue is not None:
+            self.stream_queue.put(None)
+            self.stream_thread.join()
+            self.stream_queue = None
+            self.stream_thread = None
+
+tracer = Tracer()
+atexit.register(tracer.close)
+
+if os.environ.get("RTS_TRACE"):
+    tracer.configure(os.environ["RTS_TRACE"])
+if os.environ.get("RTS_TRACE_FILE"):
+    tracer.stream_to(os.environ["RTS_TRACE_FILE"])
@@ -12,25 +12,25 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from src.entities import EnemyUnit
 from src.entities import AlliedUnit
 from constants import *
+from text import get_font, render_text
 
 pygame.init()
-font = pygame.font.Font(None, 20)
+font = get_font(20)
 
 # --- Functions ---
-def draw_grid(screen, color=BLACK, line_width=1, opacity=150):
-    s = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-    for x in range(0, SCREEN_WIDTH, GRID_SIZE):
-        for y in range(0, SCREEN_HEIGHT, GRID_SIZE):
-            pygame.draw.line(s, (*color, opacity), (x, 0), (x, SCREEN_HEIGHT), line_width)
-            pygame.draw.line(s, (*color, opacity), (0, y), (SCREEN_WIDTH, y), line_width)
+def draw_grid(screen, color=BLACK, line_width=1, opacity=150, origin=(0, 0)):
+    """Grid lines over the screen, aligned to world cells for a camera at origin."""
+    width, height = screen.get_size()
+    s = pygame.Surface((width, height), pygame.SRCALPHA)
+    for x in range(-origin[0] % GRID_SIZE, width, GRID_SIZE):
+        pygame.draw.line(s, (*color, opacity), (x, 0), (x, height), line_width)
+    for y in range(-origin[1] % GRID_SIZE, height, GRID_SIZE):
+        pygame.draw.line(s, (*color, opacity), (0, y), (width, y), line_width)
     screen.blit(s, (0, 0))
 
 def add_game_message(message, game_messages, duration=MESSAGE_DURATION):
-    current_time = pygame.time.get_ticks()
-    game_messages[:] = [msg for msg in game_messages if current_time - msg["start_time"] < msg["duration"]]  # Remove expired messages
-
-    if not any(msg["text"] == message for msg in game_messages):  # Add new message if not a duplicate
-        game_messages.append({"text": message, "start_time": current_time, "duration": duration})
+    """game_messages is a messages.MessageBus; duplicates of a message still showing are dropped."""
+    game_messages.post(message, duration)
 
 def update_preview_rect(mouse_pos, current_building_type):
     grid_x = (mouse_pos[0] // GRID_SIZE) * GRID_SIZE
@@ -43,22 +43,22 @@ def draw_resources(screen, font, resources, gold):
     resource_text = f"Gold: {int(gold)}"
     for resource, amount in resources.items():
         resource_text += f", {resource.capitalize()}: {int(amount)}"
-    gold_text = font.render(resource_text, True, BLACK)
-    screen.blit(gold_text, (10, 10))
+    gold_text = render_text(font, resource_text, BLACK)
+    return screen.blit(gold_text, (10, 10))
 
 def draw_building_preview(screen, preview_rect, collision, resources, gold, current_building_type):
     if preview_rect:  # Only draw if preview_rect exists
         building_resources = BUILDING_DATA.get(current_building_type, {}).get("resources", {})
         affordable = all(resources.get(resource, gold) >= amount for resource, amount in building_resources.items())
         color = GREEN if not collision and affordable else RED
-        pygame.draw.rect(screen, color, preview_rect, 2)
+        return pygame.draw.rect(screen, color, preview_rect, 2)
+    return None
 
 def draw_messages(screen, font, game_messages):
-    current_time = pygame.time.get_ticks()
-    active_messages = [msg for msg in game_messages if current_time - msg["start_time"] < msg["duration"]]
-    for i, msg in enumerate(active_messages):
-        message_text = font.render(msg["text"], True, RED)
-        screen.blit(message_text, (10, 30 + i * 20))
+    rects = []
+    for i, msg in enumerate(game_messages.active()):
+        rects.append(screen.blit(msg.render(font, RED), (10, 30 + i * 20)))  # Surface cached on the message
+    return rects
 
 def draw_key_bindings(screen, font, building_map, screen_width, screen_height, grid_size, building_data):
     x = screen_width - 10 * grid_size  # Adjusted x position
@@ -68,52 +68,45 @@ def draw_key_bindings(screen, font, building_map, screen_width, screen_height, g
         requirements = building_data.get(building_type, {}).get("resources", {})
         if requirements:
             text += f" ({', '.join(f'{resource}: {amount}' for resource, amount in requirements.items())})"
-        text_surface = font.render(text, True, RED)
+        text_surface = render_text(font, text, RED)
         screen.blit(text_surface, (x, y))
         y += 20
 
 def check_collision(preview_rect, buildings, units):
-    for building in buildings:
-        if preview_rect.colliderect(building.rect):
-            return True
-    for unit in units:
-        if preview_rect.colliderect(unit.rect):
-            return True
-    return False
-
-def generate_spawn_point():
-    grid_width  = SCREEN_WIDTH  // GRID_SIZE
-    grid_height = SCREEN_HEIGHT // GRID_SIZE
-
-    side = random.choice(["top", "bottom", "left", "right"])
+    """buildings and units are SpatialHash indexes."""
+    return bool(buildings.query_rect(preview_rect) or units.query_rect(preview_rect))
+
+def generate_spawn_point(grid_width=WORLD_WIDTH // GRID_SIZE, grid_height=WORLD_HEIGHT // GRID_SIZE, rng=random):
+
+    side = rng.choice(["top", "bottom", "left", "right"])
     if side == "top":
-        return random.randint(0, grid_width  - 1) * GRID_SIZE, 0
+        return rng.randint(0, grid_width  - 1) * GRID_SIZE, 0
     elif side == "bottom":
-        return random.randint(0, grid_width  - 1) * GRID_SIZE, (grid_height - 1) * GRID_SIZE
+        return rng.randint(0, grid_width  - 1) * GRID_SIZE, (grid_height - 1) * GRID_SIZE
     elif side == "left":
-        return 0, random.randint(0, grid_height - 1) * GRID_SIZE
+        return 0, rng.randint(0, grid_height - 1) * GRID_SIZE
     elif side == "right":
-        return (grid_width - 1) * GRID_SIZE, random.randint(0, grid_height - 1) * GRID_SIZE
-
-def spawn_enemies(buildings, units, current_wave, enemy_spawn_rate):
-    grid_width  = SCREEN_WIDTH  // GRID_SIZE
-    grid_height = SCREEN_HEIGHT // GRID_SIZE
+        return (grid_width - 1) * GRID_SIZE, rng.randint(0, grid_height - 1) * GRID_SIZE
 
+def spawn_enemies(buildings, units, current_wave, enemy_spawn_rate,
+                  grid_width=WORLD_WIDTH // GRID_SIZE, grid_height=WORLD_HEIGHT // GRID_SIZE, rng=random):
     spawned_enemies = []
     for _ in range(current_wave * enemy_spawn_rate):
-        spawn_x, spawn_y = generate_spawn_point()
+        spawn_x, spawn_y = generate_spawn_point(grid_width, grid_height, rng)
 
         # ✅ Clamp to valid pixel range so units never spawn off-grid
         spawn_x = max(0, min(spawn_x, (grid_width  - 1) * GRID_SIZE))
         spawn_y = max(0, min(spawn_y, (grid_height - 1) * GRID_SIZE))
 
-        enemy_type = random.choice(list(ENEMY_DATA.keys()))
+        enemy_type = rng.choice(list(ENEMY_DATA.keys()))
         enemy = EnemyUnit(enemy_type, spawn_x, spawn_y, buildings, units)
         spawned_enemies.append(enemy)
 
     return spawned_enemies
 
 def draw_debug_info(screen, font, debug_info, x=10, y=40):
+    rects = []
     for i, line in enumerate(debug_info):
-        text_surface = font.render(line, True, BLACK)
-        screen.blit(text_surface, (x, y + i * 20))
\ No newline at end of file
+        text_surface = render_text(font, line, BLACK)
+        rects.append(screen.blit(text_surface, (x, y + i * 20)))
+    return rects
\ No newline at end of file
@@ -0,0 +1,22 @@
+# conftest.py
+#
+# The game's modules import each other by bare name from src/ and load their
+# assets relative to the repository root, as the game does when started with
+# python src/rts.py.
+
+import os
+import sys
+
+# Must be set before pygame initialises its video subsystem
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    monkeypatch.chdir(ROOT)
@@ -0,0 +1,93 @@
+# test_pathfinding.py
+#
+# A*, Jump Point Search, the resumable PathSearch and HPA* on seeded random
+# grids: every search must find a path whenever A* does, and the exact ones
+# must find one of the same cost.
+
+import random
+
+import pytest
+
+from astar import NavGrid, DIAGONAL_COST
+from hpa import HierarchicalPathfinder
+from pathqueue import PathSearch
+
+def random_grid(seed, width, height, density):
+    rng = random.Random(seed)
+    nav = NavGrid(width, height)
+    for i in range(width * height):
+        nav.blocked[i] = rng.random() < density
+    return nav
+
+def random_pairs(nav, seed, count):
+    rng = random.Random(seed)
+    cells = [(x, y) for y in range(nav.height) for x in range(nav.width) if not nav.is_blocked(x, y)]
+    return [(rng.choice(cells), rng.choice(cells)) for _ in range(count)]
+
+def path_cost(path):
+    return sum(DIAGONAL_COST if a[0] != b[0] and a[1] != b[1] else 1 for a, b in zip(path, path[1:]))
+
+def assert_walkable(nav, path, start, end):
+    """path runs from start to the walkable cell nearest end in single steps over open cells."""
+    assert path[0] == tuple(start)
+    assert path[-1] == nav.find_nearest_walkable(*end)
+    assert all(not nav.is_blocked(x, y) for x, y in path)
+    assert all(max(abs(a[0] - b[0]), abs(a[1] - b[1])) == 1 for a, b in zip(path, path[1:]))
+
+def resumable_search(nav, start, end, slice_nodes=7):
+    """PathSearch run in small slices, as the PathScheduler runs it across ticks."""
+    search = PathSearch(nav, start, end)
+    while not search.run(slice_nodes):
+        pass
+    return search.result
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("density", [0.1, 0.25, 0.4])
+def test_astar_jps_and_path_search_agree(seed, density):
+    nav = random_grid(seed, 48, 40, density)
+    for start, end in random_pairs(nav, seed, 40):
+        astar = nav.search(start, end)
+        jps = nav.jump_search(start, end)
+        sliced = resumable_search(nav, start, end)
+        assert bool(jps) == bool(astar) == bool(sliced)
+        assert sliced == astar  # Same expansion order, so the very same path
+        if astar:
+            assert_walkable(nav, astar, start, end)
+            assert_walkable(nav, jps, start, end)
+            assert path_cost(jps) == pytest.approx(path_cost(astar))
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("cluster_size", [4, 8, 16])
+@pytest.mark.parametrize("density", [0.1, 0.25, 0.35])
+def test_hpa_finds_a_path_whenever_astar_does(seed, cluster_size, density):
+    nav = random_grid(seed, 64, 56, density)
+    hierarchy = HierarchicalPathfinder(nav, cluster_size)
+    for start, end in random_pairs(nav, seed, 60):
+        astar = nav.search(start, end)
+        hpa = hierarchy.find_path(start, end)
+        assert bool(hpa) == bool(astar)
+        if astar:
+            assert_walkable(nav, hpa, start, end)
+            assert path_cost(hpa) <= 1.5 * path_cost(astar)
+
+@pytest.mark.parametrize("cluster_size", [4, 8, 16])
+def test_hpa_incremental_rebuilds_match_a_fresh_build(cluster_size):
+    nav = random_grid(cluster_size, 64, 56, 0.25)
+    hierarchy = HierarchicalPathfinder(nav, cluster_size)
+    rng = random.Random(cluster_size)
+    for _ in range(40):
+        for _ in range(rng.randint(1, 4)):  # A few 2x2 buildings placed or removed per commit
+            x, y, blocked = rng.randrange(nav.width - 1), rng.randrange(nav.height - 1), rng.random() < 0.5
+            for dx in (0, 1):
+                for dy in (0, 1):
+                    nav.set_blocked(x + dx, y + dy, blocked)
+        nav.commit()
+
+    fresh = HierarchicalPathfinder(nav, cluster_size)
+    assert fresh.intra == hierarchy.intra
+    assert fresh.graph == hierarchy.graph
+    for start, end in random_pairs(nav, cluster_size, 40):
+        astar = nav.search(start, end)
+        hpa = hierarchy.find_path(start, end)
+        assert hpa == fresh.find_path(start, end)
+        assert bool(hpa) == bool(astar)
@@ -0,0 +1,42 @@
+# test_savegame.py
+#
+# A game saved and loaded mid-battle must carry on exactly as the game that
+# was never interrupted.
+
+import random
+
+import pytest
+
+from constants import *
+from entities import AlliedUnit
+from benchmark import build_scenario
+from headless import outcome
+import savegame
+import batch
+
+BACKENDS = ["objects", pytest.param("numpy", marks=pytest.mark.skipif(batch.np is None, reason="needs numpy"))]
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("seed", [1, 42])
+def test_loaded_game_matches_uninterrupted_game(tmp_path, backend, seed):
+    sim = build_scenario(seed, 30, 200, backend)
+    sim.gold = 1000  # build_scenario makes both unlimited, which outcome() cannot compare
+    sim.resources = {resource: 1000 for resource in sim.resources}
+    rng = random.Random(seed)
+    for _ in range(30):  # Allied units as well, so units chase and fight enemies across the save
+        x, y = sim.nav_grid.find_nearest_walkable(rng.randrange(sim.grid_width), rng.randrange(sim.grid_height))
+        sim.add_unit(AlliedUnit(rng.choice(list(ALLY_DATA)), x * GRID_SIZE, y * GRID_SIZE, sim.enemies))
+    for _ in range(150):
+        sim.step(SIM_DT)
+    assert sim.enemies and sim.units
+
+    path = tmp_path / "battle.rts"
+    savegame.save(sim, str(path))
+    loaded = savegame.load(str(path), backend=backend, deterministic=True)
+    assert outcome(loaded) == outcome(sim)
+    for _ in range(400):
+        sim.step(SIM_DT)
+        loaded.step(SIM_DT)
+        assert outcome(loaded) == outcome(sim), f"diverged at tick {sim.tick}"
+    sim.close()
+    loaded.close()